@@ -1,19 +1,15 @@
 import streamlit as st
 import re
-from neo4j import GraphDatabase
-from pyvis.network import Network
 import streamlit.components.v1 as components
 
-# ================= CONFIG =================
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = "12345678"
-NEO4J_DB = "music-recommendation"
-
-driver = GraphDatabase.driver(
-    NEO4J_URI,
-    auth=(NEO4J_USER, NEO4J_PASSWORD)
+from graph_view import VIS_URL, exploration_html, graph_cache, neighbourhood_html
+from music_db import (
+    EXPLORE_FAN_OUT, EXPLORE_MAX_NODES, count_tracks, explore_neighbourhood, get_all_artists,
+    get_all_genres, get_most_searched_tracks, get_track_detail, get_track_index, invalidate_catalog,
+    page_session, search_count_stats, snapshot_stats,
 )
+from query_cache import cache_stats
+from recommender import get_recommender, reload_recommender
 
 # ================= UTILS =================
 def clean_text(text, max_len=50):
@@ -27,186 +23,32 @@ def clean_text(text, max_len=50):
 def clean_list(values):
     return sorted(set(clean_text(v) for v in values if v))
 
-# ================= DATABASE =================
-def get_all_artists():
-    q = """
-    MATCH (a:Artist)
-    WHERE a.artist_name IS NOT NULL
-    RETURN DISTINCT a.artist_name AS name
-    ORDER BY name
-    """
-    with driver.session(database=NEO4J_DB) as s:
-        return [r["name"] for r in s.run(q)]
-
-def get_all_genres():
-    q = """
-    MATCH (g:Genre)
-    WHERE g.genre_id IS NOT NULL
-    RETURN DISTINCT g.genre_id AS name
-    ORDER BY name
-    """
-    with driver.session(database=NEO4J_DB) as s:
-        return [r["name"] for r in s.run(q)]
-
-def get_tracks(artist_filter=None, genre_filter=None, min_popularity=0, max_popularity=100):
-    # Construction de la requête de base
-    match_clauses = ["MATCH (t:Track)"]
-    where_conditions = ["t.track_name IS NOT NULL"]
-    params = {}
-    
-    # Filtre par artiste
-    if artist_filter and artist_filter != "Tous les artistes":
-        match_clauses.append("MATCH (t)-[:PERFORMED_BY]->(a:Artist)")
-        where_conditions.append("a.artist_name = $artist")
-        params["artist"] = artist_filter
-    
-    # Filtre par genre
-    if genre_filter and genre_filter != "Tous les genres":
-        match_clauses.append("MATCH (t)-[:IN_GENRE]->(g:Genre)")
-        where_conditions.append("g.genre_id = $genre")
-        params["genre"] = genre_filter
-    
-    # Filtre par popularité
-    if min_popularity > 0 or max_popularity < 100:
-        where_conditions.append(f"t.popularity >= {min_popularity} AND t.popularity <= {max_popularity}")
-    
-    # Construction de la requête finale
-    q = f"""
-    {' '.join(match_clauses)}
-    WHERE {' AND '.join(where_conditions)}
-    RETURN DISTINCT t.track_name AS name
-    ORDER BY name
-    """
-    
-    with driver.session(database=NEO4J_DB) as s:
-        return [r["name"] for r in s.run(q, **params)]
-
-def get_track_info(track):
-    q = """
-    MATCH (t:Track {track_name:$name})
-    OPTIONAL MATCH (t)-[:PERFORMED_BY]->(a:Artist)
-    OPTIONAL MATCH (t)-[:IN_GENRE]->(g:Genre)
-    RETURN
-      t.track_name AS track,
-      coalesce(t.popularity,0) AS popularity,
-      coalesce(t.energy,0.0) AS energy,
-      coalesce(t.valence,0.0) AS valence,
-      coalesce(t.danceability,0.0) AS danceability,
-      coalesce(t.acousticness,0.0) AS acousticness,
-      coalesce(t.instrumentalness,0.0) AS instrumentalness,
-      coalesce(t.liveness,0.0) AS liveness,
-      coalesce(t.speechiness,0.0) AS speechiness,
-      collect(DISTINCT a.artist_name) AS artists,
-      collect(DISTINCT g.genre_name) AS genres
-    """
-    with driver.session(database=NEO4J_DB) as s:
-        return s.run(q, name=track).single()
-
-def get_recommendations(track):
-    q = """
-    MATCH (t:Track {track_name:$name})-[:SIMILAR_TO]->(r:Track)
-    OPTIONAL MATCH (r)-[:PERFORMED_BY]->(a:Artist)
-    RETURN r.track_name AS track,
-           r.popularity AS popularity,
-           r.energy AS energy,
-           r.valence AS valence,
-           collect(DISTINCT a.artist_name) AS artists
-    ORDER BY popularity DESC
-    LIMIT 5
-    """
-    with driver.session(database=NEO4J_DB) as s:
-        return list(s.run(q, name=track))
-
-def increment_search_count(track_name):
-    """Incrémente le compteur de recherche d'une chanson (REQUÊTE DE MODIFICATION)"""
-    q = """
-    MATCH (t:Track {track_name: $name})
-    SET t.search_count = coalesce(t.search_count, 0) + 1
-    RETURN t.track_name AS track_name, t.search_count AS search_count
-    """
-    with driver.session(database=NEO4J_DB) as s:
-        result = s.run(q, name=track_name).single()
-        return result["search_count"] if result else 0
-
-def get_most_searched_tracks(limit=10):
-    """Récupère les chansons les plus recherchées (REQUÊTE D'AGRÉGATION)"""
-    q = """
-    MATCH (t:Track)
-    WHERE t.search_count IS NOT NULL AND t.search_count > 0
-    OPTIONAL MATCH (t)-[:PERFORMED_BY]->(a:Artist)
-    RETURN t.track_name AS track,
-           t.search_count AS count,
-           collect(DISTINCT a.artist_name) AS artists
-    ORDER BY t.search_count DESC
-    LIMIT $limit
-    """
-    with driver.session(database=NEO4J_DB) as s:
-        return list(s.run(q, limit=limit))
-
 # ================= GRAPH =================
-def render_graph(track):
-    q = """
-    MATCH (t:Track {track_name:$name})
-    OPTIONAL MATCH (t)-[:PERFORMED_BY]->(a:Artist)
-    OPTIONAL MATCH (t)-[:IN_GENRE]->(g:Genre)
-    OPTIONAL MATCH (t)-[:SIMILAR_TO]->(s:Track)
-    RETURN
-      collect(DISTINCT a.artist_name) AS artists,
-      collect(DISTINCT g.genre_name) AS genres,
-      collect(DISTINCT s.track_name) AS similars
-    """
-    with driver.session(database=NEO4J_DB) as s:
-        r = s.run(q, name=track).single()
-
-    net = Network(
-        height="620px",
-        width="100%",
-        bgcolor="#020617",
-        font_color="white",
-        directed=True
-    )
-
-    net.set_options("""
-    {
-      "physics": {
-        "enabled": true,
-        "barnesHut": {
-          "gravitationalConstant": -26000,
-          "springLength": 160
-        }
-      },
-      "edges": {
-        "arrows": { "to": { "enabled": true } },
-        "font": { "size": 14 }
-      },
-      "interaction": {
-        "zoomView": true,
-        "dragView": true
-      }
-    }
-    """)
-
-    net.add_node(track, label="♪ " + clean_text(track),
-                 shape="star", size=42, color="#2563eb", title="Chanson sélectionnée")
-
-    for a in r["artists"]:
-        net.add_node(a, label="♫ " + clean_text(a),
-                     shape="circle", size=30, color="#22c55e", title="Artiste")
-        net.add_edge(track, a, label="PERFORMED_BY", width=2)
-
-    for g in r["genres"]:
-        net.add_node(g, label="♬ " + clean_text(g),
-                     shape="box", size=24, color="#a855f7", title="Genre")
-        net.add_edge(track, g, label="IN_GENRE", width=2)
-
-    for s in r["similars"]:
-        net.add_node(s, label="♪ " + clean_text(s),
-                     shape="dot", size=26, color="#38bdf8", title="Chanson similaire")
-        net.add_edge(track, s, label="SIMILAR_TO", width=3)
-
-    net.save_graph("graph.html")
-    with open("graph.html", "r", encoding="utf-8") as f:
-        components.html(f.read(), height=650, scrolling=True)
+def vis_assets_url():
+    # Absolue : le graphe est une iframe srcdoc, résolue depuis la page
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    base = st.get_option("server.baseUrlPath").strip("/")
+    return "/" + (base + "/" if base else "") + VIS_URL
+
+def render_graph(r, hops=1, fan_out=EXPLORE_FAN_OUT, max_nodes=EXPLORE_MAX_NODES):
+    # r : détail de la chanson (track_id, track, artists, genres, similars)
+    graph = None
+    if hops > 1:
+        try:
+            graph = explore_neighbourhood(r["track_id"], hops, fan_out, max_nodes)
+        except Exception as exc:
+            st.caption(f"Exploration indisponible ({type(exc).__name__}) : voisins directs")
+        else:
+            if graph is None:
+                st.caption("Chanson absente du graphe : voisins directs")
+    if graph is None:
+        # Voisins directs : déjà présents dans le détail, aucune requête
+        html = neighbourhood_html(r, clean_text, assets_url=vis_assets_url())
+    else:
+        html = exploration_html(r["track_id"], graph, clean_text, key=(hops, fan_out, max_nodes),
+                                assets_url=vis_assets_url())
+    components.html(html, height=650, scrolling=True)
 
 # ================= UI =================
 st.set_page_config("Music Recommendation System", layout="wide")
@@ -730,17 +572,48 @@ st.markdown('''
 </div>
 ''', unsafe_allow_html=True)
 
-# ================= TOP RECHERCHÉES =================
-st.markdown('<div class="card">', unsafe_allow_html=True)
-st.markdown('<h3 class="icon-title"><i class="fas fa-fire"></i> Top 10 Chansons les plus recherchées</h3>', unsafe_allow_html=True)
+# Une seule session Neo4j pour tout le rendu de la page
+with page_session():
+
+    # ================= CACHE =================
+    with st.sidebar.expander("Cache des requêtes"):
+        for c in cache_stats():
+            total = c["hits"] + c["misses"]
+            ratio = c["hits"] / total if total else 0.0
+            st.markdown(f"**{c['name']}** — {c['hits']} hits / {c['misses']} miss "
+                        f"({ratio:.0%}) · {c['size']} entrées · TTL {c['ttl']} s")
+        w = search_count_stats()
+        since = "—" if w["seconds_since_flush"] is None else f"il y a {w['seconds_since_flush']:.0f} s"
+        st.markdown(f"**Compteurs de recherche** — {w['pending']} en attente · "
+                    f"{w['flushes']} écritures (toutes les {w['interval']} s, dernière {since}) · "
+                    f"dernier lot {w['last_flush_size']} / max {w['max_flush_size']} "
+                    f"en {w['last_flush_seconds'] * 1000:.0f} ms · {w['errors']} erreurs")
+        snap = snapshot_stats()
+        if snap["stats"] is not None:
+            g = snap["stats"]
+            st.markdown(f"**Instantané du graphe** {g['version']} — {g['tracks']} chansons · "
+                        f"{g['artists']} artistes · {g['genres']} genres · "
+                        f"{g['similar_to']} SIMILAR_TO · construit il y a {g['age']:.0f} s")
+        else:
+            st.markdown(f"**Instantané du graphe** indisponible, lectures sur Neo4j ({snap['error']})")
+        if st.button("Vider le cache"):
+            invalidate_catalog()
+            graph_cache.invalidate()
+            reload_recommender()
+
+    # ================= TOP RECHERCHÉES =================
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown('<h3 class="icon-title"><i class="fas fa-fire"></i> Top 10 Chansons les plus recherchées</h3>', unsafe_allow_html=True)
 
-top_tracks = get_most_searched_tracks(10)
+    PERIODS = {"Depuis toujours": None, "Dernier jour": "day", "Dernière heure": "hour"}
+    period = st.radio("Période", list(PERIODS), horizontal=True, label_visibility="collapsed", key="top_period")
+    top_tracks = get_most_searched_tracks(10, PERIODS[period])
 
-if top_tracks:
-    cols = st.columns(5)
-    for idx, track in enumerate(top_tracks[:5], 1):
-        with cols[idx-1]:
-            st.markdown(f'''
+    if top_tracks:
+        cols = st.columns(5)
+        for idx, track in enumerate(top_tracks[:5], 1):
+            with cols[idx-1]:
+                st.markdown(f'''
             <div class="metric-card" style="padding: 20px;">
                 <div style="font-size: 2.5em; color: #3b82f6; font-weight: 900; margin-bottom: 8px;">#{idx}</div>
                 <div style="font-size: 0.95em; margin: 12px 0; font-weight: 700; color: #f1f5f9; min-height: 40px;">{clean_text(track['track'], 35)}</div>
@@ -753,13 +626,13 @@ if top_tracks:
             </div>
             ''', unsafe_allow_html=True)
     
-    # Deuxième ligne (places 6-10)
-    if len(top_tracks) > 5:
-        st.markdown('<div style="margin-top: 16px;"></div>', unsafe_allow_html=True)
-        cols2 = st.columns(5)
-        for idx, track in enumerate(top_tracks[5:10], 6):
-            with cols2[idx-6]:
-                st.markdown(f'''
+        # Deuxième ligne (places 6-10)
+        if len(top_tracks) > 5:
+            st.markdown('<div style="margin-top: 16px;"></div>', unsafe_allow_html=True)
+            cols2 = st.columns(5)
+            for idx, track in enumerate(top_tracks[5:10], 6):
+                with cols2[idx-6]:
+                    st.markdown(f'''
                 <div class="metric-card" style="padding: 20px;">
                     <div style="font-size: 2.5em; color: #8b5cf6; font-weight: 900; margin-bottom: 8px;">#{idx}</div>
                     <div style="font-size: 0.95em; margin: 12px 0; font-weight: 700; color: #f1f5f9; min-height: 40px;">{clean_text(track['track'], 35)}</div>
@@ -771,70 +644,84 @@ if top_tracks:
                     </div>
                 </div>
                 ''', unsafe_allow_html=True)
-else:
-    st.markdown('<p style="color: #64748b; text-align: center; padding: 20px;"><i class="fas fa-info-circle"></i> Aucune donnée de recherche disponible. Commencez à explorer des chansons !</p>', unsafe_allow_html=True)
+    else:
+        st.markdown('<p style="color: #64748b; text-align: center; padding: 20px;"><i class="fas fa-info-circle"></i> Aucune donnée de recherche disponible. Commencez à explorer des chansons !</p>', unsafe_allow_html=True)
 
-st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-# ================= FILTRES =================
-st.markdown('<div class="filter-card">', unsafe_allow_html=True)
-st.markdown('<h3 class="icon-title"><i class="fas fa-filter"></i> Filtres de recherche</h3>', unsafe_allow_html=True)
+    # ================= FILTRES =================
+    st.markdown('<div class="filter-card">', unsafe_allow_html=True)
+    st.markdown('<h3 class="icon-title"><i class="fas fa-filter"></i> Filtres de recherche</h3>', unsafe_allow_html=True)
 
-col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = st.columns(3)
 
-with col1:
-    st.markdown('<div class="filter-label"><i class="fas fa-user-music"></i> Artiste</div>', unsafe_allow_html=True)
-    artists = ["Tous les artistes"] + get_all_artists()
-    selected_artist = st.selectbox("", artists, label_visibility="collapsed", key="artist_filter")
+    with col1:
+        st.markdown('<div class="filter-label"><i class="fas fa-user-music"></i> Artiste</div>', unsafe_allow_html=True)
+        artists = ["Tous les artistes"] + get_all_artists()
+        selected_artist = st.selectbox("", artists, label_visibility="collapsed", key="artist_filter")
 
-with col2:
-    st.markdown('<div class="filter-label"><i class="fas fa-guitar"></i> Genre</div>', unsafe_allow_html=True)
-    genres = ["Tous les genres"] + get_all_genres()
-    selected_genre = st.selectbox("", genres, label_visibility="collapsed", key="genre_filter")
+    with col2:
+        st.markdown('<div class="filter-label"><i class="fas fa-guitar"></i> Genre</div>', unsafe_allow_html=True)
+        genres = ["Tous les genres"] + get_all_genres()
+        selected_genre = st.selectbox("", genres, label_visibility="collapsed", key="genre_filter")
 
-with col3:
-    st.markdown('<div class="filter-label"><i class="fas fa-fire"></i> Popularité</div>', unsafe_allow_html=True)
-    popularity_range = st.slider("", 0, 100, (0, 100), label_visibility="collapsed", key="popularity_filter")
+    with col3:
+        st.markdown('<div class="filter-label"><i class="fas fa-fire"></i> Popularité</div>', unsafe_allow_html=True)
+        popularity_range = st.slider("", 0, 100, (0, 100), label_visibility="collapsed", key="popularity_filter")
 
-st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-# ================= SELECTION =================
-tracks = get_tracks(
-    artist_filter=selected_artist,
-    genre_filter=selected_genre,
-    min_popularity=popularity_range[0],
-    max_popularity=popularity_range[1]
-)
+    # ================= SELECTION =================
+    filters = dict(
+        artist_filter=selected_artist,
+        genre_filter=selected_genre,
+        min_popularity=popularity_range[0],
+        max_popularity=popularity_range[1]
+    )
+    n_tracks = count_tracks(**filters)
 
-if not tracks:
-    st.warning("Aucune chanson ne correspond à vos critères de filtrage.")
-    st.markdown('<div style="background: rgba(245, 158, 11, 0.1); padding: 16px; border-radius: 12px; border-left: 4px solid #f59e0b; color: #fbbf24;"><i class="fas fa-exclamation-triangle" style="margin-right: 8px;"></i> Aucune chanson ne correspond à vos critères de filtrage.</div>', unsafe_allow_html=True)
-    st.stop()
+    if not n_tracks:
+        st.warning("Aucune chanson ne correspond à vos critères de filtrage.")
+        st.markdown('<div style="background: rgba(245, 158, 11, 0.1); padding: 16px; border-radius: 12px; border-left: 4px solid #f59e0b; color: #fbbf24;"><i class="fas fa-exclamation-triangle" style="margin-right: 8px;"></i> Aucune chanson ne correspond à vos critères de filtrage.</div>', unsafe_allow_html=True)
+        st.stop()
 
-st.markdown('<div class="search-section">', unsafe_allow_html=True)
-st.markdown(f'''
+    st.markdown('<div class="search-section">', unsafe_allow_html=True)
+    st.markdown(f'''
 <div class="search-label">
     <i class="fas fa-search"></i> 
     Rechercher une chanson
-    <span class="results-badge">{len(tracks)} résultats</span>
+    <span class="results-badge">{n_tracks} résultats</span>
 </div>
 ''', unsafe_allow_html=True)
-selected = st.selectbox("", tracks, format_func=lambda x: clean_text(x), label_visibility="collapsed")
-st.markdown('</div>', unsafe_allow_html=True)
-
-if selected:
-    # Incrémenter le compteur de recherche
-    search_count = increment_search_count(selected)
-    
-    info = get_track_info(selected)
-
-    # Titre avec badge tendance si > 10 recherches
-    title_html = '<h2 class="icon-title"><i class="fas fa-play-circle"></i> Now Playing'
-    if search_count > 10:
-        title_html += f' <span style="background: linear-gradient(135deg, #f59e0b, #ef4444); color: white; padding: 6px 14px; border-radius: 20px; font-size: 0.5em; font-weight: 700; vertical-align: middle; margin-left: 12px;"><i class="fas fa-fire"></i> TENDANCE · {search_count} recherches</span>'
-    title_html += '</h2>'
-    st.markdown(title_html, unsafe_allow_html=True)
-    st.markdown(f"""
+    track_index = get_track_index(**filters)
+    # Seules les meilleures correspondances de la saisie sont envoyées au navigateur
+    query = st.text_input("", placeholder="Titre de la chanson…", label_visibility="collapsed", key="track_query")
+    matches = track_index.search(query)
+    if not matches:
+        st.info("Aucune chanson ne correspond à cette saisie.")
+    # Les options sont des track_id ; les homonymes sont distingués par leur id
+    labels = [track_index.label(tid) for tid in matches]
+    def track_label(tid):
+        label = track_index.label(tid)
+        return clean_text(label) + (f" · {tid[:8]}" if labels.count(label) > 1 else "")
+    selected = st.selectbox("", matches, format_func=track_label, label_visibility="collapsed")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    if selected:
+        # Une seule requête : incrément du compteur + données de tous les onglets
+        info = get_track_detail(selected)
+        if info is None:
+            st.warning("Chanson introuvable.")
+            st.stop()
+        search_count = info["search_count"]
+
+        # Titre avec badge tendance si > 10 recherches
+        title_html = '<h2 class="icon-title"><i class="fas fa-play-circle"></i> Now Playing'
+        if search_count > 10:
+            title_html += f' <span style="background: linear-gradient(135deg, #f59e0b, #ef4444); color: white; padding: 6px 14px; border-radius: 20px; font-size: 0.5em; font-weight: 700; vertical-align: middle; margin-left: 12px;"><i class="fas fa-fire"></i> TENDANCE · {search_count} recherches</span>'
+        title_html += '</h2>'
+        st.markdown(title_html, unsafe_allow_html=True)
+        st.markdown(f"""
     <div class="card" style="background: linear-gradient(135deg, rgba(59, 130, 246, 0.2), rgba(139, 92, 246, 0.2)); border: 2px solid rgba(59, 130, 246, 0.4);">
       <div style="display: flex; align-items: center; gap: 16px; margin-bottom: 16px;">
         <i class="fas fa-compact-disc" style="font-size: 3em; color: #60a5fa; animation: spin 4s linear infinite;"></i>
@@ -855,16 +742,16 @@ if selected:
     </style>
     """, unsafe_allow_html=True)
 
-    # ================= TABS =================
-    tab1, tab2, tab3, tab4 = st.tabs([
-        " Analyse Audio", 
-        " Recommandations", 
-        " Graphe", 
-        " Détails"
-    ])
+        # ================= TABS =================
+        tab1, tab2, tab3, tab4 = st.tabs([
+            " Analyse Audio", 
+            " Recommandations", 
+            " Graphe", 
+            " Détails"
+        ])
     
-    # Custom tab styling with icons
-    st.markdown('''
+        # Custom tab styling with icons
+        st.markdown('''
     <style>
     .stTabs [data-baseweb="tab"]:nth-child(1)::before {
         content: "\\f080";
@@ -893,30 +780,30 @@ if selected:
     </style>
     ''', unsafe_allow_html=True)
 
-    # ================= TAB 1: AUDIO ANALYSIS =================
-    with tab1:
-        st.markdown('<div class="tab-content">', unsafe_allow_html=True)
+        # ================= TAB 1: AUDIO ANALYSIS =================
+        with tab1:
+            st.markdown('<div class="tab-content">', unsafe_allow_html=True)
         
-        st.markdown('<h3 class="icon-title"><i class="fas fa-gauge-high"></i> Métriques principales</h3>', unsafe_allow_html=True)
-        c1,c2,c3 = st.columns(3)
-        with c1:
-            st.markdown(f'''
+            st.markdown('<h3 class="icon-title"><i class="fas fa-gauge-high"></i> Métriques principales</h3>', unsafe_allow_html=True)
+            c1,c2,c3 = st.columns(3)
+            with c1:
+                st.markdown(f'''
             <div class="metric-card">
                 <i class="fas fa-fire metric-icon" style="color:#ef4444;"></i>
                 <div class="metric-label">Popularité</div>
                 <div class="metric-value">{info["popularity"]}</div>
             </div>
             ''', unsafe_allow_html=True)
-        with c2:
-            st.markdown(f'''
+            with c2:
+                st.markdown(f'''
             <div class="metric-card">
                 <i class="fas fa-bolt metric-icon" style="color:#f59e0b;"></i>
                 <div class="metric-label">Énergie</div>
                 <div class="metric-value">{round(info["energy"],2)}</div>
             </div>
             ''', unsafe_allow_html=True)
-        with c3:
-            st.markdown(f'''
+            with c3:
+                st.markdown(f'''
             <div class="metric-card">
                 <i class="fas fa-smile metric-icon" style="color:#10b981;"></i>
                 <div class="metric-label">Valence</div>
@@ -924,18 +811,18 @@ if selected:
             </div>
             ''', unsafe_allow_html=True)
 
-        st.markdown('<h3 class="icon-title" style="margin-top:24px;"><i class="fas fa-sliders-h"></i> Caractéristiques détaillées</h3>', unsafe_allow_html=True)
-        cols = st.columns(5)
-        feats = ["danceability","acousticness",
-                 "instrumentalness","liveness","speechiness"]
-        icons = ["fa-walking", "fa-volume-off", "fa-guitar", "fa-microphone-alt", "fa-comment"]
-        colors = ["#8b5cf6", "#06b6d4", "#f59e0b", "#ef4444", "#10b981"]
-        labels = ["Danceability", "Acousticness", "Instrumentalness", "Liveness", "Speechiness"]
+            st.markdown('<h3 class="icon-title" style="margin-top:24px;"><i class="fas fa-sliders-h"></i> Caractéristiques détaillées</h3>', unsafe_allow_html=True)
+            cols = st.columns(5)
+            feats = ["danceability","acousticness",
+                     "instrumentalness","liveness","speechiness"]
+            icons = ["fa-walking", "fa-volume-off", "fa-guitar", "fa-microphone-alt", "fa-comment"]
+            colors = ["#8b5cf6", "#06b6d4", "#f59e0b", "#ef4444", "#10b981"]
+            labels = ["Danceability", "Acousticness", "Instrumentalness", "Liveness", "Speechiness"]
         
-        for col, f, icon, color, label in zip(cols, feats, icons, colors, labels):
-            value = float(info[f])
-            percentage = int(value * 100)
-            col.markdown(f'''
+            for col, f, icon, color, label in zip(cols, feats, icons, colors, labels):
+                value = float(info[f])
+                percentage = int(value * 100)
+                col.markdown(f'''
             <div class="feature-bar">
                 <div class="feature-icon"><i class="fas {icon}" style="color:{color};"></i></div>
                 <div class="feature-label">{label}</div>
@@ -946,18 +833,35 @@ if selected:
             </div>
             ''', unsafe_allow_html=True)
         
-        st.markdown('</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
 
-    # ================= TAB 2: RECOMMENDATIONS =================
-    with tab2:
-        st.markdown('<div class="tab-content">', unsafe_allow_html=True)
+        # ================= TAB 2: RECOMMENDATIONS =================
+        with tab2:
+            st.markdown('<div class="tab-content">', unsafe_allow_html=True)
         
-        recs = get_recommendations(selected)
-        if recs:
-            st.markdown(f'<p style="color:#64748b; margin-bottom:16px;"><i class="fas fa-lightbulb"></i> Découvrez {len(recs)} chansons similaires basées sur cette sélection</p>', unsafe_allow_html=True)
+            # Service k-NN en mémoire : respecte les filtres de la page ; sinon,
+            # les arêtes SIMILAR_TO déjà lues avec le détail
+            recommender = get_recommender()
+            recs = None
+            if recommender is not None:
+                exclude_same = st.checkbox("Exclure les artistes de cette chanson", key="rec_exclude_artists")
+                try:
+                    recs = recommender.recommend(
+                        info["track_id"],
+                        genre=None if selected_genre == "Tous les genres" else selected_genre,
+                        min_popularity=popularity_range[0],
+                        max_popularity=popularity_range[1],
+                        exclude_same_artists=exclude_same,
+                    )
+                except Exception as exc:
+                    st.caption(f"Service de recommandation indisponible ({type(exc).__name__}) : arêtes SIMILAR_TO")
+            if recs is None:
+                recs = info["recommendations"]
+            if recs:
+                st.markdown(f'<p style="color:#64748b; margin-bottom:16px;"><i class="fas fa-lightbulb"></i> Découvrez {len(recs)} chansons similaires basées sur cette sélection</p>', unsafe_allow_html=True)
             
-            for idx, r in enumerate(recs, 1):
-                st.markdown(f"""
+                for idx, r in enumerate(recs, 1):
+                    st.markdown(f"""
                 <div class="card">
                     <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:12px;">
                         <p style="font-size:1.1em; margin:0;"><i class="fas fa-music" style="color:#3b82f6;"></i> <b>{clean_text(r['track'])}</b></p>
@@ -977,17 +881,17 @@ if selected:
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
-        else:
-            st.markdown('<div style="background: rgba(59, 130, 246, 0.1); padding: 16px; border-radius: 12px; border-left: 4px solid #3b82f6; color: #60a5fa;"><i class="fas fa-info-circle" style="margin-right: 8px;"></i> Aucune recommandation disponible pour cette chanson.</div>', unsafe_allow_html=True)
+            else:
+                st.markdown('<div style="background: rgba(59, 130, 246, 0.1); padding: 16px; border-radius: 12px; border-left: 4px solid #3b82f6; color: #60a5fa;"><i class="fas fa-info-circle" style="margin-right: 8px;"></i> Aucune recommandation disponible pour cette chanson.</div>', unsafe_allow_html=True)
         
-        st.markdown('</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
 
-    # ================= TAB 3: GRAPH =================
-    with tab3:
-        st.markdown('<div class="tab-content">', unsafe_allow_html=True)
+        # ================= TAB 3: GRAPH =================
+        with tab3:
+            st.markdown('<div class="tab-content">', unsafe_allow_html=True)
         
-        st.markdown('<h3 class="icon-title"><i class="fas fa-info-circle"></i> Clé de lecture</h3>', unsafe_allow_html=True)
-        st.markdown("""
+            st.markdown('<h3 class="icon-title"><i class="fas fa-info-circle"></i> Clé de lecture</h3>', unsafe_allow_html=True)
+            st.markdown("""
         <div class="card">
             <div class="legend-item"><span class="legend-icon">⭐</span> <b>Chanson sélectionnée</b> - Le centre du graphe</div>
             <div class="legend-item"><span class="legend-icon">♪</span> <b>Chanson similaire</b> - Recommandations</div>
@@ -997,28 +901,38 @@ if selected:
         </div>
         """, unsafe_allow_html=True)
         
-        st.markdown('<h3 class="icon-title" style="margin-top:20px;"><i class="fas fa-project-diagram"></i> Graphe local interactif</h3>', unsafe_allow_html=True)
-        st.markdown('<p style="color:#64748b; font-size:0.9em;"><i class="fas fa-mouse"></i> Glissez pour déplacer les nœuds • Zoom pour zoomer</p>', unsafe_allow_html=True)
-        render_graph(selected)
+            st.markdown('<h3 class="icon-title" style="margin-top:20px;"><i class="fas fa-project-diagram"></i> Graphe local interactif</h3>', unsafe_allow_html=True)
+            st.markdown('<p style="color:#64748b; font-size:0.9em;"><i class="fas fa-mouse"></i> Glissez pour déplacer les nœuds • Zoom pour zoomer</p>', unsafe_allow_html=True)
+            # Exploration bornée : profondeur, voisins par nœud, nœuds au total
+            gcol1, gcol2, gcol3 = st.columns(3)
+            with gcol1:
+                hops = st.slider("Profondeur (sauts)", 1, 3, 1, key="graph_hops")
+            with gcol2:
+                fan_out = st.slider("Voisins par nœud", 2, 25, EXPLORE_FAN_OUT, key="graph_fan_out",
+                                    disabled=hops == 1)
+            with gcol3:
+                max_nodes = st.slider("Nœuds max", 20, 400, EXPLORE_MAX_NODES, step=10, key="graph_max_nodes",
+                                      disabled=hops == 1)
+            render_graph(info, hops, fan_out, max_nodes)
         
-        st.markdown('</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
 
-    # ================= TAB 4: DETAILS =================
-    with tab4:
-        st.markdown('<div class="tab-content">', unsafe_allow_html=True)
+        # ================= TAB 4: DETAILS =================
+        with tab4:
+            st.markdown('<div class="tab-content">', unsafe_allow_html=True)
         
-        st.markdown('<h3 class="icon-title"><i class="fas fa-file-alt"></i> Informations complètes</h3>', unsafe_allow_html=True)
+            st.markdown('<h3 class="icon-title"><i class="fas fa-file-alt"></i> Informations complètes</h3>', unsafe_allow_html=True)
         
-        col1, col2 = st.columns(2)
+            col1, col2 = st.columns(2)
         
-        with col1:
-            st.markdown("""
+            with col1:
+                st.markdown("""
             <div class="card">
                 <h4><i class="fas fa-music"></i> Chanson</h4>
                 <p style="font-size:1.1em; color:#3b82f6; font-weight:600; margin-bottom:8px;"></p>
             </div>
             """, unsafe_allow_html=True)
-            st.markdown(f"""
+                st.markdown(f"""
             <div class="card">
                 <p><b>Titre:</b> {clean_text(info['track'], 100)}</p>
                 <p><b>Artistes:</b> {', '.join(clean_list(info['artists']))}</p>
@@ -1026,24 +940,24 @@ if selected:
             </div>
             """, unsafe_allow_html=True)
         
-        with col2:
-            st.markdown("""
+            with col2:
+                st.markdown("""
             <div class="card">
                 <h4><i class="fas fa-chart-bar"></i> Statistiques</h4>
             </div>
             """, unsafe_allow_html=True)
             
-            stats = [
-                ("Popularité", info["popularity"], "fa-fire", "#ef4444"),
-                ("Énergie", round(info["energy"], 2), "fa-bolt", "#f59e0b"),
-                ("Valence", round(info["valence"], 2), "fa-smile", "#10b981"),
-                ("Danceability", int(float(info["danceability"]) * 100), "fa-person-walking", "#8b5cf6"),
-                ("Acousticness", int(float(info["acousticness"]) * 100), "fa-guitar", "#06b6d4"),
-                ("Instrumentalness", int(float(info["instrumentalness"]) * 100), "fa-music", "#ec4899"),
-            ]
+                stats = [
+                    ("Popularité", info["popularity"], "fa-fire", "#ef4444"),
+                    ("Énergie", round(info["energy"], 2), "fa-bolt", "#f59e0b"),
+                    ("Valence", round(info["valence"], 2), "fa-smile", "#10b981"),
+                    ("Danceability", int(float(info["danceability"]) * 100), "fa-person-walking", "#8b5cf6"),
+                    ("Acousticness", int(float(info["acousticness"]) * 100), "fa-guitar", "#06b6d4"),
+                    ("Instrumentalness", int(float(info["instrumentalness"]) * 100), "fa-music", "#ec4899"),
+                ]
             
-            for stat_name, stat_value, icon_class, icon_color in stats:
-                st.markdown(f"""
+                for stat_name, stat_value, icon_class, icon_color in stats:
+                    st.markdown(f"""
                 <div style="background:rgba(59,130,246,0.05); padding:16px; border-radius:12px; margin-bottom:10px; border-left:4px solid {icon_color}; backdrop-filter: blur(10px);">
                     <div style="display: flex; align-items: center; gap: 12px; margin-bottom: 8px;">
                         <i class="fas {icon_class}" style="font-size: 1.5em; color: {icon_color};"></i>
@@ -1053,4 +967,5 @@ if selected:
                 </div>
                 """, unsafe_allow_html=True)
         
-        st.markdown('</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from neighbors import BACKENDS, BLOCK_SIZE, TOP_K, normalized_pair, topk_neighbors
+from similarity import AUDIO_FEATURES, build_embeddings, neighbors_frame
+from tables import FORMATS, parse_formats, write_path
+
+# ================= CONFIG =================
+SIZES = [10_000, 100_000, 1_000_000]
+TEXT_DIM = 384          # all-MiniLM-L6-v2
+OUTPUT_JSON = "bench_similarity.json"
+# Top-k exact en O(n²) : au-delà, seul un échantillon de requêtes est
+# chronométré et la durée est extrapolée (marquée dans le JSON)
+MAX_EXACT_QUERIES = 20_000
+# Régression tolérée par étape (relative) et durée en dessous de laquelle une
+# étape est trop courte pour être comparée
+THRESHOLD = 0.10
+MIN_SECONDS = 0.05
+
+# ================= DONNÉES SYNTHÉTIQUES =================
+def synthetic_input(n, seed=0):
+    """(table au format tracks_embeddings_input, vecteurs texte (n, 384)).
+
+    Les vecteurs texte remplacent la sortie du modèle : normalisés L2 comme
+    ceux de sentence-transformers, regroupés autour de quelques centaines de
+    « thèmes » pour que le top-k ne soit pas celui d'un bruit uniforme.
+    """
+    rng = np.random.default_rng(seed)
+    n_topics = max(16, int(np.sqrt(n)))
+    topics = rng.normal(size=(n_topics, TEXT_DIM)).astype(np.float32)
+    text = topics[rng.integers(0, n_topics, n)] + 0.5 * rng.normal(size=(n, TEXT_DIM)).astype(np.float32)
+    text /= np.linalg.norm(text, axis=1, keepdims=True)
+
+    audio = {
+        "danceability": rng.random(n), "energy": rng.random(n),
+        "speechiness": rng.beta(1, 8, n), "acousticness": rng.random(n),
+        "instrumentalness": rng.beta(0.5, 3, n), "liveness": rng.beta(2, 8, n),
+        "valence": rng.random(n), "tempo": rng.normal(120, 30, n).clip(40, 220),
+    }
+    df = pd.DataFrame({
+        "track_id": [f"bench{i:07d}" for i in range(n)],
+        "embedding_text": [f"track {i} by artist {i % 997} genre g{i % 114}" for i in range(n)],
+        **{col: audio[col].astype(np.float32) for col in AUDIO_FEATURES},
+    })
+    return df, text
+
+# ================= MESURE =================
+def peak_rss_mb():
+    # ru_maxrss : Ko sous Linux, octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_size(n, backend="exact", k=TOP_K, block_size=BLOCK_SIZE, formats=("csv",),
+             max_exact_queries=MAX_EXACT_QUERIES, seed=0):
+    """Chronomètre chaque étape pour n lignes ; exécuté dans un processus
+    dédié pour que le pic de RSS soit celui de cette taille."""
+    stages, rss = {}, {}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        stages[name] = time.perf_counter() - start
+        rss[name] = peak_rss_mb()
+        return result
+
+    df, text = timed("generate", lambda: synthetic_input(n, seed))
+    combined, _ = timed("combine", lambda: build_embeddings(df, encode_fn=lambda texts: text))
+    del text
+    exact, fast = timed("normalize", lambda: normalized_pair(combined))
+    del combined
+
+    extrapolated = False
+    if backend == "exact":
+        n_queries = min(n, max_exact_queries)
+        query_rows = np.arange(n_queries)
+        neighbors, scores = timed("topk", lambda: topk_neighbors(exact, k, block_size, query_rows,
+                                                                  fast=fast))
+        if n_queries < n:
+            stages["topk"] *= n / n_queries
+            extrapolated = True
+            # Lignes non calculées : voisins répétés, pour chronométrer l'écriture à taille réelle
+            neighbors = np.resize(neighbors, (n, neighbors.shape[1]))
+            scores = np.resize(scores, (n, scores.shape[1]))
+    else:
+        index = timed("index_build", lambda: BACKENDS[backend](block_size=block_size).build(exact))
+        neighbors, scores = timed("topk", lambda: index.search(k=k))
+
+    out_dir = tempfile.mkdtemp(prefix="bench_similarity_")
+    try:
+        frame = timed("frame", lambda: neighbors_frame(df["track_id"], neighbors, scores))
+        timed("write", lambda: write_path(frame, os.path.join(out_dir, "tracks_similar.csv"), formats))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    return {"rows": n, "backend": backend, "k": k, "block_size": block_size,
+            "formats": list(formats), "topk_extrapolated": extrapolated,
+            "stages": stages, "total": sum(stages.values()),
+            "peak_rss_mb": rss, "peak_rss_total_mb": max(rss.values())}
+
+def run_isolated(n, repeat=1, **kwargs):
+    """Meilleur temps de repeat exécutions, chacune dans un processus neuf."""
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            runs.append(pool.submit(run_size, n, **kwargs).result())
+    best = min(runs, key=lambda r: r["total"])
+    best["stages"] = {name: min(r["stages"][name] for r in runs) for name in best["stages"]}
+    best["repeat"] = repeat
+    return best
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"date": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit or None,
+            "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+# ================= COMPARAISON =================
+def compare(baseline, current, threshold=THRESHOLD, min_seconds=MIN_SECONDS):
+    """Lignes (taille, étape, avant, après, écart) et liste des régressions."""
+    rows, regressions = [], []
+    for size, result in current["results"].items():
+        before = baseline["results"].get(size)
+        if before is None:
+            continue
+        for stage, after_s in result["stages"].items():
+            before_s = before["stages"].get(stage)
+            if before_s is None:
+                continue
+            change = (after_s - before_s) / before_s if before_s > 0 else 0.0
+            rows.append((size, stage, before_s, after_s, change))
+            if change > threshold and max(before_s, after_s) >= min_seconds:
+                regressions.append((size, stage, change))
+        before_rss, after_rss = before["peak_rss_total_mb"], result["peak_rss_total_mb"]
+        change = (after_rss - before_rss) / before_rss if before_rss > 0 else 0.0
+        rows.append((size, "peak_rss_mb", before_rss, after_rss, change))
+        if change > threshold:
+            regressions.append((size, "peak_rss_mb", change))
+    return rows, regressions
+
+def print_result(size, result):
+    flag = " (top-k extrapolé)" if result["topk_extrapolated"] else ""
+    print(f"\n{int(size):>9} lignes — {result['total']:.2f} s, pic RSS {result['peak_rss_total_mb']:.0f} Mo{flag}")
+    for stage, seconds in result["stages"].items():
+        print(f"  {stage:<12} {seconds:9.3f} s   RSS {result['peak_rss_mb'][stage]:8.0f} Mo")
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des étapes de similarity.py sur données synthétiques")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in SIZES),
+                        help="tailles de catalogue séparées par des virgules")
+    parser.add_argument("--backend", default="exact", choices=list(BACKENDS))
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    parser.add_argument("--format", default="csv", type=parse_formats,
+                        help=f"format(s) écrits parmi {', '.join(FORMATS)}")
+    parser.add_argument("--max-exact-queries", type=int, default=MAX_EXACT_QUERIES,
+                        help="au-delà, top-k exact chronométré sur un échantillon puis extrapolé")
+    parser.add_argument("--repeat", type=int, default=1, help="exécutions par taille (meilleur temps retenu)")
+    parser.add_argument("--output", default=OUTPUT_JSON)
+    parser.add_argument("--baseline", default=None, help="JSON d'un run précédent à comparer")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="régression relative tolérée par étape (0.10 = +10 %%)")
+    parser.add_argument("--compare-only", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare deux JSON existants sans rien exécuter")
+    args = parser.parse_args()
+
+    if args.compare_only:
+        with open(args.compare_only[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare_only[1]) as f:
+            report = json.load(f)
+    else:
+        report = {"environment": environment(), "results": {}}
+        for n in (int(s) for s in args.sizes.split(",") if s.strip()):
+            result = run_isolated(n, args.repeat, backend=args.backend, k=args.top_k,
+                                  block_size=args.block_size, formats=tuple(args.format),
+                                  max_exact_queries=args.max_exact_queries)
+            report["results"][str(n)] = result
+            print_result(n, result)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nRésultats -> {args.output}")
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+
+    if baseline is not None:
+        rows, regressions = compare(baseline, report, args.threshold)
+        print(f"\n{'taille':>9} {'étape':<12} {'avant':>10} {'après':>10} {'écart':>8}")
+        for size, stage, before, after, change in rows:
+            print(f"{int(size):>9} {stage:<12} {before:10.3f} {after:10.3f} {change:+8.1%}")
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.threshold:.0%} :")
+            for size, stage, change in regressions:
+                print(f"   {size} lignes, {stage} : {change:+.1%}")
+            sys.exit(1)
+        print(f"\n✅ Aucune régression au-delà de {args.threshold:.0%}")
@@ -0,0 +1,97 @@
+import hashlib
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+# ================= CACHE D'EMBEDDINGS =================
+# Un répertoire par modèle :
+#   embeddings.npy : matrice float32 (lignes = textes déjà encodés), lue en mmap
+#   keys.npy       : empreinte SHA-1 (uint8 x 20) du texte de chaque ligne
+
+def text_key(text):
+    return hashlib.sha1(str(text).encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Cache disque adressé par contenu : seuls les textes absents sont encodés."""
+
+    def __init__(self, cache_dir, model_name):
+        self.path = os.path.join(cache_dir, model_name.replace("/", "_"))
+        self.embeddings_path = os.path.join(self.path, "embeddings.npy")
+        self.keys_path = os.path.join(self.path, "keys.npy")
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        self.embeddings = None
+        self.index = {}
+        if not (os.path.exists(self.embeddings_path) and os.path.exists(self.keys_path)):
+            return
+        self.embeddings = np.load(self.embeddings_path, mmap_mode="r")
+        keys = np.load(self.keys_path)
+        # embeddings.npy est remplacé avant keys.npy : une écriture interrompue
+        # laisse au pire des lignes sans clé, jamais une clé sans ligne
+        n = min(len(keys), len(self.embeddings))
+        self.index = {key.tobytes(): row for row, key in enumerate(keys[:n])}
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self.index)
+
+    def encode(self, texts, encode_fn):
+        """Renvoie les embeddings float32 de texts, dans l'ordre.
+
+        encode_fn(liste_de_textes) n'est appelé que pour les textes absents du
+        cache (dédoublonnés) ; le cache est ensuite enrichi sur disque.
+        """
+        keys = [text_key(t) for t in texts]
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.index and key not in missing:
+                missing[key] = str(text)
+
+        n_missing = sum(1 for key in keys if key in missing)
+        self.misses += n_missing
+        self.hits += len(keys) - n_missing
+
+        if missing:
+            new_embeddings = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            self._append(list(missing.keys()), new_embeddings)
+
+        rows = np.fromiter((self.index[key] for key in keys), dtype=np.int64, count=len(keys))
+        if len(rows) == 0:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.asarray(self.embeddings[rows])
+
+    def _append(self, new_keys, new_embeddings):
+        os.makedirs(self.path, exist_ok=True)
+        n_old = len(self.index)
+        n_new = len(new_keys)
+        dim = new_embeddings.shape[1]
+
+        tmp_embeddings = self.embeddings_path + ".tmp.npy"
+        out = open_memmap(tmp_embeddings, mode="w+", dtype=np.float32, shape=(n_old + n_new, dim))
+        # Copie par blocs pour ne jamais charger tout l'ancien cache
+        for start in range(0, n_old, 65536):
+            stop = min(start + 65536, n_old)
+            out[start:stop] = self.embeddings[start:stop]
+        out[n_old:] = new_embeddings
+        out.flush()
+        del out
+
+        old_keys = sorted(self.index, key=self.index.get)
+        all_keys = np.frombuffer(b"".join(old_keys + list(new_keys)), dtype=np.uint8).reshape(-1, 20)
+        tmp_keys = self.keys_path + ".tmp.npy"
+        np.save(tmp_keys, all_keys)
+
+        self.embeddings = None
+        os.replace(tmp_embeddings, self.embeddings_path)
+        os.replace(tmp_keys, self.keys_path)
+        self._load()
@@ -0,0 +1,169 @@
+import argparse
+import os
+import string
+import time
+
+import numpy as np
+import pandas as pd
+
+# ================= CONFIG =================
+OUTPUT_CSV = "Dataset/synthetic_dataset.csv"
+N_ROWS = 100_000
+CHUNK_SIZE = 100_000
+
+# Colonnes et séparateur de Dataset/dataset.csv (export brut, ";" en fin de
+# ligne sauf sur l'en-tête)
+COLUMNS = ["id", "track_id", "artists", "album_name", "track_name", "popularity", "duration_ms",
+           "explicit", "danceability", "energy", "key", "loudness", "mode", "speechiness",
+           "acousticness", "instrumentalness", "liveness", "valence", "tempo", "time_signature",
+           "track_genre"]
+SEP = ";"
+
+GENRES = ["acoustic", "afrobeat", "alt-rock", "ambient", "blues", "chill", "classical", "country",
+          "dance", "deep-house", "disco", "drum-and-bass", "edm", "electro", "folk", "funk",
+          "garage", "gospel", "grunge", "hard-rock", "hip-hop", "house", "indie", "indie-pop",
+          "j-pop", "jazz", "k-pop", "latin", "metal", "opera", "piano", "pop", "punk", "r-n-b",
+          "reggae", "reggaeton", "rock", "salsa", "samba", "soul", "synth-pop", "techno",
+          "trance", "world-music"]
+WORDS = ["love", "night", "heart", "fire", "dream", "summer", "rain", "light", "dance", "home",
+         "blue", "wild", "gold", "shadow", "river", "city", "forever", "tonight", "star", "road",
+         "ghost", "ocean", "acoustic", "remix", "live", "echo", "sky", "paper", "glass", "storm",
+         "é", "café", "señor", "zoë"]
+
+# Proportions par défaut, proches de l'export réel
+DUPLICATE_RATIO = 0.15     # lignes répétant un track_id déjà émis sous un autre genre
+MULTI_ARTIST_RATIO = 0.2   # lignes à plusieurs artistes ("A, B")
+MISSING_RATIO = 0.01       # champs texte / numériques vides
+MALFORMED_RATIO = 0.0      # artistes séparés par ";" comme dans l'export (lignes décalées)
+
+_ID_CHARS = np.array(list(string.ascii_letters + string.digits))
+
+def _track_ids(rng, n):
+    # (n, 22) caractères vus comme n chaînes de 22 caractères, sans boucle Python
+    chars = np.ascontiguousarray(_ID_CHARS[rng.integers(0, len(_ID_CHARS), (n, 22))])
+    return chars.view("<U22").ravel()
+
+def _titles(rng, n, min_words=1, max_words=4):
+    counts = rng.integers(min_words, max_words + 1, n)
+    words = np.array(WORDS)[rng.integers(0, len(WORDS), counts.sum())]
+    parts = np.split(words, np.cumsum(counts)[:-1])
+    return [" ".join(p).title() for p in parts]
+
+class ArtistPool:
+    """Artistes synthétiques tirés selon une loi de Zipf (quelques artistes
+    très présents, une longue traîne)."""
+
+    def __init__(self, rng, n_artists):
+        self.names = np.array([f"{t} {i}" for i, t in enumerate(_titles(rng, n_artists, 1, 2))])
+        weights = 1.0 / np.arange(1, n_artists + 1)
+        self.p = weights / weights.sum()
+
+    def sample(self, rng, n, multi_ratio, sep):
+        first = rng.choice(len(self.names), n, p=self.p)
+        second = rng.choice(len(self.names), n, p=self.p)
+        multi = rng.random(n) < multi_ratio
+        artists = self.names[first].astype(object)
+        artists[multi] = self.names[first[multi]] + sep + self.names[second[multi]]
+        return artists
+
+def generate_chunk(rng, start, n, pool, catalog, duplicate_ratio=DUPLICATE_RATIO,
+                   multi_artist_ratio=MULTI_ARTIST_RATIO, missing_ratio=MISSING_RATIO,
+                   malformed_ratio=MALFORMED_RATIO):
+    """n lignes brutes à partir de l'index start.
+
+    catalog : lignes déjà émises (track_id, artists, album, name, numériques)
+    dans lesquelles les doublons inter-genres sont tirés.
+    """
+    df = pd.DataFrame({"id": np.arange(start, start + n)})
+    df["track_id"] = _track_ids(rng, n)
+    df["artists"] = pool.sample(rng, n, multi_artist_ratio, ", ")
+    malformed = rng.random(n) < malformed_ratio
+    df.loc[malformed, "artists"] = pool.sample(rng, int(malformed.sum()), 1.0, ";")
+    df["album_name"] = _titles(rng, n)
+    df["track_name"] = _titles(rng, n)
+    df["popularity"] = rng.binomial(100, 0.35, n)
+    df["duration_ms"] = rng.normal(215_000, 50_000, n).clip(30_000, 900_000).astype(np.int64)
+    df["explicit"] = np.where(rng.random(n) < 0.09, "True", "False")
+    df["danceability"] = rng.beta(5, 3, n).round(3)
+    df["energy"] = rng.beta(3, 2, n).round(3)
+    df["key"] = rng.integers(0, 12, n)
+    df["loudness"] = rng.normal(-8, 4, n).clip(-50, 4).round(3)
+    df["mode"] = rng.integers(0, 2, n)
+    df["speechiness"] = rng.beta(1, 12, n).round(4)
+    df["acousticness"] = rng.beta(0.6, 1.5, n).round(4)
+    df["instrumentalness"] = (rng.beta(0.2, 4, n) * (rng.random(n) < 0.3)).round(6)
+    df["liveness"] = rng.beta(2, 9, n).round(4)
+    df["valence"] = rng.beta(2.5, 2.5, n).round(3)
+    df["tempo"] = rng.normal(122, 29, n).clip(40, 240).round(3)
+    df["time_signature"] = rng.choice([3, 4, 4, 4, 5], n)
+    df["track_genre"] = np.array(GENRES)[rng.integers(0, len(GENRES), n)]
+
+    # Tout en texte à partir d'ici : les lignes du catalogue portent des champs vides
+    df = df.astype(object)
+
+    # Doublons : même chanson (id Spotify et attributs) sous un autre genre,
+    # tirée parmi les chunks précédents et les lignes originales de celui-ci
+    is_dup = rng.random(n) < duplicate_ratio
+    pool = pd.concat([catalog, df[~is_dup]], ignore_index=True)
+    dup = np.flatnonzero(is_dup)
+    if len(dup) and len(pool):
+        source = pool.iloc[rng.integers(0, len(pool), len(dup))]
+        cols = [c for c in df.columns if c not in ("id", "track_genre")]
+        df.loc[dup, cols] = source[cols].to_numpy()
+        # Jamais le genre de la ligne copiée (sinon doublon exact, pas inter-genres)
+        same = df.loc[dup, "track_genre"].to_numpy() == source["track_genre"].to_numpy()
+        genre_idx = pd.Index(GENRES).get_indexer(source["track_genre"].to_numpy()[same])
+        shift = rng.integers(1, len(GENRES), same.sum())
+        df.loc[dup[same], "track_genre"] = np.array(GENRES)[(genre_idx + shift) % len(GENRES)]
+
+    # Valeurs manquantes (champs vides dans l'export)
+    for col in ["artists", "album_name", "track_name", "popularity", "energy", "valence", "tempo"]:
+        df.loc[rng.random(n) < missing_ratio, col] = ""
+    return df
+
+def write_chunk(df, f):
+    # Ni guillemets ni échappement, ";" final : la disposition de l'export
+    # Concaténation colonne par colonne (vectorisée), pas ligne par ligne
+    lines = df[COLUMNS[0]].astype(str)
+    for col in COLUMNS[1:]:
+        lines = lines + SEP + df[col].astype(str)
+    f.write("".join(lines + SEP + "\n"))
+
+def generate(path, n_rows=N_ROWS, seed=0, chunk_size=CHUNK_SIZE, catalog_size=50_000, **ratios):
+    """Écrit n_rows lignes brutes dans path, chunk par chunk ; renvoie n_rows."""
+    rng = np.random.default_rng(seed)
+    pool = ArtistPool(rng, max(100, n_rows // 8))
+    catalog = pd.DataFrame()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(SEP.join(COLUMNS) + "\n")
+        for start in range(0, n_rows, chunk_size):
+            n = min(chunk_size, n_rows - start)
+            df = generate_chunk(rng, start, n, pool, catalog, **ratios)
+            write_chunk(df, f)
+            # Réservoir borné de lignes pour les doublons des chunks suivants
+            catalog = pd.concat([catalog, df.sample(min(n, catalog_size), random_state=start)])
+            catalog = catalog.iloc[-catalog_size:]
+    return n_rows
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un export brut synthétique au format de Dataset/dataset.csv")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--rows", type=int, default=N_ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--duplicate-ratio", type=float, default=DUPLICATE_RATIO)
+    parser.add_argument("--multi-artist-ratio", type=float, default=MULTI_ARTIST_RATIO)
+    parser.add_argument("--missing-ratio", type=float, default=MISSING_RATIO)
+    parser.add_argument("--malformed-ratio", type=float, default=MALFORMED_RATIO,
+                        help="part de lignes aux artistes séparés par ';' (colonnes décalées, comme l'export réel)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generate(args.output, args.rows, args.seed, args.chunksize,
+             duplicate_ratio=args.duplicate_ratio, multi_artist_ratio=args.multi_artist_ratio,
+             missing_ratio=args.missing_ratio, malformed_ratio=args.malformed_ratio)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(args.output) / 1e6
+    print(f"✅ {args.rows} lignes ({size:.1f} Mo) -> {args.output} en {elapsed:.1f} s")
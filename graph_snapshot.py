@@ -0,0 +1,363 @@
+import argparse
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from tables import AUDIO_FEATURES, FORMATS, read_path, table_path
+
+# ================= CONFIG =================
+DATA_DIR = "Dataset"
+# Intervalle (s) entre deux vérifications des tables sources
+CHECK_INTERVAL = 30
+# Voisins SIMILAR_TO renvoyés, comme get_recommendations
+RECOMMENDATIONS = 5
+
+TABLES = ["tracks", "artists", "genres", "track_artist_rel", "track_genre_rel"]
+# Facultative : produite par similarity.py
+SIMILAR_TABLE = "tracks_similar"
+
+def source_paths(data_dir=DATA_DIR, fmt=None):
+    """{table: chemin} des tables sources présentes."""
+    paths = {name: table_path(data_dir, name, fmt) for name in TABLES}
+    try:
+        paths[SIMILAR_TABLE] = table_path(data_dir, SIMILAR_TABLE, fmt)
+    except FileNotFoundError:
+        pass
+    return paths
+
+def source_version(paths):
+    """Version d'un jeu de tables : empreinte de leurs chemins, tailles et dates."""
+    digest = hashlib.sha1()
+    for name in sorted(paths):
+        st = os.stat(paths[name])
+        digest.update(f"{paths[name]}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+def _csr(src, dst, n, data=None, loops=True):
+    """Adjacence compressée par ligne source : (ptr, dst[, data]) triés par src.
+
+    loops=False écarte les arêtes d'un nœud vers lui-même.
+    """
+    keep = (src >= 0) & (dst >= 0)
+    if not loops:
+        keep &= src != dst
+    src, dst = src[keep], dst[keep]
+    order = np.lexsort((dst, src))
+    src, dst = src[order], dst[order]
+    # Une seule arête par couple (src, dst)
+    first = np.ones(len(src), dtype=bool)
+    first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    ptr = np.searchsorted(src[first], np.arange(n + 1)).astype(np.int64)
+    if data is None:
+        return ptr, dst[first].astype(np.int32)
+    return ptr, dst[first].astype(np.int32), data[keep][order][first]
+
+
+class GraphSnapshot:
+    """Copie en lecture seule du graphe Track / Artist / Genre, en tableaux.
+
+    - nœuds internés : track_ids / artist_ids / genre_ids, position = identifiant interne ;
+    - adjacences CSR (ptr, idx) : PERFORMED_BY et IN_GENRE dans les deux sens,
+      SIMILAR_TO avec ses scores ;
+    - features audio en colonnes float32, popularité en int16.
+
+    Construit depuis les tables préparées (celles que charge load_neo4j.py),
+    donc identique au graphe Neo4j tant que le pipeline n'a pas été relancé.
+    """
+
+    def __init__(self, paths, version=None):
+        self.version = version or source_version(paths)
+        self.built_at = time.time()
+        frames = {name: read_path(path) for name, path in paths.items()}
+
+        tracks = frames["tracks"].drop_duplicates("track_id")
+        tracks = tracks[tracks["track_id"].notna()]
+        self.track_ids = tracks["track_id"].astype(str).to_numpy()
+        self.track_index = pd.Index(self.track_ids)
+        self.track_names = tracks["track_name"].fillna("").astype(str).to_numpy()
+        self.popularity = tracks["popularity"].fillna(0).to_numpy(dtype=np.int16)
+        self.audio = {col: tracks[col].fillna(0).to_numpy(dtype=np.float32)
+                      for col in AUDIO_FEATURES if col in tracks.columns}
+
+        artists = frames["artists"].drop_duplicates("artist_id")
+        self.artist_ids = artists["artist_id"].astype(str).to_numpy()
+        self.artist_names = artists["artist_name"].fillna("").astype(str).to_numpy()
+        self.artist_index = artist_index = pd.Index(self.artist_ids)
+
+        genres = frames["genres"].drop_duplicates("genre_id")
+        self.genre_ids = genres["genre_id"].astype(str).to_numpy()
+        self.genre_names = genres["genre_name"].fillna("").astype(str).to_numpy()
+        self.genre_index = genre_index = pd.Index(self.genre_ids)
+
+        n = len(self.track_ids)
+        rel = frames["track_artist_rel"]
+        t = self.track_index.get_indexer(rel["track_id"].astype(str))
+        a = artist_index.get_indexer(rel["artist_id"].astype(str))
+        self.performed_by = _csr(t, a, n)
+        self.performs = _csr(a, t, len(self.artist_ids))
+
+        rel = frames["track_genre_rel"]
+        t = self.track_index.get_indexer(rel["track_id"].astype(str))
+        g = genre_index.get_indexer(rel["genre_id"].astype(str))
+        self.in_genre = _csr(t, g, n)
+        self.genre_tracks = _csr(g, t, len(self.genre_ids))
+
+        if SIMILAR_TABLE in frames:
+            rel = frames[SIMILAR_TABLE]
+            self.similar_to = _csr(self.track_index.get_indexer(rel["track_id"].astype(str)),
+                                   self.track_index.get_indexer(rel["similar_track_id"].astype(str)),
+                                   n, rel["score"].to_numpy(dtype=np.float32), loops=False)
+        else:
+            self.similar_to = (np.zeros(n + 1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                               np.empty(0, dtype=np.float32))
+
+        # Listes des filtres, triées comme les requêtes Cypher
+        self.artist_by_name = pd.Series(np.arange(len(self.artist_ids)), index=self.artist_names)
+        self.artist_by_name = self.artist_by_name[self.artist_names != ""]
+        self.genre_by_id = pd.Series(np.arange(len(self.genre_ids)), index=self.genre_ids)
+        # Ordre (nom, track_id) des listes de chansons
+        self.name_order = np.lexsort((self.track_ids, self.track_names))
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    @staticmethod
+    def _row(adjacency, i):
+        ptr, idx = adjacency[0], adjacency[1]
+        return idx[ptr[i]:ptr[i + 1]]
+
+    def _track(self, track_id):
+        i = self.track_index.get_indexer([track_id])[0]
+        return None if i < 0 else i
+
+    # ----- Listes des filtres -----
+    def all_artists(self):
+        return sorted(set(self.artist_by_name.index))
+
+    def all_genres(self):
+        return sorted(self.genre_ids.tolist())
+
+    def filter_mask(self, artist_filter=None, genre_filter=None, min_popularity=0, max_popularity=100):
+        mask = (self.popularity >= min_popularity) & (self.popularity <= max_popularity)
+        mask &= self.track_names != ""
+        if artist_filter and artist_filter != "Tous les artistes":
+            rows = np.zeros(len(self), dtype=bool)
+            artists = self.artist_by_name.get(artist_filter)
+            for a in np.atleast_1d(artists if artists is not None else []):
+                rows[self._row(self.performs, a)] = True
+            mask &= rows
+        if genre_filter and genre_filter != "Tous les genres":
+            rows = np.zeros(len(self), dtype=bool)
+            g = self.genre_by_id.get(genre_filter)
+            if g is not None:
+                rows[self._row(self.genre_tracks, g)] = True
+            mask &= rows
+        return mask
+
+    def tracks(self, **filters):
+        """[(track_id, nom)] filtrés, triés par nom puis id (cf. get_tracks)."""
+        mask = self.filter_mask(**filters)
+        order = self.name_order[mask[self.name_order]]
+        return list(zip(self.track_ids[order].tolist(), self.track_names[order].tolist()))
+
+    def count_tracks(self, **filters):
+        return int(self.filter_mask(**filters).sum())
+
+    # ----- Chanson -----
+    def artists_of(self, i):
+        return self.artist_names[self._row(self.performed_by, i)].tolist()
+
+    def genres_of(self, i):
+        return self.genre_names[self._row(self.in_genre, i)].tolist()
+
+    def track_info(self, track_id):
+        """Même champs que get_track_info, ou None."""
+        i = self._track(track_id)
+        if i is None:
+            return None
+        info = {"track_id": self.track_ids[i], "track": self.track_names[i],
+                "popularity": int(self.popularity[i])}
+        for col in ("energy", "valence", "danceability", "acousticness", "instrumentalness",
+                    "liveness", "speechiness"):
+            info[col] = float(self.audio[col][i]) if col in self.audio else 0.0
+        info["artists"] = self.artists_of(i)
+        info["genres"] = self.genres_of(i)
+        return info
+
+    def _similar_rows(self, i):
+        return self._row(self.similar_to, i)
+
+    def recommendations(self, track_id, limit=RECOMMENDATIONS):
+        """Voisins SIMILAR_TO par popularité décroissante (cf. get_recommendations)."""
+        i = self._track(track_id)
+        if i is None:
+            return []
+        rows = self._similar_rows(i)
+        rows = rows[np.argsort(-self.popularity[rows], kind="stable")][:limit]
+        return [{"track_id": self.track_ids[r], "track": self.track_names[r],
+                 "popularity": int(self.popularity[r]),
+                 "energy": float(self.audio["energy"][r]) if "energy" in self.audio else 0.0,
+                 "valence": float(self.audio["valence"][r]) if "valence" in self.audio else 0.0,
+                 "artists": self.artists_of(r)}
+                for r in rows]
+
+    def neighbourhood(self, track_id):
+        """Voisins directs (cf. get_graph_neighbourhood), ou None."""
+        i = self._track(track_id)
+        if i is None:
+            return None
+        return {"artists": sorted(set(self.artists_of(i))),
+                "genres": sorted(set(self.genres_of(i))),
+                "similars": [{"track_id": self.track_ids[r], "track": self.track_names[r]}
+                             for r in self._similar_rows(i)]}
+
+    def _by_popularity(self, rows, limit):
+        return rows[np.argsort(-self.popularity[rows], kind="stable")][:limit]
+
+    def explore_rows(self, kind, keys, fan_out, limit):
+        """Lignes de music_db.EXPLORE_QUERIES[kind] (key, rel, kind, id, name,
+        incoming), depuis les adjacences : mêmes bornes fan_out par relation
+        et limit au total, même tri (popularité, sauf pour un genre)."""
+        rows = []
+        for key in keys:
+            if kind == "track":
+                i = self._track(key)
+                if i is None:
+                    continue
+                rows += [(key, "SIMILAR_TO", "track", self.track_ids[r], self.track_names[r], False)
+                         for r in self._by_popularity(self._similar_rows(i), fan_out)]
+                rows += [(key, "PERFORMED_BY", "artist", self.artist_ids[a], self.artist_names[a], False)
+                         for a in self._row(self.performed_by, i)[:fan_out]]
+                rows += [(key, "IN_GENRE", "genre", self.genre_ids[g], self.genre_names[g], False)
+                         for g in self._row(self.in_genre, i)[:fan_out]]
+            else:
+                index, adjacency, rel = ((self.artist_index, self.performs, "PERFORMED_BY") if kind == "artist"
+                                         else (self.genre_index, self.genre_tracks, "IN_GENRE"))
+                j = index.get_indexer([key])[0]
+                if j < 0:
+                    continue
+                tracks = self._row(adjacency, j)
+                tracks = self._by_popularity(tracks, fan_out) if kind == "artist" else tracks[:fan_out]
+                rows += [(key, rel, "track", self.track_ids[t], self.track_names[t], True) for t in tracks]
+            if len(rows) >= limit:
+                break
+        return [{"key": key, "rel": rel, "kind": kind, "id": str(i), "name": name, "incoming": incoming}
+                for key, rel, kind, i, name, incoming in rows[:limit]]
+
+    def track_detail(self, track_id):
+        """Détail de la page (cf. get_track_detail), sans search_count."""
+        info = self.track_info(track_id)
+        if info is None:
+            return None
+        info["recommendations"] = self.recommendations(track_id)
+        info["similars"] = self.neighbourhood(track_id)["similars"]
+        return info
+
+    def stats(self):
+        return {"version": self.version, "tracks": len(self), "artists": len(self.artist_ids),
+                "genres": len(self.genre_ids), "performed_by": len(self.performed_by[1]),
+                "in_genre": len(self.in_genre[1]), "similar_to": len(self.similar_to[1]),
+                "age": time.time() - self.built_at}
+
+
+# ================= INSTANTANÉ COURANT =================
+class SnapshotHolder:
+    """Instantané courant, remplacé à chaud quand les tables sources changent.
+
+    Les lecteurs prennent la référence une fois (current()) et travaillent
+    dessus : une reconstruction se fait à côté, en arrière-plan, puis la
+    référence est échangée ; aucune requête ne voit un état mélangé.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, fmt=None, check_interval=CHECK_INTERVAL):
+        self.data_dir = data_dir
+        self.fmt = fmt
+        self.check_interval = check_interval
+        self.listeners = []
+        self.error = None
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._building = False
+
+    def _paths(self):
+        try:
+            return source_paths(self.data_dir, self.fmt)
+        except FileNotFoundError as exc:
+            self.error = str(exc)
+            return None
+
+    def _build(self, paths, version):
+        try:
+            snapshot = GraphSnapshot(paths, version)
+        except Exception as exc:  # l'ancien instantané reste en service
+            self.error = f"{type(exc).__name__}: {exc}"
+            return
+        finally:
+            self._building = False
+        self.swap(snapshot)
+
+    def swap(self, snapshot):
+        with self._lock:
+            self._snapshot = snapshot
+            self.error = None
+        for listener in self.listeners:
+            listener(snapshot)
+
+    def current(self):
+        """Instantané en service (None tant qu'aucun n'a pu être construit).
+
+        Le premier appel construit l'instantané ; les suivants vérifient au
+        plus toutes les check_interval secondes si les tables ont changé et
+        reconstruisent alors en arrière-plan.
+        """
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if self._building or (self._snapshot is not None
+                                  and now - self._checked_at < self.check_interval):
+                return self._snapshot
+            self._checked_at = now
+            paths = self._paths()
+            if paths is None:
+                return self._snapshot
+            version = source_version(paths)
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+            self._building = True
+            background = self._snapshot is not None
+        if background:
+            threading.Thread(target=self._build, args=(paths, version),
+                             name="graph-snapshot", daemon=True).start()
+        else:
+            self._build(paths, version)
+        return self._snapshot
+
+    def reload(self):
+        """Force une vérification au prochain current()."""
+        self._checked_at = 0.0
+
+
+snapshots = SnapshotHolder()
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construction de l'instantané en mémoire du graphe")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--format", default=None, choices=FORMATS)
+    parser.add_argument("--track", default=None, help="affiche le détail de ce track_id")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = source_paths(args.data_dir, args.format)
+    snapshot = GraphSnapshot(paths)
+    print(f"Instantané {snapshot.version} construit en {time.perf_counter() - start:.2f} s")
+    for key, value in snapshot.stats().items():
+        print(f"  {key:<14} {value}")
+    if args.track:
+        print(snapshot.track_detail(args.track))
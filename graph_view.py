@@ -0,0 +1,156 @@
+import json
+import os
+from functools import lru_cache
+
+from query_cache import CACHES, QueryCache
+
+# ================= CONFIG =================
+# vis-network embarqué, servi par Streamlit sous /app/static/ (server.enableStaticServing)
+VIS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "vis-9.1.2")
+VIS_URL = "app/static/vis-9.1.2"
+GRAPH_HEIGHT = 620
+GRAPH_TTL = 600
+
+OPTIONS = {
+    "physics": {
+        "enabled": True,
+        "barnesHut": {"gravitationalConstant": -26000, "springLength": 160},
+    },
+    "edges": {
+        "arrows": {"to": {"enabled": True}},
+        "font": {"size": 14},
+    },
+    "interaction": {"zoomView": True, "dragView": True},
+    "nodes": {"font": {"color": "white"}},
+}
+
+# Partagé par toutes les sessions ; apparaît dans les stats de query_cache
+graph_cache = CACHES.setdefault("graph_html", QueryCache("graph_html", GRAPH_TTL))
+
+TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+{assets}
+<style>
+html, body {{ margin: 0; background: #020617; }}
+#graph {{ width: 100%; height: {height}px; }}
+</style>
+</head>
+<body>
+<div id="graph"></div>
+<script>
+new vis.Network(
+  document.getElementById("graph"),
+  {{ nodes: new vis.DataSet({nodes}), edges: new vis.DataSet({edges}) }},
+  {options}
+);
+</script>
+</body>
+</html>
+"""
+
+@lru_cache(maxsize=1)
+def inline_assets():
+    """vis-network intégré (<style> + <script>), lu une fois par processus.
+
+    ~690 Ko par graphe : repli quand le service statique est désactivé.
+    """
+    with open(os.path.join(VIS_DIR, "vis-network.min.js"), encoding="utf-8") as f:
+        js = f.read()
+    with open(os.path.join(VIS_DIR, "vis-network.css"), encoding="utf-8") as f:
+        css = f.read()
+    return f"<style>{css}</style>\n<script>{js}</script>"
+
+def linked_assets(url):
+    """vis-network chargé depuis url (mis en cache par le navigateur)."""
+    return (f'<link rel="stylesheet" href="{url}/vis-network.css">\n'
+            f'<script src="{url}/vis-network.min.js"></script>')
+
+def _json(value):
+    # "</" échappé : un nom de chanson ne peut pas fermer la balise <script>
+    return json.dumps(value, ensure_ascii=False).replace("</", "<\\/")
+
+# Apparence par type de nœud : (préfixe, forme, taille, couleur, titre)
+STYLES = {
+    "root": ("♪ ", "star", 42, "#2563eb", "Chanson sélectionnée"),
+    "track": ("♪ ", "dot", 26, "#38bdf8", "Chanson"),
+    "artist": ("♫ ", "circle", 30, "#22c55e", "Artiste"),
+    "genre": ("♬ ", "box", 24, "#a855f7", "Genre"),
+}
+EDGE_WIDTHS = {"PERFORMED_BY": 2, "IN_GENRE": 2, "SIMILAR_TO": 3}
+
+def _node(node_id, kind, name, label, title=None):
+    prefix, shape, size, color, default_title = STYLES[kind]
+    return {"id": node_id, "label": prefix + label(name), "shape": shape, "size": size,
+            "color": color, "title": title or default_title}
+
+def _edge(source, target, rel):
+    return {"from": source, "to": target, "label": rel, "width": EDGE_WIDTHS.get(rel, 1)}
+
+def neighbourhood_elements(detail, label=str):
+    """Nœuds et arêtes vis-network du voisinage d'une chanson.
+
+    detail : track_id, track, artists, genres, similars (get_track_detail).
+    Identifiants de nœuds préfixés : un artiste, un genre et une chanson
+    peuvent porter le même nom.
+    """
+    track = "track:" + detail["track_id"]
+    nodes = [_node(track, "root", detail["track"], label)]
+    edges = []
+
+    for a in detail["artists"]:
+        nodes.append(_node("artist:" + a, "artist", a, label))
+        edges.append(_edge(track, "artist:" + a, "PERFORMED_BY"))
+
+    for g in detail["genres"]:
+        nodes.append(_node("genre:" + g, "genre", g, label))
+        edges.append(_edge(track, "genre:" + g, "IN_GENRE"))
+
+    for s in detail["similars"]:
+        # tracks_similar contient des paires (t, t) : pas de second nœud racine
+        if s["track_id"] == detail["track_id"]:
+            continue
+        nodes.append(_node("track:" + s["track_id"], "track", s["track"], label, "Chanson similaire"))
+        edges.append(_edge(track, "track:" + s["track_id"], "SIMILAR_TO"))
+
+    return nodes, edges
+
+def exploration_elements(graph, label=str):
+    """Nœuds et arêtes vis-network d'un résultat de explore_neighbourhood."""
+    nodes = [_node(n["id"], "root" if n["hop"] == 0 else n["kind"], n["name"], label,
+                   None if n["hop"] == 0 else f"{STYLES[n['kind']][4]} · saut {n['hop']}")
+             for n in graph["nodes"]]
+    edges = [_edge(e["from"], e["to"], e["rel"]) for e in graph["edges"]]
+    return nodes, edges
+
+def graph_html(nodes, edges, height=GRAPH_HEIGHT, options=OPTIONS, assets_url=None):
+    """Page générée en mémoire. assets_url : URL de vis-network (cf.
+    VIS_URL) ; None l'intègre dans la page.
+
+    vis.DataSet refuse deux nœuds de même id : seul le premier est gardé.
+    """
+    seen = set()
+    unique = [n for n in nodes if not (n["id"] in seen or seen.add(n["id"]))]
+    assets = inline_assets() if assets_url is None else linked_assets(assets_url)
+    return TEMPLATE.format(assets=assets, height=height, nodes=_json(unique),
+                           edges=_json(edges), options=_json(options))
+
+def neighbourhood_html(detail, label=str, height=GRAPH_HEIGHT, assets_url=None):
+    """HTML du voisinage de la chanson, mis en cache par track_id."""
+    key = (detail["track_id"], height, assets_url)
+    found, html = graph_cache.get(key)
+    if not found:
+        html = graph_html(*neighbourhood_elements(detail, label), height=height, assets_url=assets_url)
+        graph_cache.set(key, html)
+    return html
+
+def exploration_html(track_id, graph, label=str, height=GRAPH_HEIGHT, key=(), assets_url=None):
+    """HTML d'une exploration à plusieurs sauts ; key : ses paramètres
+    (profondeur, fan-out, budget), qui font partie de la clé de cache."""
+    cache_key = ("explore", track_id, height, assets_url, *key)
+    found, html = graph_cache.get(cache_key)
+    if not found:
+        html = graph_html(*exploration_elements(graph, label), height=height, assets_url=assets_url)
+        graph_cache.set(cache_key, html)
+    return html
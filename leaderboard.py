@@ -0,0 +1,125 @@
+import heapq
+import threading
+import time
+from collections import Counter, deque
+from operator import itemgetter
+
+# ================= CONFIG =================
+# Fenêtres glissantes disponibles (s) ; None = depuis toujours
+WINDOWS = {"hour": 3600, "day": 86400}
+# Granularité des fenêtres : les recherches sont regroupées par minute
+BUCKET_SECONDS = 60
+# Relecture complète des compteurs écrits (autres processus, rechargement)
+RESYNC_SECONDS = 600
+# Nouvel essai après une relecture en échec (base indisponible)
+RETRY_SECONDS = 30
+
+
+class Leaderboard:
+    """Classement des clés les plus comptées, tenu à jour en mémoire.
+
+    Le total « depuis toujours » part des compteurs écrits (load_fn, relu
+    toutes les resync secondes) et suit ensuite chaque record(). Les fenêtres
+    glissantes sont des sommes courantes de seaux d'une minute : un seau qui
+    sort d'une fenêtre est soustrait de son total, sans rien reparcourir.
+    Les fenêtres ne couvrent que les recherches vues par ce processus.
+    top(n) ne trie que les clés effectivement comptées (heap de taille n).
+
+    pending_fn() renvoie les incréments pas encore écrits au moment de la
+    relecture : ils restent comptés en plus des valeurs lues.
+
+    La relecture se fait dans un thread d'arrière-plan : count() et top()
+    ne font jamais d'aller-retour vers la base. Tant qu'elle n'a pas abouti
+    (ou si elle échoue), les totaux courants restent servis.
+    """
+
+    def __init__(self, load_fn, pending_fn=None, windows=WINDOWS,
+                 bucket_seconds=BUCKET_SECONDS, resync=RESYNC_SECONDS, retry=RETRY_SECONDS):
+        self.load_fn = load_fn
+        self.pending_fn = pending_fn or Counter
+        self.bucket_seconds = bucket_seconds
+        self.resync = resync
+        self.retry = retry
+        self.error = None
+        self._lock = threading.Lock()
+        self._totals = Counter()
+        self._synced_at = None
+        self._syncing = False
+        self._windows = {name: (seconds, deque(), Counter()) for name, seconds in windows.items()}
+
+    @property
+    def windows(self):
+        return list(self._windows)
+
+    def record(self, key, delta=1, now=None):
+        now = time.time() if now is None else now
+        start = now - now % self.bucket_seconds
+        with self._lock:
+            self._totals[key] += delta
+            for _, buckets, totals in self._windows.values():
+                if not buckets or buckets[-1][0] != start:
+                    buckets.append((start, Counter()))
+                buckets[-1][1][key] += delta
+                totals[key] += delta
+
+    def _expire(self, now):
+        for seconds, buckets, totals in self._windows.values():
+            while buckets and buckets[0][0] + self.bucket_seconds <= now - seconds:
+                _, bucket = buckets.popleft()
+                totals.subtract(bucket)
+                for key in bucket:
+                    if totals[key] <= 0:
+                        del totals[key]
+
+    def sync(self):
+        """Relit les compteurs écrits ; en cas d'échec, garde les totaux
+        courants et réessaie dans retry secondes."""
+        try:
+            counts = Counter(self.load_fn())
+        except Exception as exc:
+            with self._lock:
+                self.error = f"{type(exc).__name__}: {exc}"
+                self._synced_at = time.monotonic() - self.resync + self.retry
+                self._syncing = False
+            return False
+        with self._lock:
+            # Tampon lu au moment de l'échange : aucune recherche entre les deux
+            counts.update(self.pending_fn())
+            self._totals = counts
+            self._synced_at = time.monotonic()
+            self.error = None
+            self._syncing = False
+        return True
+
+    def reset(self):
+        """Force une relecture au prochain top() (après un rechargement)."""
+        with self._lock:
+            self._synced_at = None
+
+    def _sync_if_due(self):
+        with self._lock:
+            if self._syncing or (self._synced_at is not None
+                                 and time.monotonic() - self._synced_at <= self.resync):
+                return
+            self._syncing = True
+        threading.Thread(target=self.sync, name="leaderboard-sync", daemon=True).start()
+
+    def count(self, key):
+        """Total « depuis toujours » de key."""
+        self._sync_if_due()
+        with self._lock:
+            return self._totals[key]
+
+    def top(self, n=10, window=None, now=None):
+        """[(clé, compte)] des n plus grands comptes, décroissants."""
+        if window is None:
+            self._sync_if_due()
+        now = time.time() if now is None else now
+        with self._lock:
+            if window is None:
+                counts = self._totals
+            else:
+                self._expire(now)
+                counts = self._windows[window][2]
+            return heapq.nlargest(n, ((k, c) for k, c in counts.items() if c > 0),
+                                  key=itemgetter(1))
@@ -0,0 +1,166 @@
+import argparse
+import time
+
+from neo4j import GraphDatabase
+
+from tables import FORMATS, read_path, read_table
+
+# ================= CONFIG =================
+NEO4J_URI = "bolt://localhost:7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = "12345678"
+NEO4J_DB = "music-recommendation"
+
+DATA_DIR = "Dataset"
+# Lignes envoyées par requête UNWIND (une transaction par lot)
+BATCH_SIZE = 10_000
+
+# ================= SCHÉMA =================
+# Créés avant le chargement : chaque MERGE / MATCH des lots devient une
+# recherche indexée au lieu d'un parcours du label
+SCHEMA = [
+    "CREATE CONSTRAINT track_id_unique IF NOT EXISTS FOR (t:Track) REQUIRE t.track_id IS UNIQUE",
+    "CREATE CONSTRAINT artist_id_unique IF NOT EXISTS FOR (a:Artist) REQUIRE a.artist_id IS UNIQUE",
+    "CREATE CONSTRAINT genre_id_unique IF NOT EXISTS FOR (g:Genre) REQUIRE g.genre_id IS UNIQUE",
+    "CREATE INDEX track_name_index IF NOT EXISTS FOR (t:Track) ON (t.track_name)",
+    "CREATE INDEX artist_name_index IF NOT EXISTS FOR (a:Artist) ON (a.artist_name)",
+    # Filtre de popularité des listes de chansons, trié par nom
+    "CREATE INDEX track_popularity_name_index IF NOT EXISTS FOR (t:Track) ON (t.popularity, t.track_name)",
+    # Relecture du classement des recherches (WHERE search_count > 0)
+    "CREATE RANGE INDEX track_search_count_index IF NOT EXISTS FOR (t:Track) ON (t.search_count)",
+]
+
+# ================= REQUÊTES PAR TABLE =================
+# Ordre de chargement : les nœuds avant les relations qui les relient
+LOADS = [
+    ("tracks", """
+    UNWIND $rows AS row
+    MERGE (t:Track {track_id: row.track_id})
+    SET t += row
+    """),
+    ("artists", """
+    UNWIND $rows AS row
+    MERGE (a:Artist {artist_id: row.artist_id})
+    SET a.artist_name = row.artist_name
+    """),
+    ("genres", """
+    UNWIND $rows AS row
+    MERGE (g:Genre {genre_id: row.genre_id})
+    ON CREATE SET g.genre_name = row.genre_name
+    """),
+    ("track_artist_rel", """
+    UNWIND $rows AS row
+    MATCH (t:Track {track_id: row.track_id})
+    MATCH (a:Artist {artist_id: row.artist_id})
+    MERGE (t)-[:PERFORMED_BY]->(a)
+    """),
+    ("track_genre_rel", """
+    UNWIND $rows AS row
+    MATCH (t:Track {track_id: row.track_id})
+    MATCH (g:Genre {genre_id: row.genre_id})
+    MERGE (t)-[:IN_GENRE]->(g)
+    """),
+    ("tracks_similar", """
+    UNWIND $rows AS row
+    MATCH (t:Track {track_id: row.track_id})
+    MATCH (s:Track {track_id: row.similar_track_id})
+    MERGE (t)-[r:SIMILAR_TO]->(s)
+    SET r.score = row.score
+    """),
+]
+
+# Clé des MERGE de chaque table de nœuds : vide, elle fusionnerait des
+# nœuds distincts en un seul
+NODE_KEYS = {"tracks": "track_id", "artists": "artist_id", "genres": "genre_id"}
+
+# Patch produit par similarity.py --incremental
+PATCH_REMOVE = """
+UNWIND $rows AS row
+MATCH (:Track {track_id: row.track_id})-[r:SIMILAR_TO]->(:Track {track_id: row.similar_track_id})
+DELETE r
+"""
+
+# ================= CHARGEMENT =================
+def to_rows(frame):
+    """Lignes en types Python natifs (NaN -> null) pour les paramètres Cypher."""
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).to_dict("records")
+
+def _run_batch(tx, query, rows):
+    tx.run(query, rows=rows).consume()
+
+def create_schema(driver, database=NEO4J_DB):
+    with driver.session(database=database) as s:
+        for statement in SCHEMA:
+            s.run(statement).consume()
+
+def load_frame(driver, frame, query, database=NEO4J_DB, batch_size=BATCH_SIZE):
+    """Envoie frame par lots UNWIND, un lot par transaction d'écriture.
+
+    Renvoie (lignes chargées, durée en secondes).
+    """
+    start = time.perf_counter()
+    with driver.session(database=database) as s:
+        for offset in range(0, len(frame), batch_size):
+            rows = to_rows(frame.iloc[offset:offset + batch_size])
+            s.execute_write(_run_batch, query, rows)
+    return len(frame), time.perf_counter() - start
+
+def report(name, n_rows, elapsed):
+    rate = n_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"{name:<24} {n_rows:>9} lignes en {elapsed:7.2f} s  ({rate:,.0f} lignes/s)")
+
+def check_keys(name, frame):
+    """Arrête le chargement si une ligne de nœud n'a pas d'identifiant."""
+    key = NODE_KEYS.get(name)
+    if key is None:
+        return
+    empty = frame[key].isna() | (frame[key].astype(str).str.strip() == "")
+    if empty.any():
+        raise ValueError(f"{name} : {int(empty.sum())} ligne(s) sans {key}, "
+                         f"que MERGE fusionnerait en un seul nœud ; relancer prepare_dataset.py")
+
+def load_dataset(driver, data_dir=DATA_DIR, database=NEO4J_DB, batch_size=BATCH_SIZE, fmt=None):
+    """Charge toutes les tables préparées ; renvoie {table: (lignes, durée)}."""
+    create_schema(driver, database)
+    stats = {}
+    for name, query in LOADS:
+        frame = read_table(data_dir, name, fmt)
+        check_keys(name, frame)
+        if name == "tracks_similar":
+            # Tables produites avant que similarity.py n'écarte les couples
+            # d'une chanson avec elle-même
+            frame = frame[frame["track_id"] != frame["similar_track_id"]]
+        stats[name] = load_frame(driver, frame, query, database, batch_size)
+        report(name, *stats[name])
+    return stats
+
+def apply_patch(driver, patch, database=NEO4J_DB, batch_size=BATCH_SIZE):
+    """Applique un patch SIMILAR_TO (op=add / op=remove) sans rechargement complet."""
+    removed = patch[patch["op"] == "remove"][["track_id", "similar_track_id"]]
+    added = patch[patch["op"] == "add"][["track_id", "similar_track_id", "score"]]
+    report("SIMILAR_TO (remove)", *load_frame(driver, removed, PATCH_REMOVE, database, batch_size))
+    report("SIMILAR_TO (add)", *load_frame(driver, added, dict(LOADS)["tracks_similar"], database, batch_size))
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chargement du dataset préparé dans Neo4j")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--format", default=None, choices=FORMATS,
+                        help="format des tables (par défaut : le premier trouvé, colonnaire d'abord)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--patch", default=None,
+                        help="n'appliquer que ce patch SIMILAR_TO (similarity.py --incremental)")
+    parser.add_argument("--uri", default=NEO4J_URI)
+    parser.add_argument("--user", default=NEO4J_USER)
+    parser.add_argument("--password", default=NEO4J_PASSWORD)
+    parser.add_argument("--database", default=NEO4J_DB)
+    args = parser.parse_args()
+
+    with GraphDatabase.driver(args.uri, auth=(args.user, args.password)) as driver:
+        if args.patch:
+            apply_patch(driver, read_path(args.patch), args.database, args.batch_size)
+        else:
+            load_dataset(driver, args.data_dir, args.database, args.batch_size, args.format)
+
+    print("✅ Chargement Neo4j terminé")
@@ -0,0 +1,490 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+import graph_view
+import music_db
+from graph_snapshot import GraphSnapshot, source_paths, snapshots
+from query_cache import CACHES, cache_stats
+
+# ================= CONFIG =================
+USERS = 20
+DURATION = 30             # s de charge mesurée
+THINK_TIME = 0.2          # s moyens entre deux pages d'un utilisateur (loi exponentielle)
+FAKE_LATENCY = 0.002      # s par aller-retour du driver factice (réseau + serveur)
+SYNTHETIC_ROWS = 20_000   # export brut généré quand aucune table n'est fournie
+OUTPUT_JSON = "load_test.json"
+
+# Appels mesurés par mode d'utilisateur virtuel, dans l'ordre du rapport
+MODES = {
+    # Séquence réelle d'un rendu de app.py ; "page" = rendu complet
+    "app": ["page", "get_all_artists", "get_all_genres", "get_most_searched_tracks", "count_tracks",
+            "get_track_index", "track_search", "get_track_detail", "render_graph",
+            "explore_neighbourhood"],
+    # Helpers unitaires de music_db, sans l'interface
+    "helpers": ["get_tracks", "get_track_info", "get_recommendations", "increment_search_count",
+                "get_most_searched_tracks"],
+}
+
+# Comportement des utilisateurs virtuels
+P_ARTIST_FILTER = 0.2
+P_GENRE_FILTER = 0.5
+P_POPULARITY_FILTER = 0.3
+P_FOLLOW_RECOMMENDATION = 0.5   # clic sur une recommandation après une chanson
+MAX_FOLLOWS = 3
+MAX_QUERIES = 3                 # saisies successives dans la recherche (un rerun chacune)
+P_EXPLORE = 0.2                 # onglet graphe à plus d'un saut
+WINDOWS = [None, None, "day", "hour"]   # période du Top 10 (radio de app.py)
+
+# ================= DRIVER FACTICE =================
+class FakeRecord(dict):
+    """Enregistrement neo4j minimal : accès par clé et .data()."""
+
+    def data(self):
+        return dict(self)
+
+
+class FakeResult:
+    def __init__(self, records):
+        self._records = [FakeRecord(r) for r in records]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def consume(self):
+        return None
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, query, parameters=None, **params):
+        return self.driver.execute(query, {**(parameters or {}), **params})
+
+    def execute_write(self, fn, *args, **kwargs):
+        return fn(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.driver.pool.release()
+
+
+class FakeDriver:
+    """Neo4j en mémoire pour les requêtes des helpers de music_db.
+
+    Répond aux requêtes Cypher de music_db (reconnues à leur texte) à partir
+    d'un GraphSnapshot, avec une latence fixe par aller-retour et un pool de
+    max_pool_size sessions comme le vrai driver. Les compteurs de recherche
+    sont tenus ici ; toute autre requête lève NotImplementedError.
+
+    Les écritures de load_neo4j (schéma, lots UNWIND $rows) sont acceptées
+    sans être appliquées et consignées dans statements, (requête, lignes)
+    dans l'ordre d'envoi : de quoi vérifier un chargement sans serveur.
+    snapshot peut alors être None.
+
+    Mesure le coût côté application (caches, tampons, verrous, pool), pas le
+    plan d'exécution de Neo4j : pour celui-ci, viser un vrai serveur.
+    """
+
+    def __init__(self, snapshot, latency=FAKE_LATENCY, max_pool_size=music_db.MAX_POOL_SIZE):
+        self.snapshot = snapshot
+        self.latency = latency
+        self.pool = threading.BoundedSemaphore(max_pool_size)
+        self.search_counts = {}
+        self.queries = 0
+        self.statements = []
+        self._lock = threading.Lock()
+        # Du plus spécifique au plus général : le détail contient aussi
+        # "AS search_count" et "[:SIMILAR_TO]->(r:Track)"
+        self.handlers = [
+            ("AS recommendations", self._track_detail),
+            ("MATCH (t:Track {track_id: key})", self._explore("track")),
+            ("MATCH (a:Artist {artist_id: key})", self._explore("artist")),
+            ("MATCH (g:Genre {genre_id: key})", self._explore("genre")),
+            ("RETURN t.track_name AS name", self._track_name),
+            ("SET t.search_count", self._flush_search_counts),
+            ("IF NOT EXISTS", self._record_statement),
+            ("UNWIND $rows AS row", self._record_statement),
+            ("WHERE t.search_count > 0", self._load_search_counts),
+            ("AS search_count", self._search_count),
+            ("UNWIND $track_ids", self._tracks_of),
+            ("RETURN count(t) AS n", self._count_tracks),
+            ("t.track_name AS name", self._tracks),
+            ("[:SIMILAR_TO]->(r:Track)", self._recommendations),
+            ("coalesce(t.danceability", self._track_info),
+            ("MATCH (a:Artist)", lambda p: [{"name": a} for a in self.snapshot.all_artists()]),
+            ("MATCH (g:Genre)", lambda p: [{"name": g} for g in self.snapshot.all_genres()]),
+        ]
+
+    def session(self, database=None, **config):
+        self.pool.acquire()
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+    def execute(self, query, params):
+        for marker, handler in self.handlers:
+            if marker in query:
+                break
+        else:
+            raise NotImplementedError(f"requête non simulée : {' '.join(query.split())[:80]}")
+        with self._lock:
+            self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if handler == self._record_statement:
+            return FakeResult(handler(query, params))
+        return FakeResult(handler(params))
+
+    # ----- Lectures -----
+    @staticmethod
+    def _filters(params):
+        return {"artist_filter": params.get("artist"), "genre_filter": params.get("genre"),
+                "min_popularity": params.get("min_popularity", 0),
+                "max_popularity": params.get("max_popularity", 100)}
+
+    def _tracks(self, params):
+        tracks = self.snapshot.tracks(**self._filters(params))
+        start = 0
+        if "after_name" in params:
+            start = bisect_right([(n, i) for i, n in tracks], (params["after_name"], params["after_id"]))
+        return [{"track_id": i, "name": n} for i, n in tracks[start:start + params["limit"]]]
+
+    def _count_tracks(self, params):
+        return [{"n": self.snapshot.count_tracks(**self._filters(params))}]
+
+    def _track_info(self, params):
+        info = self.snapshot.track_info(params["track_id"])
+        return [] if info is None else [info]
+
+    def _recommendations(self, params):
+        return self.snapshot.recommendations(params["track_id"])
+
+    def _track_detail(self, params):
+        detail = self.snapshot.track_detail(params["track_id"])
+        if detail is None:
+            return []
+        with self._lock:
+            detail["search_count"] = self.search_counts.get(params["track_id"], 0)
+        return [detail]
+
+    def _track_name(self, params):
+        info = self.snapshot.track_info(params["id"])
+        return [] if info is None else [{"name": info["track"]}]
+
+    # ----- Exploration (EXPLORE_QUERIES) -----
+    def _explore(self, kind):
+        return lambda params: self.snapshot.explore_rows(kind, params["keys"], params["fan_out"],
+                                                         params["budget"])
+
+    def _tracks_of(self, params):
+        rows = []
+        for track_id in params["track_ids"]:
+            info = self.snapshot.track_info(track_id)
+            if info is not None:
+                rows.append({"track_id": track_id, "name": info["track"], "artists": info["artists"]})
+        return rows
+
+    # ----- Chargement (load_neo4j) -----
+    def _record_statement(self, query, params):
+        with self._lock:
+            self.statements.append((query, len(params.get("rows", ()))))
+        return []
+
+    # ----- Compteurs de recherche -----
+    def _search_count(self, params):
+        if self.snapshot.track_info(params["track_id"]) is None:
+            return []
+        with self._lock:
+            return [{"search_count": self.search_counts.get(params["track_id"], 0)}]
+
+    def _load_search_counts(self, params):
+        with self._lock:
+            return [{"track_id": t, "count": c} for t, c in self.search_counts.items() if c > 0]
+
+    def _flush_search_counts(self, params):
+        with self._lock:
+            for row in params["rows"]:
+                self.search_counts[row["track_id"]] = self.search_counts.get(row["track_id"], 0) + row["delta"]
+        return []
+
+# ================= DONNÉES =================
+def synthetic_tables(n_rows, work_dir, seed=0):
+    """Export brut synthétique -> tables préparées + tracks_similar (voisins
+    sur les seules features audio : pas de modèle de texte nécessaire)."""
+    from generate_dataset import generate
+    from neighbors import topk_neighbors
+    from prepare_dataset import prepare
+    from similarity import build_embeddings, neighbors_frame
+    from tables import read_table, write_path
+
+    raw = os.path.join(work_dir, "dataset.csv")
+    generate(raw, n_rows, seed)
+    prepare(raw, work_dir)
+    df = read_table(work_dir, "tracks_embeddings_input")
+    combined, _ = build_embeddings(df, encode_fn=lambda texts: np.zeros((len(texts), 0)))
+    neighbors, scores = topk_neighbors(combined)
+    write_path(neighbors_frame(df["track_id"], neighbors, scores), os.path.join(work_dir, "tracks_similar.csv"))
+    return work_dir
+
+# ================= UTILISATEURS VIRTUELS =================
+class VirtualUser:
+    """Utilisateur virtuel : tire des filtres et des sélections, chronomètre
+    chaque appel sous son nom (samples, errors)."""
+
+    mode = None
+
+    def __init__(self, user_id, artists, genres, seed=0, think_time=THINK_TIME):
+        self.rng = random.Random(seed * 10_007 + user_id)
+        self.artists = artists
+        self.genres = genres
+        self.think_time = think_time
+        self.samples = {name: [] for name in MODES[self.mode]}
+        self.errors = {name: 0 for name in MODES[self.mode]}
+        self.pages = 0
+
+    def call(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            self.errors[name] += 1
+            return None
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+    def helper(self, name, *args, **kwargs):
+        return self.call(name, getattr(music_db, name), *args, **kwargs)
+
+    def filters(self):
+        rng = self.rng
+        filters = {}
+        if self.artists and rng.random() < P_ARTIST_FILTER:
+            filters["artist_filter"] = rng.choice(self.artists)
+        if self.genres and rng.random() < P_GENRE_FILTER:
+            filters["genre_filter"] = rng.choice(self.genres)
+        if rng.random() < P_POPULARITY_FILTER:
+            filters["min_popularity"] = rng.randrange(0, 60, 10)
+        return filters
+
+    def pick(self, items):
+        # Les premières entrées de la liste sont les plus cliquées
+        return items[min(int(self.rng.paretovariate(1.2)) - 1, len(items) - 1)]
+
+    def visit(self):
+        raise NotImplementedError
+
+    def run(self, stop_at):
+        while time.monotonic() < stop_at:
+            self.visit()
+            if self.think_time:
+                time.sleep(min(self.rng.expovariate(1 / self.think_time), max(0.0, stop_at - time.monotonic())))
+
+
+class AppUser(VirtualUser):
+    """Rejoue les reruns de app.py : chaque interaction (filtres, saisie
+    dans la recherche) ré-exécute toute la page, avec le premier résultat
+    (ou celui choisi) affiché en détail et l'onglet graphe rendu."""
+
+    mode = "app"
+
+    def render(self, filters, query="", choose=False):
+        start = time.perf_counter()
+        with music_db.page_session():
+            self.helper("get_all_artists")
+            self.helper("get_all_genres")
+            self.helper("get_most_searched_tracks", 10, self.rng.choice(WINDOWS))
+            index = None
+            if self.helper("count_tracks", **filters):
+                index = self.helper("get_track_index", **filters)
+            matches = self.call("track_search", index.search, query) if index is not None else None
+            if matches:
+                # Le selectbox affiche d'office la première correspondance
+                selected = self.pick(matches) if choose else matches[0]
+                info = self.helper("get_track_detail", selected)
+                if info is not None:
+                    self.call("render_graph", self.render_graph, info)
+        self.samples["page"].append(time.perf_counter() - start)
+        self.pages += 1
+        return index
+
+    def render_graph(self, info):
+        # Même chemin que render_graph de app.py (sans components.html)
+        if self.rng.random() >= P_EXPLORE:
+            return graph_view.neighbourhood_html(info)
+        hops = self.rng.choice([2, 3])
+        graph = self.helper("explore_neighbourhood", info["track_id"], hops)
+        if graph is None:
+            return graph_view.neighbourhood_html(info)
+        return graph_view.exploration_html(info["track_id"], graph, key=(hops,))
+
+    def visit(self):
+        filters = self.filters()
+        index = self.render(filters)
+        if index is None or not index.names:
+            return
+        # Saisie progressive du titre d'une chanson de la liste filtrée
+        name = self.rng.choice(index.names)
+        for n in range(1, self.rng.randint(1, MAX_QUERIES) + 1):
+            query = name[:max(1, len(name) * n // MAX_QUERIES)]
+            self.render(filters, query, choose=n == MAX_QUERIES)
+
+
+class HelperUser(VirtualUser):
+    """Appelle les helpers unitaires : liste des chansons, sélection, fiche,
+    compteur, recommandations, Top 10, puis parfois une recommandation suivie."""
+
+    mode = "helpers"
+
+    def show_track(self, track_id):
+        self.helper("get_track_info", track_id)
+        self.helper("increment_search_count", track_id)
+        recs = self.helper("get_recommendations", track_id) or []
+        self.helper("get_most_searched_tracks", 10, self.rng.choice(WINDOWS))
+        return recs
+
+    def visit(self):
+        with music_db.page_session():
+            tracks = self.helper("get_tracks", **self.filters())
+            if tracks:
+                recs = self.show_track(self.pick(tracks)[0])
+                follows = 0
+                while recs and follows < MAX_FOLLOWS and self.rng.random() < P_FOLLOW_RECOMMENDATION:
+                    recs = self.show_track(self.rng.choice(recs)["track_id"])
+                    follows += 1
+        self.pages += 1
+
+
+USER_CLASSES = {"app": AppUser, "helpers": HelperUser}
+
+# ================= RAPPORT =================
+def summarize(users, elapsed, mode):
+    report = {}
+    for name in MODES[mode]:
+        samples = np.array([s for u in users for s in u.samples[name]]) * 1000
+        errors = sum(u.errors[name] for u in users)
+        if len(samples) == 0:
+            report[name] = {"calls": 0, "errors": errors}
+            continue
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        report[name] = {"calls": len(samples), "errors": errors, "throughput": len(samples) / elapsed,
+                        "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": samples.max()}
+    return report
+
+def print_report(report, pages, elapsed):
+    print(f"\n{pages} pages en {elapsed:.1f} s ({pages / elapsed:.1f} pages/s)\n")
+    print(f"{'appel':<26} {'appels':>8} {'err':>5} {'appels/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8}")
+    for name, r in report.items():
+        if not r["calls"]:
+            print(f"{name:<26} {0:>8} {r['errors']:>5}")
+            continue
+        print(f"{name:<26} {r['calls']:>8} {r['errors']:>5} {r['throughput']:9.1f} {r['p50_ms']:8.2f} "
+              f"{r['p95_ms']:8.2f} {r['p99_ms']:8.2f} {r['max_ms']:8.2f}")
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge des helpers de music_db (utilisateurs virtuels)")
+    parser.add_argument("--users", type=int, default=USERS, help="utilisateurs virtuels concurrents")
+    parser.add_argument("--duration", type=float, default=DURATION, help="durée de la charge (s)")
+    parser.add_argument("--think-time", type=float, default=THINK_TIME,
+                        help="pause moyenne entre deux pages (s, 0 = charge maximale)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", default="app", choices=list(MODES),
+                        help="app : reruns de app.py (latence de page) ; helpers : helpers unitaires")
+    parser.add_argument("--target", default="fake", choices=["fake", "neo4j"],
+                        help="driver factice en mémoire ou serveur Neo4j (les compteurs y sont écrits)")
+    parser.add_argument("--data-dir", default=None,
+                        help="tables préparées du driver factice (par défaut : export synthétique)")
+    parser.add_argument("--rows", type=int, default=SYNTHETIC_ROWS, help="lignes de l'export synthétique")
+    parser.add_argument("--fake-latency", type=float, default=FAKE_LATENCY * 1000,
+                        help="latence d'un aller-retour du driver factice (ms)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="servir les lectures depuis l'instantané en mémoire comme app.py "
+                             "(par défaut : tout passe par le driver)")
+    parser.add_argument("--no-cache", action="store_true", help="désactive les caches de requêtes (TTL nul)")
+    parser.add_argument("--uri", default=music_db.NEO4J_URI)
+    parser.add_argument("--user", default=music_db.NEO4J_USER)
+    parser.add_argument("--password", default=music_db.NEO4J_PASSWORD)
+    parser.add_argument("--database", default=music_db.NEO4J_DB)
+    parser.add_argument("--output", default=OUTPUT_JSON)
+    args = parser.parse_args()
+
+    work_dir = None
+    data_dir = args.data_dir
+    if args.target == "fake" or args.snapshot:
+        if data_dir is None:
+            work_dir = tempfile.mkdtemp(prefix="load_test_")
+            print(f"Export synthétique de {args.rows} lignes -> {work_dir}")
+            data_dir = synthetic_tables(args.rows, work_dir, args.seed)
+        snapshots.data_dir = data_dir
+        snapshots.reload()
+
+    try:
+        if args.target == "fake":
+            driver = FakeDriver(GraphSnapshot(source_paths(data_dir)), args.fake_latency / 1000)
+            music_db.set_driver(driver)
+        else:
+            music_db.NEO4J_URI, music_db.NEO4J_USER = args.uri, args.user
+            music_db.NEO4J_PASSWORD, music_db.NEO4J_DB = args.password, args.database
+        music_db.USE_SNAPSHOT = args.snapshot
+        if args.no_cache:
+            for cache in CACHES.values():
+                cache.ttl = 0
+
+        artists, genres = music_db.get_all_artists(), music_db.get_all_genres()
+        users = [USER_CLASSES[args.mode](i, artists, genres, args.seed, args.think_time)
+                 for i in range(args.users)]
+        print(f"{args.users} utilisateurs ({args.mode}), {args.duration:.0f} s, cible {args.target}"
+              f"{' + instantané' if args.snapshot else ''}")
+
+        start = time.monotonic()
+        stop_at = start + args.duration
+        threads = [threading.Thread(target=u.run, args=(stop_at,), name=f"vu-{i}")
+                   for i, u in enumerate(users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - start
+        music_db.search_counts.flush()
+
+        report = summarize(users, elapsed, args.mode)
+        pages = sum(u.pages for u in users)
+        print_report(report, pages, elapsed)
+        print(f"\nTampon search_count : {music_db.search_count_stats()}")
+        if args.target == "fake":
+            print(f"Requêtes reçues par le driver factice : {driver.queries}")
+
+        with open(args.output, "w") as f:
+            json.dump({"date": time.strftime("%Y-%m-%dT%H:%M:%S"), "mode": args.mode, "target": args.target,
+                       "users": args.users, "duration": elapsed, "think_time": args.think_time,
+                       "snapshot": args.snapshot, "no_cache": args.no_cache, "pages": pages,
+                       "helpers": report, "caches": cache_stats()}, f, indent=2)
+        print(f"Résultats -> {args.output}")
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,581 @@
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from neo4j import GraphDatabase
+
+from graph_snapshot import snapshots
+from leaderboard import Leaderboard
+from query_cache import cached
+from typeahead import TypeaheadIndex
+from write_behind import WriteBehindCounter
+
+# ================= CONFIG =================
+NEO4J_URI = "bolt://localhost:7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = "12345678"
+NEO4J_DB = "music-recommendation"
+
+# Pool de connexions partagé par toutes les sessions Streamlit du processus
+MAX_POOL_SIZE = 50
+MAX_CONNECTION_LIFETIME = 3600        # s, renouvelle les connexions longues
+CONNECTION_ACQUISITION_TIMEOUT = 30   # s d'attente max d'une connexion libre
+FETCH_SIZE = 2000                     # enregistrements rapatriés par aller-retour
+
+# Durée de vie (s) des résultats en cache : le catalogue ne change qu'au
+# rechargement du dataset, le classement à chaque recherche
+CATALOG_TTL = 600
+
+# Chansons par page de get_tracks
+TRACK_PAGE_SIZE = 5000
+
+# Compteurs de recherche : écrits par lots en arrière-plan
+SEARCH_FLUSH_INTERVAL = 5       # s entre deux écritures
+SEARCH_FLUSH_MAX_PENDING = 500  # chansons distinctes en attente avant écriture anticipée
+
+# Exploration du voisinage à plusieurs sauts (bornes par défaut)
+EXPLORE_HOPS = 2
+EXPLORE_FAN_OUT = 8       # voisins retenus par nœud et par relation
+EXPLORE_MAX_NODES = 150   # nœuds au total, racine comprise
+
+# ================= DRIVER =================
+_driver = None
+_driver_lock = threading.Lock()
+
+def get_driver():
+    """Driver unique du processus (Streamlit ré-exécute app.py, pas ce module)."""
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            _driver = GraphDatabase.driver(
+                NEO4J_URI,
+                auth=(NEO4J_USER, NEO4J_PASSWORD),
+                max_connection_pool_size=MAX_POOL_SIZE,
+                max_connection_lifetime=MAX_CONNECTION_LIFETIME,
+                connection_acquisition_timeout=CONNECTION_ACQUISITION_TIMEOUT,
+                fetch_size=FETCH_SIZE,
+            )
+        return _driver
+
+def set_driver(driver):
+    """Remplace le driver (tests, injecteurs de charge, driver factice)."""
+    global _driver
+    with _driver_lock:
+        _driver = driver
+
+# ================= SESSION DE PAGE =================
+# Chaque rendu de page Streamlit s'exécute dans son propre thread : la session
+# de la page est portée par une ContextVar, donc propre à ce rendu.
+_page_session = ContextVar("page_session", default=None)
+
+def start_page():
+    """Ouvre la session partagée par tous les helpers pendant un rendu."""
+    end_page()
+    _page_session.set(get_driver().session(database=NEO4J_DB))
+
+def end_page():
+    s = _page_session.get()
+    if s is not None:
+        _page_session.set(None)
+        s.close()
+
+@contextmanager
+def page_session():
+    """Forme « with » de start_page / end_page (scripts, tests de charge)."""
+    start_page()
+    try:
+        yield
+    finally:
+        end_page()
+
+@contextmanager
+def session():
+    """Session de la page en cours si elle existe, sinon une session dédiée."""
+    s = _page_session.get()
+    if s is not None:
+        yield s
+        return
+    with get_driver().session(database=NEO4J_DB) as s:
+        yield s
+
+# ================= INSTANTANÉ EN MÉMOIRE =================
+# Les lectures passent d'abord par graph_snapshot (tables préparées, en
+# tableaux) ; Neo4j reste le chemin d'écriture et le repli si l'instantané
+# est absent ou ne connaît pas la chanson.
+USE_SNAPSHOT = True
+
+def get_snapshot():
+    return snapshots.current() if USE_SNAPSHOT else None
+
+def snapshot_stats():
+    snapshot = get_snapshot()
+    return {"stats": snapshot.stats() if snapshot is not None else None, "error": snapshots.error}
+
+# ================= DATABASE =================
+@cached(ttl=CATALOG_TTL)
+def get_all_artists():
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.all_artists()
+    q = """
+    MATCH (a:Artist)
+    WHERE a.artist_name IS NOT NULL
+    RETURN DISTINCT a.artist_name AS name
+    ORDER BY name
+    """
+    with session() as s:
+        return [r["name"] for r in s.run(q)]
+
+@cached(ttl=CATALOG_TTL)
+def get_all_genres():
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.all_genres()
+    q = """
+    MATCH (g:Genre)
+    WHERE g.genre_id IS NOT NULL
+    RETURN DISTINCT g.genre_id AS name
+    ORDER BY name
+    """
+    with session() as s:
+        return [r["name"] for r in s.run(q)]
+
+def _track_filter(artist_filter, genre_filter, min_popularity, max_popularity):
+    """Clauses MATCH / WHERE et paramètres communs à get_tracks et count_tracks."""
+    match_clauses = ["MATCH (t:Track)"]
+    where_conditions = ["t.track_id IS NOT NULL AND t.track_name IS NOT NULL"]
+    params = {}
+
+    # Filtre par artiste / genre : tests d'existence, une seule ligne par chanson
+    if artist_filter and artist_filter != "Tous les artistes":
+        where_conditions.append("EXISTS { (t)-[:PERFORMED_BY]->(:Artist {artist_name: $artist}) }")
+        params["artist"] = artist_filter
+
+    if genre_filter and genre_filter != "Tous les genres":
+        where_conditions.append("EXISTS { (t)-[:IN_GENRE]->(:Genre {genre_id: $genre}) }")
+        params["genre"] = genre_filter
+
+    # Filtre par popularité (index composite popularity, track_name)
+    if min_popularity > 0 or max_popularity < 100:
+        where_conditions.append("t.popularity >= $min_popularity AND t.popularity <= $max_popularity")
+        params["min_popularity"] = min_popularity
+        params["max_popularity"] = max_popularity
+
+    return " ".join(match_clauses), " AND ".join(where_conditions), params
+
+@cached(ttl=CATALOG_TTL)
+def get_tracks(artist_filter=None, genre_filter=None, min_popularity=0, max_popularity=100,
+               after=None, limit=TRACK_PAGE_SIZE):
+    """Une page de (track_id, nom) filtrés, triés par nom puis id.
+
+    Pagination par clé : after est le dernier couple (track_id, nom) de la
+    page précédente ; la page suivante reprend juste après dans l'index,
+    sans relire ni sauter les lignes des pages précédentes.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        tracks = snapshot.tracks(artist_filter=artist_filter, genre_filter=genre_filter,
+                                 min_popularity=min_popularity, max_popularity=max_popularity)
+        start = 0 if after is None else bisect_right([(n, i) for i, n in tracks], (after[1], after[0]))
+        return tracks[start:start + limit]
+
+    match, where, params = _track_filter(artist_filter, genre_filter, min_popularity, max_popularity)
+    if after is not None:
+        where += (" AND t.track_name >= $after_name"
+                  " AND (t.track_name > $after_name OR t.track_id > $after_id)")
+        params["after_name"], params["after_id"] = after[1], after[0]
+
+    q = f"""
+    {match}
+    WHERE {where}
+    RETURN t.track_id AS track_id, t.track_name AS name
+    ORDER BY name, track_id
+    LIMIT $limit
+    """
+    with session() as s:
+        return [(r["track_id"], r["name"]) for r in s.run(q, limit=limit, **params)]
+
+def iter_tracks(artist_filter=None, genre_filter=None, min_popularity=0, max_popularity=100,
+                page_size=TRACK_PAGE_SIZE):
+    """Toutes les chansons filtrées, page par page."""
+    after = None
+    while True:
+        page = get_tracks(artist_filter, genre_filter, min_popularity, max_popularity, after, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after = page[-1]
+
+@cached(ttl=CATALOG_TTL)
+def count_tracks(artist_filter=None, genre_filter=None, min_popularity=0, max_popularity=100):
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.count_tracks(artist_filter=artist_filter, genre_filter=genre_filter,
+                                     min_popularity=min_popularity, max_popularity=max_popularity)
+    match, where, params = _track_filter(artist_filter, genre_filter, min_popularity, max_popularity)
+    q = f"""
+    {match}
+    WHERE {where}
+    RETURN count(t) AS n
+    """
+    with session() as s:
+        return s.run(q, **params).single()["n"]
+
+@cached(ttl=CATALOG_TTL, maxsize=16)
+def get_track_index(artist_filter=None, genre_filter=None, min_popularity=0, max_popularity=100):
+    """Index de recherche (typeahead.TypeaheadIndex) des chansons filtrées,
+    construit une fois par combinaison de filtres : cherche sur le nom,
+    renvoie des track_id."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        tracks = snapshot.tracks(artist_filter=artist_filter, genre_filter=genre_filter,
+                                 min_popularity=min_popularity, max_popularity=max_popularity)
+    else:
+        tracks = iter_tracks(artist_filter, genre_filter, min_popularity, max_popularity)
+    return TypeaheadIndex((name, track_id) for track_id, name in tracks)
+
+def get_track_info(track_id):
+    snapshot = get_snapshot()
+    info = snapshot.track_info(track_id) if snapshot is not None else None
+    if info is not None:
+        return info
+    q = """
+    MATCH (t:Track {track_id:$track_id})
+    OPTIONAL MATCH (t)-[:PERFORMED_BY]->(a:Artist)
+    OPTIONAL MATCH (t)-[:IN_GENRE]->(g:Genre)
+    RETURN
+      t.track_id AS track_id,
+      t.track_name AS track,
+      coalesce(t.popularity,0) AS popularity,
+      coalesce(t.energy,0.0) AS energy,
+      coalesce(t.valence,0.0) AS valence,
+      coalesce(t.danceability,0.0) AS danceability,
+      coalesce(t.acousticness,0.0) AS acousticness,
+      coalesce(t.instrumentalness,0.0) AS instrumentalness,
+      coalesce(t.liveness,0.0) AS liveness,
+      coalesce(t.speechiness,0.0) AS speechiness,
+      collect(DISTINCT a.artist_name) AS artists,
+      collect(DISTINCT g.genre_name) AS genres
+    """
+    with session() as s:
+        return s.run(q, track_id=track_id).single()
+
+def get_recommendations(track_id):
+    snapshot = get_snapshot()
+    if snapshot is not None and snapshot.track_info(track_id) is not None:
+        return snapshot.recommendations(track_id)
+    q = """
+    MATCH (t:Track {track_id:$track_id})-[:SIMILAR_TO]->(r:Track)
+    OPTIONAL MATCH (r)-[:PERFORMED_BY]->(a:Artist)
+    RETURN r.track_id AS track_id,
+           r.track_name AS track,
+           r.popularity AS popularity,
+           r.energy AS energy,
+           r.valence AS valence,
+           collect(DISTINCT a.artist_name) AS artists
+    ORDER BY popularity DESC
+    LIMIT 5
+    """
+    with session() as s:
+        return list(s.run(q, track_id=track_id))
+
+# ================= COMPTEURS DE RECHERCHE =================
+def _flush_search_counts(deltas):
+    """Écrit {track_id: incrément} en une seule transaction UNWIND."""
+    q = """
+    UNWIND $rows AS row
+    MATCH (t:Track {track_id: row.track_id})
+    SET t.search_count = coalesce(t.search_count, 0) + row.delta
+    """
+    rows = [{"track_id": track_id, "delta": delta} for track_id, delta in deltas.items()]
+    # Thread d'arrière-plan : jamais la session d'une page
+    with get_driver().session(database=NEO4J_DB) as s:
+        s.execute_write(lambda tx: tx.run(q, rows=rows).consume())
+
+search_counts = WriteBehindCounter("search_count", _flush_search_counts,
+                                   interval=SEARCH_FLUSH_INTERVAL,
+                                   max_pending=SEARCH_FLUSH_MAX_PENDING)
+
+def search_count_stats():
+    return search_counts.stats()
+
+def _load_search_counts():
+    # Parcours de l'index de plage sur search_count, pas du label Track
+    q = """
+    MATCH (t:Track)
+    WHERE t.search_count > 0
+    RETURN t.track_id AS track_id, t.search_count AS count
+    """
+    with get_driver().session(database=NEO4J_DB) as s:
+        return {r["track_id"]: r["count"] for r in s.run(q)}
+
+most_searched = Leaderboard(_load_search_counts, search_counts.snapshot)
+
+def _record_search(track_id):
+    """Compte une recherche ; renvoie l'incrément pas encore écrit."""
+    most_searched.record(track_id)
+    return search_counts.add(track_id)
+
+def increment_search_count(track_id):
+    """Incrémente le compteur de recherche d'une chanson (REQUÊTE DE MODIFICATION)
+
+    L'incrément est mis en tampon ; la valeur renvoyée l'inclut déjà.
+    """
+    q = """
+    MATCH (t:Track {track_id: $track_id})
+    RETURN coalesce(t.search_count, 0) AS search_count
+    """
+    with session() as s:
+        result = s.run(q, track_id=track_id).single()
+    if result is None:
+        return 0
+    return result["search_count"] + _record_search(track_id)
+
+@cached(ttl=CATALOG_TTL)
+def _tracks_of(track_ids):
+    """{track_id: (nom, artistes)} pour quelques chansons."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        infos = [snapshot.track_info(track_id) for track_id in track_ids]
+        if all(info is not None for info in infos):
+            return {info["track_id"]: (info["track"], info["artists"]) for info in infos}
+    q = """
+    UNWIND $track_ids AS track_id
+    MATCH (t:Track {track_id: track_id})
+    OPTIONAL MATCH (t)-[:PERFORMED_BY]->(a:Artist)
+    RETURN track_id, t.track_name AS name, collect(DISTINCT a.artist_name) AS artists
+    """
+    with session() as s:
+        return {r["track_id"]: (r["name"], r["artists"]) for r in s.run(q, track_ids=list(track_ids))}
+
+def get_most_searched_tracks(limit=10, window=None):
+    """Récupère les chansons les plus recherchées (REQUÊTE D'AGRÉGATION)
+
+    Classement tenu en mémoire (leaderboard.Leaderboard) ; seuls les noms
+    et artistes des limit chansons retenues sont lus (instantané, sinon
+    Neo4j). window : None
+    (depuis toujours) ou une clé de leaderboard.WINDOWS ("hour", "day").
+    """
+    top = most_searched.top(limit, window)
+    tracks = _tracks_of(tuple(track_id for track_id, _ in top)) if top else {}
+    return [{"track_id": track_id, "track": tracks[track_id][0], "count": count,
+             "artists": tracks[track_id][1]}
+            for track_id, count in top if track_id in tracks]
+
+def invalidate_catalog():
+    """À appeler après un rechargement du dataset dans Neo4j."""
+    for fn in (get_all_artists, get_all_genres, get_tracks, count_tracks, get_track_index, _tracks_of,
+               explore_neighbourhood):
+        fn.invalidate()
+    most_searched.reset()
+    snapshots.reload()
+
+# Nouvel instantané : les listes mises en cache viennent de l'ancien
+snapshots.listeners.append(lambda snapshot: invalidate_catalog())
+
+def get_graph_neighbourhood(track_id):
+    snapshot = get_snapshot()
+    neighbourhood = snapshot.neighbourhood(track_id) if snapshot is not None else None
+    if neighbourhood is not None:
+        return neighbourhood
+    q = """
+    MATCH (t:Track {track_id:$track_id})
+    OPTIONAL MATCH (t)-[:PERFORMED_BY]->(a:Artist)
+    OPTIONAL MATCH (t)-[:IN_GENRE]->(g:Genre)
+    OPTIONAL MATCH (t)-[:SIMILAR_TO]->(s:Track)
+    RETURN
+      collect(DISTINCT a.artist_name) AS artists,
+      collect(DISTINCT g.genre_name) AS genres,
+      collect(DISTINCT CASE WHEN s IS NOT NULL THEN {track_id: s.track_id, track: s.track_name} END) AS similars
+    """
+    with session() as s:
+        return s.run(q, track_id=track_id).single()
+
+def get_track_detail(track_id):
+    """Tout ce qu'affiche la page d'une chanson, en un seul aller-retour
+    (lecture seule) : infos, artistes, genres, recommandations et voisins du
+    graphe. La recherche est comptée via le tampon search_counts.
+
+    Renvoie None si la chanson n'existe pas.
+    """
+    snapshot = get_snapshot()
+    detail = snapshot.track_detail(track_id) if snapshot is not None else None
+    if detail is not None:
+        _record_search(track_id)
+        # Total du classement : valeur écrite (relue périodiquement) + tampon
+        detail["search_count"] = most_searched.count(track_id)
+        return detail
+
+    q = """
+    MATCH (t:Track {track_id:$track_id})
+    WITH t
+    CALL {
+      WITH t
+      OPTIONAL MATCH (t)-[:PERFORMED_BY]->(a:Artist)
+      RETURN collect(DISTINCT a.artist_name) AS artists
+    }
+    CALL {
+      WITH t
+      OPTIONAL MATCH (t)-[:IN_GENRE]->(g:Genre)
+      RETURN collect(DISTINCT g.genre_name) AS genres
+    }
+    CALL {
+      WITH t
+      OPTIONAL MATCH (t)-[:SIMILAR_TO]->(r:Track)
+      OPTIONAL MATCH (r)-[:PERFORMED_BY]->(ra:Artist)
+      WITH r, collect(DISTINCT ra.artist_name) AS r_artists
+      ORDER BY r.popularity DESC
+      RETURN
+        collect(CASE WHEN r IS NOT NULL THEN {
+          track_id: r.track_id,
+          track: r.track_name,
+          popularity: r.popularity,
+          energy: r.energy,
+          valence: r.valence,
+          artists: r_artists
+        } END)[..5] AS recommendations,
+        collect(CASE WHEN r IS NOT NULL THEN {track_id: r.track_id, track: r.track_name} END) AS similars
+    }
+    RETURN
+      t.track_id AS track_id,
+      t.track_name AS track,
+      coalesce(t.search_count, 0) AS search_count,
+      coalesce(t.popularity,0) AS popularity,
+      coalesce(t.energy,0.0) AS energy,
+      coalesce(t.valence,0.0) AS valence,
+      coalesce(t.danceability,0.0) AS danceability,
+      coalesce(t.acousticness,0.0) AS acousticness,
+      coalesce(t.instrumentalness,0.0) AS instrumentalness,
+      coalesce(t.liveness,0.0) AS liveness,
+      coalesce(t.speechiness,0.0) AS speechiness,
+      artists,
+      genres,
+      recommendations,
+      similars
+    """
+    with session() as s:
+        record = s.run(q, track_id=track_id).single()
+    if record is None:
+        return None
+    detail = record.data()
+    # Compteur affiché = valeur écrite + incréments encore en tampon
+    detail["search_count"] += _record_search(track_id)
+    return detail
+
+# ================= EXPLORATION À PLUSIEURS SAUTS =================
+# Une requête par type de nœud de la frontière et par saut. Chaque CALL
+# borne ses voisins par LIMIT avant de remonter : un genre « pop » relié à des
+# dizaines de milliers de chansons ne renvoie que $fan_out lignes.
+EXPLORE_QUERIES = {
+    "track": """
+    UNWIND $keys AS key
+    MATCH (t:Track {track_id: key})
+    CALL {
+      WITH t
+      MATCH (t)-[:SIMILAR_TO]->(n:Track)
+      RETURN 'SIMILAR_TO' AS rel, 'track' AS kind, n.track_id AS id, n.track_name AS name
+      ORDER BY n.popularity DESC
+      LIMIT $fan_out
+      UNION
+      WITH t
+      MATCH (t)-[:PERFORMED_BY]->(n:Artist)
+      RETURN 'PERFORMED_BY' AS rel, 'artist' AS kind, n.artist_id AS id, n.artist_name AS name
+      LIMIT $fan_out
+      UNION
+      WITH t
+      MATCH (t)-[:IN_GENRE]->(n:Genre)
+      RETURN 'IN_GENRE' AS rel, 'genre' AS kind, n.genre_id AS id, n.genre_name AS name
+      LIMIT $fan_out
+    }
+    RETURN key, rel, kind, id, name, false AS incoming
+    LIMIT $budget
+    """,
+    "artist": """
+    UNWIND $keys AS key
+    MATCH (a:Artist {artist_id: key})
+    CALL {
+      WITH a
+      MATCH (n:Track)-[:PERFORMED_BY]->(a)
+      RETURN n
+      ORDER BY n.popularity DESC
+      LIMIT $fan_out
+    }
+    RETURN key, 'PERFORMED_BY' AS rel, 'track' AS kind, n.track_id AS id, n.track_name AS name,
+           true AS incoming
+    LIMIT $budget
+    """,
+    # Pas de tri sur un genre : il faudrait lire toutes ses chansons
+    "genre": """
+    UNWIND $keys AS key
+    MATCH (g:Genre {genre_id: key})
+    CALL {
+      WITH g
+      MATCH (n:Track)-[:IN_GENRE]->(g)
+      RETURN n
+      LIMIT $fan_out
+    }
+    RETURN key, 'IN_GENRE' AS rel, 'track' AS kind, n.track_id AS id, n.track_name AS name,
+           true AS incoming
+    LIMIT $budget
+    """,
+}
+
+def _explore(root_name, track_id, hops, fan_out, max_nodes, fetch):
+    """Parcours en largeur commun aux deux sources ; fetch(kind, keys, limit)
+    renvoie les lignes de EXPLORE_QUERIES[kind]."""
+    root = "track:" + track_id
+    nodes = {root: {"id": root, "kind": "track", "name": root_name, "hop": 0}}
+    edges = set()
+    frontier = {"track": [track_id]}
+
+    for hop in range(1, hops + 1):
+        next_frontier = {}
+        for kind, keys in frontier.items():
+            budget = max_nodes - len(nodes)
+            if budget <= 0:
+                break
+            # Borne en lignes, pas en nœuds : les arêtes vers des nœuds
+            # déjà vus reviennent aussi
+            for r in fetch(kind, keys, budget * fan_out):
+                source = f"{kind}:{r['key']}"
+                node = f"{r['kind']}:{r['id']}"
+                if node not in nodes:
+                    if len(nodes) >= max_nodes:
+                        continue
+                    nodes[node] = {"id": node, "kind": r["kind"], "name": r["name"], "hop": hop}
+                    next_frontier.setdefault(r["kind"], []).append(r["id"])
+                edge = (node, source) if r["incoming"] else (source, node)
+                edges.add((*edge, r["rel"]))
+        frontier = next_frontier
+        if not frontier:
+            break
+
+    return {"nodes": list(nodes.values()),
+            "edges": [{"from": a, "to": b, "rel": rel} for a, b, rel in sorted(edges)]}
+
+@cached(ttl=CATALOG_TTL, maxsize=64)
+def explore_neighbourhood(track_id, hops=EXPLORE_HOPS, fan_out=EXPLORE_FAN_OUT,
+                          max_nodes=EXPLORE_MAX_NODES):
+    """Voisinage de la chanson jusqu'à hops sauts, en largeur d'abord.
+
+    Chaque nœud n'apporte qu'au plus fan_out voisins par relation et
+    l'exploration s'arrête à max_nodes nœuds. Renvoie {"nodes": [...],
+    "edges": [...]} ; un nœud a un id préfixé par son type ("track:",
+    "artist:", "genre:"), kind, name et hop. None si la chanson n'existe pas.
+
+    Servi par l'instantané quand il contient la chanson, sinon par Neo4j.
+    """
+    snapshot = get_snapshot()
+    info = snapshot.track_info(track_id) if snapshot is not None else None
+    if info is not None:
+        return _explore(info["track"], track_id, hops, fan_out, max_nodes,
+                        lambda kind, keys, limit: snapshot.explore_rows(kind, keys, fan_out, limit))
+    with session() as s:
+        name = s.run("MATCH (t:Track {track_id: $id}) RETURN t.track_name AS name",
+                     id=track_id).single()
+        if name is None:
+            return None
+        return _explore(name["name"], track_id, hops, fan_out, max_nodes,
+                        lambda kind, keys, limit: s.run(EXPLORE_QUERIES[kind], keys=keys,
+                                                        fan_out=fan_out, budget=limit))
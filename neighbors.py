@@ -0,0 +1,307 @@
+import argparse
+
+import numpy as np
+
+# ================= CONFIG =================
+TOP_K = 5
+# Nombre de lignes requêtes traitées par bloc : la mémoire de pointe est
+# bornée par BLOCK_SIZE x N scores float32 (≈ 46 Mo pour 1024 x 11.5k)
+BLOCK_SIZE = 1024
+# Candidats supplémentaires retenus en float32 puis re-scorés en float64,
+# pour que l'ordre et les scores écrits restent ceux du calcul exact
+CANDIDATE_MARGIN = 5
+
+# Index approximatif (IVF) : recall@k visé et taille de l'échantillon de mesure
+RECALL_TARGET = 0.95
+RECALL_SAMPLE = 1000
+KMEANS_ITERATIONS = 10
+
+# ================= TOP-K EXACT PAR BLOCS =================
+def normalize_rows(x, dtype=np.float32):
+    """Normalise chaque ligne en L2 (les lignes nulles restent nulles)."""
+    x = np.asarray(x, dtype=np.float64)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (x / norms).astype(dtype, copy=False)
+
+def normalized_pair(embeddings):
+    """Embeddings normalisés en float64 (re-score) et leur copie float32 (sélection)."""
+    exact = normalize_rows(embeddings, np.float64)
+    return exact, exact.astype(np.float32)
+
+def iter_topk_blocks(embeddings, k=TOP_K, block_size=BLOCK_SIZE, query_rows=None, base_rows=None,
+                     fast=None):
+    """Parcourt les lignes requêtes par blocs et renvoie, pour chaque bloc, les
+    k voisins les plus proches (hors soi-même) au sens du cosinus.
+
+    query_rows / base_rows restreignent les requêtes et les candidats à un
+    sous-ensemble de lignes (toutes par défaut) ; les indices renvoyés sont
+    toujours ceux de embeddings.
+
+    Si fast est fourni, embeddings est supposé déjà normalisé en float64 et
+    fast en est la copie float32 (cf. normalized_pair) : rien n'est recopié,
+    ce qui permet de travailler directement sur des fichiers mappés.
+
+    Seul un bloc de block_size x N scores float32 est en mémoire à la fois ;
+    les candidats retenus sont re-scorés en float64, ce qui donne les mêmes
+    voisins et les mêmes scores (à l'arrondi près) que la matrice complète.
+    """
+    n = len(embeddings)
+    if fast is None:
+        exact, fast = normalized_pair(embeddings)
+    else:
+        exact = embeddings
+    fast_base = fast if base_rows is None else fast[base_rows]
+    query_rows = np.arange(n) if query_rows is None else np.asarray(query_rows)
+    base_rows = np.arange(n) if base_rows is None else np.asarray(base_rows)
+
+    n_base = len(base_rows)
+    k = min(k, n_base - 1) if np.isin(query_rows, base_rows).any() else min(k, n_base)
+    # +1 : la ligne elle-même fait presque toujours partie des candidats
+    n_candidates = min(k + 1 + CANDIDATE_MARGIN, n_base)
+
+    for start in range(0, len(query_rows), block_size):
+        rows = query_rows[start:start + block_size]
+
+        scores = fast[rows] @ fast_base.T
+        candidates = base_rows[np.argpartition(scores, -n_candidates, axis=1)[:, -n_candidates:]]
+        del scores
+
+        # Re-score exact des seuls candidats, soi-même exclu
+        exact_scores = np.einsum("ij,ikj->ik", exact[rows], exact[candidates])
+        exact_scores[candidates == rows[:, None]] = -np.inf
+
+        # Tri des seuls k gagnants ; à score égal, l'indice le plus grand
+        # d'abord, comme l'ancien argsort()[::-1]
+        order = np.lexsort((-candidates, -exact_scores), axis=1)[:, :k]
+        yield (
+            start,
+            np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(exact_scores, order, axis=1),
+        )
+
+def topk_neighbors(embeddings, k=TOP_K, block_size=BLOCK_SIZE, query_rows=None, base_rows=None,
+                   fast=None):
+    """Renvoie deux tableaux (nb requêtes, k) : indices des voisins et scores cosinus."""
+    n_queries = len(embeddings) if query_rows is None else len(query_rows)
+    neighbors, scores = [], []
+    for _, top_indices, top_scores in iter_topk_blocks(embeddings, k, block_size, query_rows,
+                                                       base_rows, fast):
+        neighbors.append(top_indices)
+        scores.append(top_scores)
+    if not neighbors:
+        return np.empty((n_queries, 0), dtype=np.int64), np.empty((n_queries, 0))
+    return np.vstack(neighbors), np.vstack(scores)
+
+def merge_topk(neighbors, scores, new_neighbors, new_scores, k=TOP_K):
+    """Fusionne deux listes de voisins par ligne et garde les k meilleurs."""
+    neighbors = np.hstack([neighbors, new_neighbors])
+    scores = np.hstack([scores, new_scores])
+    order = np.lexsort((-neighbors, -scores), axis=1)[:, :k]
+    return np.take_along_axis(neighbors, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+# ================= BACKENDS =================
+# Interface commune : build(embeddings) puis search(query_rows, k), qui renvoie
+# (indices, scores) de forme (len(query_rows), k), soi-même exclu.
+
+class ExactBackend:
+    """Recherche exacte : top-k cosinus par blocs sur tout le catalogue."""
+
+    name = "exact"
+
+    def __init__(self, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.embeddings = None
+
+    def build(self, embeddings):
+        self.embeddings = embeddings
+        return self
+
+    def search(self, query_rows=None, k=TOP_K):
+        return topk_neighbors(self.embeddings, k, self.block_size, query_rows)
+
+
+class IVFBackend:
+    """Index approximatif IVF (inverted file) en NumPy.
+
+    Les vecteurs normalisés sont répartis en n_lists listes par un k-means
+    sphérique ; une requête ne parcourt que les n_probe listes dont le
+    centroïde est le plus proche. n_probe est choisi au build comme la plus
+    petite valeur atteignant recall_target sur un échantillon, mesuré contre
+    la recherche exacte.
+    """
+
+    name = "ivf"
+
+    def __init__(self, n_lists=None, recall_target=RECALL_TARGET, sample_size=RECALL_SAMPLE,
+                 block_size=BLOCK_SIZE, seed=0):
+        self.n_lists = n_lists
+        self.recall_target = recall_target
+        self.sample_size = sample_size
+        self.block_size = block_size
+        self.seed = seed
+        self.n_probe = 1
+        self.recall = None
+        self.track_ids = None
+
+    # ---------- construction ----------
+    def _assign(self, vectors):
+        lists = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), self.block_size):
+            block = vectors[start:start + self.block_size]
+            lists[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return lists
+
+    def _train(self, vectors, rng):
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), 64 * self.n_lists), replace=False)]
+        self.centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            lists = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, lists, sample)
+            empty = np.bincount(lists, minlength=self.n_lists) == 0
+            # Une liste vide repart d'un point tiré au hasard
+            sums[empty] = sample[rng.choice(len(sample), empty.sum())]
+            self.centroids = normalize_rows(sums)
+
+    def build(self, embeddings):
+        vectors = normalize_rows(embeddings)
+        n = len(vectors)
+        rng = np.random.default_rng(self.seed)
+        if self.n_lists is None:
+            self.n_lists = int(np.clip(4 * np.sqrt(n), 1, n))
+        self.n_lists = min(self.n_lists, n)
+
+        self._train(vectors, rng)
+        lists = self._assign(vectors)
+
+        # Listes inversées : vecteurs triés par liste + offsets
+        self.order = np.argsort(lists, kind="stable")
+        self.vectors = vectors[self.order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=self.n_lists))])
+
+        self._tune(embeddings, rng)
+        return self
+
+    def _tune(self, embeddings, rng):
+        """Choisit n_probe pour atteindre recall_target (recall@k sur un échantillon)."""
+        n = len(self.vectors)
+        sample = np.sort(rng.choice(n, min(n, self.sample_size), replace=False))
+        exact, _ = topk_neighbors(embeddings, TOP_K, self.block_size, sample)
+
+        n_probe = 1
+        while True:
+            self.n_probe = n_probe
+            approx, _ = self.search(sample, TOP_K)
+            self.recall = recall_at_k(approx, exact)
+            if self.recall >= self.recall_target or n_probe >= self.n_lists:
+                break
+            n_probe = min(2 * n_probe, self.n_lists)
+
+    # ---------- recherche ----------
+    def search_vectors(self, queries, k=TOP_K, exclude=None):
+        """Top-k pour des vecteurs quelconques ; exclude[i] = ligne à ignorer (ou -1)."""
+        queries = normalize_rows(queries)
+        n_probe = min(self.n_probe, self.n_lists)
+        neighbors = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf)
+
+        for start in range(0, len(queries), self.block_size):
+            block = queries[start:start + self.block_size]
+            centroid_scores = block @ self.centroids.T
+            probes = np.argpartition(centroid_scores, -n_probe, axis=1)[:, -n_probe:]
+
+            for offset, (query, probe) in enumerate(zip(block, probes)):
+                if self.list_sizes[probe].sum() < k + 1:
+                    probe = self._widen(centroid_scores[offset], k + 1)
+                positions = np.concatenate([
+                    np.arange(self.offsets[l], self.offsets[l + 1]) for l in probe
+                ])
+                rows = self.order[positions]
+                candidate_scores = self.vectors[positions] @ query
+                if exclude is not None:
+                    candidate_scores[rows == exclude[start + offset]] = -np.inf
+                top = min(k, len(rows))
+                best = np.argpartition(candidate_scores, -top)[-top:]
+                best = best[np.lexsort((-rows[best], -candidate_scores[best]))]
+                best = best[np.isfinite(candidate_scores[best])]
+                top = len(best)
+                neighbors[start + offset, :top] = rows[best]
+                scores[start + offset, :top] = candidate_scores[best]
+        return neighbors, scores
+
+    @property
+    def list_sizes(self):
+        return np.diff(self.offsets)
+
+    def _widen(self, centroid_scores, n_needed):
+        """Listes les plus proches, en nombre suffisant pour couvrir
+        n_needed vecteurs (k voisins + la requête elle-même) : sans cela les
+        cases non remplies resteraient à -1."""
+        by_score = np.argsort(-centroid_scores, kind="stable")
+        covered = np.cumsum(self.list_sizes[by_score])
+        n_lists = max(self.n_probe, int(np.searchsorted(covered, n_needed)) + 1)
+        return by_score[:n_lists]
+
+    def search(self, query_rows=None, k=TOP_K):
+        if query_rows is None:
+            query_rows = np.arange(len(self.vectors))
+        query_rows = np.asarray(query_rows)
+        # Les vecteurs sont stockés triés par liste : retrouver ceux des requêtes
+        inverse = np.empty_like(self.order)
+        inverse[self.order] = np.arange(len(self.order))
+        return self.search_vectors(self.vectors[inverse[query_rows]], k, exclude=query_rows)
+
+    # ---------- persistance ----------
+    def save(self, path, track_ids=None):
+        np.savez(
+            path,
+            centroids=self.centroids, vectors=self.vectors, order=self.order, offsets=self.offsets,
+            n_probe=self.n_probe, recall=self.recall, recall_target=self.recall_target,
+            track_ids=np.asarray(track_ids if track_ids is not None else [], dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        index = cls(recall_target=float(data["recall_target"]))
+        index.centroids = data["centroids"]
+        index.vectors = data["vectors"]
+        index.order = data["order"]
+        index.offsets = data["offsets"]
+        index.n_lists = len(index.centroids)
+        index.n_probe = int(data["n_probe"])
+        index.recall = float(data["recall"])
+        index.track_ids = data["track_ids"] if len(data["track_ids"]) else None
+        return index
+
+    def similar_to(self, track_id, k=TOP_K):
+        """Requête ad hoc « similaires à X » sur un index chargé depuis le disque."""
+        rows = np.flatnonzero(self.track_ids == track_id)
+        if len(rows) == 0:
+            return []
+        neighbors, scores = self.search(rows[:1], k)
+        return [(str(self.track_ids[i]), float(s)) for i, s in zip(neighbors[0], scores[0]) if i >= 0]
+
+
+BACKENDS = {
+    ExactBackend.name: ExactBackend,
+    IVFBackend.name: IVFBackend,
+}
+
+def recall_at_k(approx, exact):
+    """Part des vrais k plus proches voisins retrouvés par la recherche approchée."""
+    hits = sum(len(np.intersect1d(a, e)) for a, e in zip(approx, exact))
+    return hits / exact.size if exact.size else 1.0
+
+# ================= REQUÊTE AD HOC =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chansons similaires depuis un index IVF sauvegardé")
+    parser.add_argument("track_id")
+    parser.add_argument("--index", default="Dataset/similarity_state/ivf_index.npz")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    index = IVFBackend.load(args.index)
+    for similar_track_id, score in index.similar_to(args.track_id, args.top_k):
+        print(f"{similar_track_id},{score:.6f}")
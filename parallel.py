@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+
+import numpy as np
+
+from neighbors import BLOCK_SIZE, TOP_K, normalized_pair, topk_neighbors
+
+# ================= CONFIG =================
+ENCODE_BATCH_SIZE = 64
+
+# Variables lues par les bibliothèques BLAS / torch au démarrage d'un worker
+_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+@contextmanager
+def _pool(n_workers, initializer=None, initargs=()):
+    """Pool de processus « spawn », chaque worker limité à sa part des cœurs.
+
+    Sans cette limite, N workers x N threads BLAS se disputeraient les cœurs.
+    L'environnement du parent n'est modifié que pendant la vie du pool.
+    """
+    threads = str(max(1, (os.cpu_count() or 1) // n_workers))
+    saved = {name: os.environ.get(name) for name in _THREAD_ENV}
+    os.environ.update({name: threads for name in _THREAD_ENV})
+    try:
+        with ProcessPoolExecutor(n_workers, mp_context=get_context("spawn"),
+                                 initializer=initializer, initargs=initargs) as pool:
+            yield pool
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def _shards(n, n_shards):
+    bounds = np.linspace(0, n, n_shards + 1, dtype=np.int64)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+# ================= ENCODAGE =================
+_encoder = None
+_encode_batch_size = ENCODE_BATCH_SIZE
+
+def _init_encoder(model_name, batch_size):
+    # Une instance du modèle par worker
+    global _encoder, _encode_batch_size
+    from sentence_transformers import SentenceTransformer
+    _encoder = SentenceTransformer(model_name)
+    _encode_batch_size = batch_size
+
+def _encode_shard(texts):
+    return _encoder.encode(texts, batch_size=_encode_batch_size, show_progress_bar=False)
+
+def encode_parallel(texts, model_name, n_workers, batch_size=ENCODE_BATCH_SIZE):
+    """Encode texts en répartissant des tranches contiguës sur n_workers processus."""
+    texts = list(texts)
+    # Plusieurs tranches par worker pour lisser les écarts de longueur de texte
+    shards = _shards(len(texts), n_workers * 4)
+    with _pool(n_workers, _init_encoder, (model_name, batch_size)) as pool:
+        parts = list(pool.map(_encode_shard, [texts[a:b] for a, b in shards]))
+    return np.vstack(parts).astype(np.float32, copy=False)
+
+# ================= TOP-K =================
+_exact = None
+_fast = None
+
+def _init_topk(exact_path, fast_path):
+    # Les embeddings normalisés sont partagés via des fichiers mappés en mémoire
+    global _exact, _fast
+    _exact = np.load(exact_path, mmap_mode="r")
+    _fast = np.load(fast_path, mmap_mode="r")
+
+def _topk_shard(task):
+    start, stop, k, block_size = task
+    return topk_neighbors(_exact, k, block_size, query_rows=np.arange(start, stop), fast=_fast)
+
+def topk_parallel(embeddings, n_workers, k=TOP_K, block_size=BLOCK_SIZE):
+    """Top-k exact réparti par plages de lignes requêtes, puis fusionné."""
+    exact, fast = normalized_pair(embeddings)
+    tmp_dir = tempfile.mkdtemp(prefix="similarity_")
+    try:
+        exact_path = os.path.join(tmp_dir, "exact.npy")
+        fast_path = os.path.join(tmp_dir, "fast.npy")
+        np.save(exact_path, exact)
+        np.save(fast_path, fast)
+        del exact, fast
+
+        tasks = [(a, b, k, block_size) for a, b in _shards(len(embeddings), n_workers * 4)]
+        with _pool(n_workers, _init_topk, (exact_path, fast_path)) as pool:
+            parts = list(pool.map(_topk_shard, tasks))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return np.vstack([p[0] for p in parts]), np.vstack([p[1] for p in parts])
@@ -1,73 +1,51 @@
-import pandas as pd
-import numpy as np
+import argparse
+import csv
+import hashlib
+import io
+import os
 import re
+import unicodedata
 
-# ==========================
-# 1. CHARGEMENT ROBUSTE
-# ==========================
-
-df = pd.read_csv(
-    "C:/Users/makta/OneDrive/Documents/Semestre 7 4iiR/Big Data/Projet/dataset.csv",
-    sep=",",
-    engine="python",
-    quotechar='"',
-    quoting=3,
-    on_bad_lines="skip",
-    encoding="utf-8"
-)
-
-print("Dataset chargé :", df.shape)
-
-# ==========================
-# 2. NETTOYAGE DES COLONNES
-# ==========================
-
-# Suppression colonnes vides
-df.dropna(axis=1, how="all", inplace=True)
-
-# Suppression colonnes Unnamed
-df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
-
-# Nettoyage noms colonnes (;;;;;)
-df.columns = (
-    df.columns
-    .str.strip()
-    .str.replace(";", "", regex=False)
-    .str.replace("  ", " ")
-)
+import pandas as pd
+import numpy as np
 
-print("Colonnes propres :", df.columns.tolist())
+from tables import FORMATS, TableWriter, parse_formats, with_format
 
 # ==========================
-# 3. NETTOYAGE DES DONNÉES
+# CONFIG
 # ==========================
 
-# Valeurs manquantes
-df["artists"] = df["artists"].fillna("")
-df["track_name"] = df["track_name"].fillna("unknown")
-df["album_name"] = df["album_name"].fillna("unknown")
-df["track_genre"] = df["track_genre"].fillna("unknown")
+SOURCE_CSV = "Dataset/dataset.csv"
+OUTPUT_DIR = "."
+# Lignes lues par chunk : la mémoire utilisée ne dépend que de cette taille
+# (et des ensembles d'empreintes), pas de la taille du fichier source
+CHUNK_SIZE = 100_000
 
-# Colonnes numériques
-num_cols = [
+NUM_COLS = [
     "popularity", "duration_ms", "danceability", "energy",
     "speechiness", "acousticness", "instrumentalness",
     "liveness", "valence", "tempo"
 ]
-
-for col in num_cols:
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-# Boolean
-if "explicit" in df.columns:
-    df["explicit"] = df["explicit"].fillna(False).astype(bool)
-
-# ==========================
-# 4. CRÉATION DES TRACKS
-# ==========================
-
-tracks = df[[
+# Lignes de données examinées pour détecter le séparateur
+SAMPLE_LINES = 1000
+# Identifiant Spotify : 22 caractères base 62. Une ligne mal découpée met
+# ici une ligne entière (espaces, séparateurs)
+TRACK_ID_PATTERN = r"[0-9A-Za-z]{22}"
+# Au-delà de cette part de lignes rejetées, le fichier est mal lu : arrêt
+MAX_REJECTED_RATIO = 0.5
+
+# Caractères hexadécimaux de l'empreinte ajoutée aux identifiants des noms
+# non ASCII (cf. normalize_id)
+ID_HASH_CHARS = 10
+
+# Colonnes lues comme texte quel que soit leur contenu
+TEXT_COLS = ["track_id", "artists", "album_name", "track_name", "track_genre"]
+
+# Colonnes entières : typées explicitement pour que tous les chunks
+# s'écrivent de la même façon (73 et non 73.0)
+INT_COLS = ["popularity", "duration_ms"]
+
+TRACK_COLS = [
     "track_id",
     "track_name",
     "popularity",
@@ -81,113 +59,401 @@ tracks = df[[
     "liveness",
     "valence",
     "tempo"
-]].drop_duplicates()
+]
 
-tracks.to_csv("tracks.csv", index=False)
-print("tracks.csv créé")
+EMBEDDING_COLS = [
+    "track_id",
+    "embedding_text",
+    "danceability",
+    "energy",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo"
+]
 
 # ==========================
-# 5. CRÉATION DES ARTISTS
+# OUTILS DE STREAMING
 # ==========================
 
-artist_rows = []
+class SeenKeys:
+    """Ensemble compact des lignes déjà écrites : une empreinte 64 bits par
+    ligne, dans un tableau trié (8 octets par clé au lieu d'un objet Python)."""
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint64)
 
-for artists in df["artists"]:
-    split_artists = [a.strip() for a in re.split("[,;]", artists) if a.strip()]
-    for artist in split_artists:
-        artist_rows.append({"artist_name": artist})
+    def __len__(self):
+        return len(self.keys)
 
-artists_df = pd.DataFrame(artist_rows).drop_duplicates()
-artists_df["artist_id"] = (
-    artists_df["artist_name"]
-    .str.lower()
-    .str.replace(" ", "_")
-    .str.replace("[^a-z0-9_]", "", regex=True)
-)
+    def new_rows(self, frame):
+        """Masque des lignes de frame jamais vues (premières occurrences), qui
+        sont ajoutées à l'ensemble."""
+        hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+        first = ~pd.Series(hashes).duplicated().to_numpy()
+        if len(self.keys):
+            pos = np.minimum(np.searchsorted(self.keys, hashes), len(self.keys) - 1)
+            first &= self.keys[pos] != hashes
+        self.keys = np.sort(np.concatenate([self.keys, hashes[first]]))
+        return first
 
-artists_df.to_csv("artists.csv", index=False)
-print("artists.csv créé")
 
 # ==========================
-# 6. CRÉATION DES GENRES
+# 1. CHARGEMENT ROBUSTE
 # ==========================
 
-genres_df = df[["track_genre"]].drop_duplicates()
-genres_df.columns = ["genre_name"]
-genres_df["genre_id"] = (
-    genres_df["genre_name"]
-    .str.lower()
-    .str.replace(" ", "_")
-    .str.replace("[^a-z0-9_]", "", regex=True)
-)
+def line_separator(line, n_fields):
+    """Séparateur d'une ligne : ";" si elle en contient assez pour toutes
+    les colonnes, sinon ","."""
+    return ";" if line.count(";") >= n_fields - 1 else ","
+
+def detect_separator(path, sample=SAMPLE_LINES):
+    """(séparateur de l'en-tête, séparateurs mélangés ?).
+
+    L'export réel a un en-tête en ";" mais une majorité de lignes en "," :
+    le séparateur est vérifié sur les premières lignes de données.
+    """
+    with open(path, encoding="utf-8") as f:
+        header = f.readline()
+        lines = [line for _, line in zip(range(sample), f)]
+    sep = ";" if header.count(";") > header.count(",") else ","
+    n_fields = len(header.rstrip("\r\n;,").split(sep))
+    mixed = any(line_separator(line, n_fields) != sep for line in lines if line.strip())
+    return sep, mixed
+
+def restore_line(line):
+    """Ligne d'origine d'une ligne de l'export, sans fin de ligne ni ";"
+    finaux.
+
+    Une partie de l'export est passée une seconde fois par un tableur en
+    ";" : les lignes contenant des guillemets y ont été citées en entier
+    ("" pour "), et coupées aux ";" des noms d'artistes. Les champs de ce
+    second passage sont relus puis recollés par ";".
+    """
+    line = line.rstrip("\r\n")
+    if '"' in line:
+        line = ";".join(next(csv.reader([line], delimiter=";", quotechar='"')))
+    return line.rstrip(";")
+
+class ArtistRejoin:
+    """Rattrapage d'une ligne découpée à champs en trop : dans les lignes en
+    ";" de l'export, les artistes sont eux aussi séparés par ";", les champs
+    surnuméraires sont donc recollés dans la colonne artists. Même contrat
+    qu'un on_bad_lines de pandas : renvoie les champs réparés, ou None pour
+    rejeter la ligne (comptée dans rejected)."""
+
+    def __init__(self, columns):
+        self.n_fields = len(columns)
+        self.artists = columns.index("artists") if "artists" in columns else -1
+        self.rejected = 0
+
+    def __call__(self, fields):
+        extra = len(fields) - self.n_fields
+        if extra == 0:
+            return fields
+        if extra < 0 or self.artists < 0:
+            self.rejected += 1
+            return None
+        a = self.artists
+        return fields[:a] + [";".join(fields[a:a + extra + 1])] + fields[a + extra + 1:]
+
+def _parse_fast(lines, sep, columns):
+    """Lignes sans guillemets au bon nombre de champs : parseur C. Les
+    colonnes texte restent du texte (un track_id ou un titre tout en
+    chiffres ne devient pas un nombre)."""
+    return pd.read_csv(io.StringIO("".join(lines)), sep=sep, names=columns, header=None,
+                       engine="c", quoting=csv.QUOTE_NONE, index_col=False,
+                       dtype={col: str for col in TEXT_COLS if col in columns})
+
+def _parse_repaired(lines, sep, columns, repair):
+    """Autres lignes (citées, champs en trop ou manquants) : module csv,
+    guillemets interprétés, puis repair ligne à ligne."""
+    rows = (repair(fields) for fields in csv.reader(lines, delimiter=sep, quotechar='"'))
+    frame = pd.DataFrame([row for row in rows if row is not None], columns=columns, dtype=str)
+    # Champ vide = valeur manquante, comme pour le parseur C
+    return frame.replace("", np.nan)
+
+def read_chunks(path, sep, mixed=False, chunksize=CHUNK_SIZE):
+    """(chunk, lignes lues, lignes rejetées au découpage) par paquet de
+    chunksize lignes.
+
+    Aucune ligne n'est ignorée sans être comptée : une ligne sans guillemets
+    au nombre de champs attendu passe par le parseur C, les autres par
+    _parse_repaired (champs d'artistes recollés, lignes à champs manquants
+    rejetées). mixed : chaque ligne est lue avec son propre séparateur.
+    """
+    with open(path, encoding="utf-8") as f:
+        header = f.readline().rstrip("\r\n").rstrip(sep)
+        columns = header.split(sep)
+        if "track_id" not in columns:
+            raise ValueError(f"{path} : pas de colonne track_id dans l'en-tête avec le séparateur '{sep}', voir --sep")
+        n_fields = len(columns)
+        while True:
+            lines = [line for _, line in zip(range(chunksize), f)]
+            if not lines:
+                return
+            fast = {";": [], ",": []}
+            slow = {";": [], ",": []}
+            for line in lines:
+                if not line.strip():
+                    continue
+                line = restore_line(line)
+                line_sep = line_separator(line, n_fields) if mixed else sep
+                group = fast if '"' not in line and line.count(line_sep) == n_fields - 1 else slow
+                group[line_sep].append(line + "\n")
+            repair = ArtistRejoin(columns)
+            frames = [_parse_fast(group, s, columns) for s, group in fast.items() if group]
+            frames += [_parse_repaired(group, s, columns, repair) for s, group in slow.items() if group]
+            chunk = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+            yield chunk, len(chunk) + repair.rejected, repair.rejected
+
+# ==========================
+# 2. NETTOYAGE DES COLONNES
+# ==========================
 
-genres_df.to_csv("genres.csv", index=False)
-print("genres.csv créé")
+def clean_columns(df):
+    # Suppression colonnes Unnamed (séparateurs en fin de ligne)
+    # Les colonnes vides ne sont plus supprimées ici : un chunk ne dit rien du
+    # fichier entier, et seules les colonnes nommées ci-dessus sont écrites
+    df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
+
+    # Nettoyage noms colonnes (;;;;;)
+    df.columns = (
+        df.columns
+        .str.strip()
+        .str.replace(";", "", regex=False)
+        .str.replace("  ", " ")
+    )
+    return df
 
 # ==========================
-# 7. RELATION TRACK - ARTIST
+# 3. NETTOYAGE DES DONNÉES
 # ==========================
 
-track_artist = []
+def valid_rows(df):
+    """Masque des lignes exploitables : track_id au format Spotify et
+    numériques lisibles (un champ vide est une valeur manquante, pas une
+    erreur). Calculé avant clean_data, qui remplace les échecs par 0."""
+    valid = df["track_id"].astype(str).str.fullmatch(TRACK_ID_PATTERN).fillna(False).to_numpy(dtype=bool, copy=True)
+    for col in NUM_COLS:
+        if col in df.columns:
+            raw = df[col]
+            parsed = pd.to_numeric(raw, errors="coerce")
+            valid &= ~(parsed.isna() & raw.notna()).to_numpy()
+    return valid
+
+def clean_data(df):
+    # Valeurs manquantes
+    df["artists"] = df["artists"].fillna("")
+    df["track_name"] = df["track_name"].fillna("unknown")
+    df["album_name"] = df["album_name"].fillna("unknown")
+    # Séparateurs et guillemets collés au dernier champ (lignes en "," de
+    # l'export, terminées par ";")
+    df["track_genre"] = df["track_genre"].fillna("unknown").astype(str).str.rstrip(';"')
+
+    # Colonnes numériques
+    for col in NUM_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+            if col in INT_COLS:
+                df[col] = df[col].astype("int64")
+
+    # Boolean
+    # Le type est inféré chunk par chunk : une colonne lue comme texte
+    # donnerait True pour "False" avec astype(bool)
+    if "explicit" in df.columns:
+        df["explicit"] = df["explicit"].astype(str).str.strip().str.lower().eq("true")
+
+    return df
 
-for _, row in df.iterrows():
-    track_id = row["track_id"]
-    artists = [a.strip() for a in re.split("[,;]", row["artists"]) if a.strip()]
+# ==========================
+# 4. CRÉATION DES TRACKS
+# ==========================
+
+def build_tracks(df):
+    return df[TRACK_COLS]
 
-    for artist in artists:
-        track_artist.append({
-            "track_id": track_id,
-            "artist_id": artist.lower().replace(" ", "_")
-        })
+# ==========================
+# 5. CRÉATION DES ARTISTS
+# ==========================
 
-track_artist_df = pd.DataFrame(track_artist).drop_duplicates()
-track_artist_df.to_csv("track_artist_rel.csv", index=False)
-print("track_artist_rel.csv créé")
+def _normalize_name(name):
+    folded = "".join(c for c in unicodedata.normalize("NFKD", name.lower()) if not unicodedata.combining(c))
+    key = re.sub("[^a-z0-9_]", "", folded.replace(" ", "_"))
+    # Lettres et chiffres perdus (\w de re couvre tous les alphabets)
+    kept = key.replace("_", "")
+    if not kept or re.sub(r"[\W_]", "", folded) != kept:
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:ID_HASH_CHARS]
+        key = (key.strip("_") + "_" + digest).strip("_")
+    return key
+
+def normalize_id(names):
+    """Identifiant ASCII d'un nom (clé des MERGE de load_neo4j.py).
+
+    Accents retirés ("Beyoncé" -> "beyonce"). Si des lettres ou chiffres
+    du nom ne passent pas en ASCII (noms japonais, "白銀御行(CV:古川慎)"),
+    l'identifiant reçoit une empreinte du nom : sans elle, ces artistes
+    tomberaient sur "", "_" ou "cv" et fusionneraient en un seul nœud.
+    """
+    names = names.fillna("").astype(str)
+    unique = names.drop_duplicates()
+    ids = names.map(dict(zip(unique, unique.map(_normalize_name))))
+    empty = ids == ""
+    if empty.any():
+        raise ValueError(f"identifiant vide pour {int(empty.sum())} nom(s) : {names[empty].head(5).tolist()}")
+    return ids
+
+def explode_artists(df):
+    """Une ligne par couple (track, artiste), en une passe vectorisée ;
+    sert à la fois pour artists.csv et track_artist_rel.csv."""
+    pairs = (
+        df[["track_id"]]
+        .assign(artist_name=df["artists"].str.split("[,;]", regex=True))
+        .explode("artist_name")
+    )
+    pairs["artist_name"] = pairs["artist_name"].str.strip()
+    pairs = pairs[pairs["artist_name"].fillna("") != ""]
+    pairs["artist_id"] = normalize_id(pairs["artist_name"])
+    return pairs
+
+def build_artists(pairs):
+    return pairs[["artist_name", "artist_id"]].drop_duplicates("artist_name")
 
 # ==========================
-# 8. RELATION TRACK - GENRE
+# 6. CRÉATION DES GENRES
+# ==========================
+
+def build_genres(df):
+    genres_df = df[["track_genre"]].drop_duplicates()
+    genres_df.columns = ["genre_name"]
+    genres_df["genre_id"] = normalize_id(genres_df["genre_name"])
+    return genres_df
+
+# ==========================
+# 7. RELATION TRACK - ARTIST
 # ==========================
 
-track_genre_df = df[["track_id", "track_genre"]].copy()
-track_genre_df["genre_id"] = (
-    track_genre_df["track_genre"]
-    .str.lower()
-    .str.replace(" ", "_")
-    .str.replace("[^a-z0-9_]", "", regex=True)
-)
+def build_track_artist(pairs):
+    # Même artist_id que dans artists.csv : pas de relation orpheline
+    return pairs[["track_id", "artist_id"]]
+
+# ==========================
+# 8. RELATION TRACK - GENRE
+# ==========================
 
-track_genre_df = track_genre_df[["track_id", "genre_id"]].drop_duplicates()
-track_genre_df.to_csv("track_genre_rel.csv", index=False)
-print("track_genre_rel.csv créé")
+def build_track_genre(df):
+    track_genre_df = df[["track_id", "track_genre"]].copy()
+    track_genre_df["genre_id"] = normalize_id(track_genre_df["track_genre"])
+    return track_genre_df[["track_id", "genre_id"]]
 
 # ==========================
 # 9. DONNÉES POUR SIMILARITÉ HYBRIDE
 # ==========================
 
-df["embedding_text"] = (
-    df["track_name"] + " by " +
-    df["artists"] + " genre " +
-    df["track_genre"]
-)
+def build_embedding_input(df):
+    df["embedding_text"] = (
+        df["track_name"] + " by " +
+        df["artists"] + " genre " +
+        df["track_genre"]
+    )
+    return df[EMBEDDING_COLS]
 
-embedding_input = df[[
-    "track_id",
-    "embedding_text",
-    "danceability",
-    "energy",
-    "speechiness",
-    "acousticness",
-    "instrumentalness",
-    "liveness",
-    "valence",
-    "tempo"
-]].drop_duplicates()
+# ==========================
+# PIPELINE PAR CHUNKS
+# ==========================
 
-embedding_input.to_csv("tracks_embeddings_input.csv", index=False)
-print("tracks_embeddings_input.csv créé")
+# Fichier de sortie -> colonnes servant au dédoublonnage (None = ligne entière)
+OUTPUTS = {
+    "tracks": None,
+    "artists": ["artist_name"],
+    "genres": ["genre_name"],
+    "track_artist_rel": None,
+    "track_genre_rel": None,
+    "tracks_embeddings_input": None,
+}
+
+def build_tables(df):
+    pairs = explode_artists(df)
+    return {
+        "tracks": build_tracks(df),
+        "artists": build_artists(pairs),
+        "genres": build_genres(df),
+        "track_artist_rel": build_track_artist(pairs),
+        "track_genre_rel": build_track_genre(df),
+        "tracks_embeddings_input": build_embedding_input(df),
+    }
+
+def prepare(source, output_dir=OUTPUT_DIR, chunksize=CHUNK_SIZE, sep=None, formats=("csv",)):
+    mixed = False
+    if sep is None:
+        sep, mixed = detect_separator(source)
+        if mixed:
+            print(f"⚠️ Séparateurs mélangés (en-tête '{sep}') : chaque ligne est lue avec le sien")
+    chunks = read_chunks(source, sep, mixed, chunksize)
+    os.makedirs(output_dir, exist_ok=True)
+
+    writers = {
+        name: [TableWriter(with_format(os.path.join(output_dir, name), fmt), fmt) for fmt in formats]
+        for name in OUTPUTS
+    }
+    seen = {name: SeenKeys() for name in OUTPUTS}
+    n_rows = 0
+    n_read = 0
+    n_rejected = 0
+
+    for i, (chunk, n_lines, n_unparsed) in enumerate(chunks):
+        df = clean_columns(chunk)
+        valid = valid_rows(df)
+        # Lignes non découpables + lignes découpées mais inexploitables
+        n_read += n_lines
+        n_rejected += n_unparsed + int((~valid).sum())
+        if n_rejected > MAX_REJECTED_RATIO * n_read:
+            raise ValueError(
+                f"{source} : {n_rejected} lignes rejetées sur {n_read} "
+                f"(track_id ou numériques illisibles) ; séparateur '{sep}' probablement faux, voir --sep"
+            )
+        df = clean_data(df[valid].copy())
+        n_rows += len(df)
+
+        for name, table in build_tables(df).items():
+            key_cols = OUTPUTS[name]
+            # Dédoublonnage inter-chunks sur les empreintes des clés
+            keys = table if key_cols is None else table[key_cols]
+            new_rows = table[seen[name].new_rows(keys)]
+            for writer in writers[name]:
+                writer.write(new_rows)
+
+        print(f"Chunk {i + 1} : {n_rows} lignes traitées, {n_rejected} rejetées")
+
+    print("Dataset chargé :", n_rows, "lignes,", n_rejected, "lignes rejetées")
+    for name, name_writers in writers.items():
+        for writer in name_writers:
+            writer.close()
+            print(f"{os.path.basename(writer.path)} créé ({writer.rows} lignes)")
 
 # ==========================
-# FIN
+# MAIN
 # ==========================
 
-print("✅ DATASET NETTOYÉ — PRÊT POUR NEO4J & SIMILARITÉ HYBRIDE")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nettoyage du dataset brut pour Neo4j et la similarité")
+    parser.add_argument("--input", default=SOURCE_CSV)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE,
+                        help="lignes lues par chunk (borne la mémoire)")
+    parser.add_argument("--sep", default=None,
+                        help="séparateur du fichier source (détecté sur l'en-tête par défaut)")
+    parser.add_argument("--format", default="csv", type=parse_formats,
+                        help=f"format(s) de sortie séparés par des virgules parmi {', '.join(FORMATS)} "
+                             "(ex. csv,parquet : Parquet pour le pipeline, CSV pour l'import Neo4j)")
+    args = parser.parse_args()
+
+    prepare(args.input, args.output_dir, args.chunksize, args.sep, args.format)
+
+    # ==========================
+    # FIN
+    # ==========================
+
+    print("✅ DATASET NETTOYÉ — PRÊT POUR NEO4J & SIMILARITÉ HYBRIDE")
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Streamlit ré-exécute app.py à chaque interaction, mais les modules importés
+# restent en mémoire : ces caches sont donc partagés entre reruns et sessions.
+CACHES = {}
+
+
+class QueryCache:
+    """Cache TTL + LRU, thread-safe, avec compteurs de hits / miss."""
+
+    def __init__(self, name, ttl, maxsize=256):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Renvoie (trouvé, valeur)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"name": self.name, "hits": self.hits, "misses": self.misses,
+                    "size": len(self._entries), "ttl": self.ttl}
+
+
+def cached(ttl, maxsize=256):
+    """Met en cache le résultat d'une fonction, par valeur de ses arguments.
+
+    La fonction décorée expose .cache (stats) et .invalidate().
+    """
+    def decorator(fn):
+        cache = CACHES.setdefault(fn.__name__, QueryCache(fn.__name__, ttl, maxsize))
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            found, value = cache.get(key)
+            if not found:
+                value = fn(*args, **kwargs)
+                cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        wrapper.invalidate = cache.invalidate
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    return [cache.stats() for cache in CACHES.values()]
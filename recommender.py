@@ -0,0 +1,208 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from tables import FORMATS, read_table
+
+# ================= CONFIG =================
+DATA_DIR = "Dataset"
+STATE_DIR = "Dataset/similarity_state"
+TOP_K = 5
+# En dessous de cette part du catalogue retenue par les filtres, seuls les
+# candidats sont scorés (E[rows] @ q) au lieu du catalogue entier
+SUBSET_RATIO = 0.25
+
+
+class Recommender:
+    """Top-k cosinus en mémoire sur les embeddings de similarity.py, avec
+    filtres appliqués au moment de la requête.
+
+    embeddings.npy (state_dir) est déjà normalisé : le score d'une chanson est
+    un produit scalaire, calculé pour tout le catalogue en un seul produit
+    matrice-vecteur. Genres, popularité et artistes sont des tableaux alignés
+    sur les lignes de embeddings, lus dans les tables préparées (data_dir).
+    """
+
+    def __init__(self, state_dir=STATE_DIR, data_dir=DATA_DIR, fmt=None):
+        rows = pd.read_csv(os.path.join(state_dir, "rows.csv"), usecols=["track_id"])
+        embeddings = np.load(os.path.join(state_dir, "embeddings.npy"))
+        if len(embeddings) != len(rows):
+            raise ValueError(f"{state_dir} : embeddings.npy et rows.csv ne sont pas alignés")
+
+        # Une ligne par (chanson, genre) dans rows.csv : seule la première
+        # ligne de chaque track_id est gardée, pour qu'une chanson ne soit ni
+        # sa propre voisine (sous un autre genre) ni recommandée deux fois
+        track_ids = rows["track_id"].astype(str)
+        first = ~track_ids.duplicated().to_numpy()
+        self.embeddings = embeddings[first]
+        self.track_ids = track_ids[first].to_numpy()
+        self.position = pd.Index(self.track_ids)
+
+        tracks = read_table(data_dir, "tracks", fmt).drop_duplicates("track_id")
+        tracks = tracks.set_index(tracks["track_id"].astype(str)).reindex(self.track_ids)
+        self.names = tracks["track_name"].fillna("").astype(str).to_numpy()
+        self.popularity = tracks["popularity"].fillna(0).to_numpy(dtype=np.int16)
+        self.energy = tracks["energy"].fillna(0).to_numpy(dtype=np.float32)
+        self.valence = tracks["valence"].fillna(0).to_numpy(dtype=np.float32)
+
+        # genre_id -> lignes, artistes -> lignes et ligne -> artistes (CSR)
+        genres = read_table(data_dir, "track_genre_rel", fmt)
+        self.genre_rows = self._group_rows(genres["track_id"], genres["genre_id"])
+
+        artists = read_table(data_dir, "artists", fmt).drop_duplicates("artist_id")
+        pairs = read_table(data_dir, "track_artist_rel", fmt)
+        pairs = pairs.merge(artists, on="artist_id", how="left")
+        pairs["row"] = self.position.get_indexer(pairs["track_id"].astype(str))
+        pairs = pairs[pairs["row"] >= 0].sort_values("row", kind="stable")
+        self.artist_rows = self._group_rows(pairs["track_id"], pairs["artist_name"])
+        self.artist_names = pairs["artist_name"].fillna("").astype(str).to_numpy()
+        self.artist_ptr = np.searchsorted(pairs["row"].to_numpy(), np.arange(len(self) + 1))
+
+    def _group_rows(self, track_ids, keys):
+        rows = self.position.get_indexer(track_ids.astype(str))
+        frame = pd.DataFrame({"key": keys.astype(str), "row": rows})
+        frame = frame[frame["row"] >= 0]
+        return {key: np.unique(group.to_numpy()) for key, group in frame.groupby("key")["row"]}
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def artists_of(self, row):
+        return self.artist_names[self.artist_ptr[row]:self.artist_ptr[row + 1]].tolist()
+
+    def candidates(self, genre=None, min_popularity=0, max_popularity=100, exclude_artists=()):
+        """Masque booléen des lignes autorisées par les filtres."""
+        mask = (self.popularity >= min_popularity) & (self.popularity <= max_popularity)
+        if genre is not None:
+            genre_mask = np.zeros(len(self), dtype=bool)
+            genre_mask[self.genre_rows.get(genre, [])] = True
+            mask &= genre_mask
+        for artist in exclude_artists:
+            mask[self.artist_rows.get(artist, [])] = False
+        return mask
+
+    def similar(self, track_id, k=TOP_K, genre=None, min_popularity=0, max_popularity=100,
+                exclude_artists=(), exclude_same_artists=False):
+        """[(ligne, score)] des k chansons les plus proches de track_id parmi
+        celles qui passent les filtres (vide si track_id est inconnu)."""
+        row = self.position.get_indexer([track_id])[0]
+        if row < 0:
+            return []
+        exclude = list(exclude_artists)
+        if exclude_same_artists:
+            exclude += self.artists_of(row)
+        mask = self.candidates(genre, min_popularity, max_popularity, exclude)
+        mask[row] = False
+
+        allowed = np.flatnonzero(mask)
+        if len(allowed) == 0:
+            return []
+        query = self.embeddings[row]
+        if len(allowed) < SUBSET_RATIO * len(self):
+            scores = self.embeddings[allowed] @ query
+        else:
+            scores = self.embeddings @ query
+            scores = scores[allowed]
+
+        k = min(k, len(allowed))
+        top = np.argpartition(-scores, k - 1)[:k]
+        # Score décroissant, puis ligne croissante (ordre stable entre appels)
+        top = top[np.lexsort((allowed[top], -scores[top]))]
+        return [(int(allowed[i]), float(scores[i])) for i in top]
+
+    def recommend(self, track_id, k=TOP_K, **filters):
+        """Même forme que les recommandations de music_db (track_id, track,
+        popularity, energy, valence, artists), plus le score."""
+        return [{"track_id": self.track_ids[r], "track": self.names[r],
+                 "popularity": int(self.popularity[r]), "energy": float(self.energy[r]),
+                 "valence": float(self.valence[r]), "artists": self.artists_of(r), "score": score}
+                for r, score in self.similar(track_id, k, **filters)]
+
+
+# ================= SERVICE =================
+# Chargé une fois par processus (le module survit aux reruns Streamlit)
+_recommender = None
+load_error = None
+# Clé des fichiers d'état lors du dernier échec : tant qu'ils n'ont pas
+# changé, les reruns ne relisent ni embeddings.npy ni les tables
+_failed_key = None
+_lock = threading.Lock()
+
+STATE_FILES = ["rows.csv", "embeddings.npy"]
+
+def state_key(state_dir=STATE_DIR):
+    """(fichier, date de modification ou None s'il manque) des fichiers d'état."""
+    key = []
+    for name in STATE_FILES:
+        path = os.path.join(state_dir, name)
+        try:
+            key.append((path, os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            key.append((path, None))
+    return tuple(key)
+
+def get_recommender(state_dir=STATE_DIR, data_dir=DATA_DIR):
+    """Recommender partagé, ou None si similarity.py n'a pas encore produit
+    embeddings.npy ou si son état est illisible (l'appelant retombe alors
+    sur les recommandations SIMILAR_TO de Neo4j).
+
+    Un échec est mémorisé : le chargement n'est retenté qu'après
+    reload_recommender() ou une nouvelle écriture des fichiers d'état.
+    """
+    global _recommender, load_error, _failed_key
+    with _lock:
+        if _recommender is None:
+            key = state_key(state_dir)
+            if key == _failed_key:
+                return None
+            try:
+                _recommender = Recommender(state_dir, data_dir)
+                load_error = None
+            except FileNotFoundError:
+                _failed_key = key
+                return None
+            except Exception as exc:
+                load_error = f"{type(exc).__name__}: {exc}"
+                _failed_key = key
+                return None
+        return _recommender
+
+def reload_recommender():
+    """À appeler après un nouveau run de similarity.py."""
+    global _recommender, _failed_key
+    with _lock:
+        _recommender = None
+        _failed_key = None
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommandations filtrées pour une chanson")
+    parser.add_argument("track_id")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--genre", default=None)
+    parser.add_argument("--min-popularity", type=int, default=0)
+    parser.add_argument("--max-popularity", type=int, default=100)
+    parser.add_argument("--exclude-artist", action="append", default=[])
+    parser.add_argument("--exclude-same-artists", action="store_true")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--format", default=None, choices=FORMATS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    service = Recommender(args.state_dir, args.data_dir, args.format)
+    print(f"{len(service)} chansons chargées en {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    recs = service.recommend(args.track_id, args.top_k, genre=args.genre,
+                             min_popularity=args.min_popularity, max_popularity=args.max_popularity,
+                             exclude_artists=args.exclude_artist,
+                             exclude_same_artists=args.exclude_same_artists)
+    print(f"Requête : {(time.perf_counter() - start) * 1000:.1f} ms")
+    for r in recs:
+        print(f"{r['score']:.4f}  {r['track_id']}  {r['track']} — {', '.join(r['artists'])} "
+              f"(popularité {r['popularity']})")
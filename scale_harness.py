@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+from load_neo4j import NEO4J_DB, NEO4J_PASSWORD, NEO4J_URI, NEO4J_USER
+from tables import EXTENSIONS, FORMATS
+
+# ================= CONFIG =================
+SIZES = [10_000, 100_000, 1_000_000]
+STAGES = ["generate", "prepare", "similarity", "load"]
+# Part de lignes à artistes séparés par ";" (champs en trop), comme dans
+# l'export réel : prepare_dataset.py doit les rattraper ou les compter
+MALFORMED_RATIO = 0.05
+WORK_DIR = "scale_runs"
+OUTPUT_JSON = "scale_harness.json"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ================= ÉTAPES =================
+def stage_commands(size, work, args):
+    """Ligne de commande de chaque étape, dans l'ordre du pipeline."""
+    raw = os.path.join(work, "dataset.csv")
+    fmt = args.format
+    return {
+        "generate": [sys.executable, os.path.join(HERE, "generate_dataset.py"),
+                     "--output", raw, "--rows", str(size), "--seed", str(args.seed),
+                     "--malformed-ratio", str(args.malformed_ratio)],
+        "prepare": [sys.executable, os.path.join(HERE, "prepare_dataset.py"),
+                    "--input", raw, "--output-dir", work, "--format", fmt],
+        "similarity": [sys.executable, os.path.join(HERE, "similarity.py"),
+                       "--input", os.path.join(work, "tracks_embeddings_input" + EXTENSIONS[fmt]),
+                       "--output", os.path.join(work, "tracks_similar.csv"), "--format", fmt,
+                       "--backend", args.backend, "--workers", str(args.workers),
+                       "--cache-dir", os.path.join(work, "embedding_cache"),
+                       "--state-dir", os.path.join(work, "similarity_state"),
+                       "--index", os.path.join(work, "similarity_state", "ivf_index.npz")],
+        "load": [sys.executable, os.path.join(HERE, "load_neo4j.py"), "--data-dir", work,
+                 "--format", fmt, "--uri", args.uri, "--user", args.user,
+                 "--password", args.password, "--database", args.database],
+    }
+
+def run_stage(cmd, log_path):
+    """Lance une étape dans un processus fils ; renvoie durée, code retour,
+    CPU et pic de RSS de ce seul fils (os.wait4)."""
+    with open(log_path, "w") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, cwd=HERE)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "returncode": proc.returncode,
+        "wall_seconds": wall,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        # ru_maxrss : Ko sous Linux
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+        "log": log_path,
+    }
+
+# Dernière ligne de bilan de prepare_dataset.py
+PREPARED = re.compile(r"Dataset chargé : (\d+) lignes, (\d+) lignes rejetées")
+
+def check_prepared(size, result):
+    """Lignes lues = gardées + rejetées : aucune ligne de l'export brut ne
+    disparaît sans être comptée."""
+    with open(result["log"]) as log:
+        found = PREPARED.findall(log.read())
+    if not found:
+        result["error"] = "bilan de prepare_dataset.py introuvable"
+        return
+    kept, rejected = (int(n) for n in found[-1])
+    result["rows_kept"], result["rows_rejected"] = kept, rejected
+    if kept + rejected != size:
+        result["error"] = f"{size} lignes générées, {kept} gardées + {rejected} rejetées"
+
+def run_size(size, args):
+    work = os.path.join(args.work_dir, str(size))
+    os.makedirs(work, exist_ok=True)
+    commands = stage_commands(size, work, args)
+    results = {}
+    for stage in args.stages:
+        result = run_stage(commands[stage], os.path.join(work, f"{stage}.log"))
+        result["rows_per_second"] = size / result["wall_seconds"] if result["wall_seconds"] > 0 else None
+        if stage == "prepare" and result["returncode"] == 0:
+            check_prepared(size, result)
+        results[stage] = result
+        print_stage(size, stage, result)
+        if result["returncode"] != 0:
+            print(f"   ❌ échec (code {result['returncode']}), voir {result['log']} ; étapes suivantes ignorées")
+            break
+        if "error" in result:
+            print(f"   ❌ {result['error']}, voir {result['log']} ; étapes suivantes ignorées")
+            break
+    if not args.keep:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+def print_stage(size, stage, r):
+    print(f"{size:>9} {stage:<11} {r['wall_seconds']:9.2f} s  CPU {r['cpu_seconds']:9.2f} s  "
+          f"pic RSS {r['peak_rss_mb']:8.0f} Mo  {r['rows_per_second'] or 0:>10,.0f} lignes/s")
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pipeline complet (génération -> préparation -> similarité -> Neo4j) à plusieurs tailles")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in SIZES),
+                        help="lignes de l'export brut, séparées par des virgules")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"étapes à exécuter parmi {', '.join(STAGES)} (ex. sans load : pas de Neo4j)")
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--keep", action="store_true", help="conserver les fichiers produits")
+    parser.add_argument("--output", default=OUTPUT_JSON)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--malformed-ratio", type=float, default=MALFORMED_RATIO,
+                        help="part de lignes à artistes séparés par \";\" dans l'export généré")
+    parser.add_argument("--format", default="csv", choices=FORMATS,
+                        help="format des tables entre les étapes")
+    parser.add_argument("--backend", default="exact", help="backend de similarity.py (exact, ivf)")
+    parser.add_argument("--workers", type=int, default=1, help="processus de similarity.py")
+    parser.add_argument("--uri", default=NEO4J_URI)
+    parser.add_argument("--user", default=NEO4J_USER)
+    parser.add_argument("--password", default=NEO4J_PASSWORD)
+    parser.add_argument("--database", default=NEO4J_DB)
+    args = parser.parse_args()
+
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"étape inconnue : {', '.join(sorted(unknown))}")
+    # Toujours dans l'ordre du pipeline
+    args.stages = [s for s in STAGES if s in args.stages]
+
+    report = {"date": time.strftime("%Y-%m-%dT%H:%M:%S"), "cpu_count": os.cpu_count(),
+              "format": args.format, "backend": args.backend, "workers": args.workers,
+              "malformed_ratio": args.malformed_ratio, "results": {}}
+    print(f"{'lignes':>9} {'étape':<11} {'durée':>11}  {'':>15}  {'':>16}  {'débit':>10}")
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        report["results"][str(size)] = run_size(size, args)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"\nRésultats -> {args.output}")
+    failed = [size for size, results in report["results"].items()
+              if any(r["returncode"] != 0 or "error" in r for r in results.values())]
+    if failed:
+        sys.exit(f"❌ échec pour {', '.join(failed)} lignes")
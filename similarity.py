@@ -1,42 +1,282 @@
+import argparse
+import os
+from functools import partial
+
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-
-# Charger le CSV
-df = pd.read_csv("Dataset/tracks_embeddings_input.csv")
-
-# Créer embeddings textuels
-model = SentenceTransformer('all-MiniLM-L6-v2')
-text_embeddings = model.encode(df['embedding_text'].tolist(), show_progress_bar=True)
-
-# Normaliser les features audio
-audio_features = df[['danceability','energy','speechiness','acousticness',
-                     'instrumentalness','liveness','valence','tempo']].fillna(0).values
-audio_features = (audio_features - audio_features.mean(axis=0)) / (audio_features.std(axis=0)+1e-9)
-
-# Combiner texte + audio
-combined_embeddings = np.hstack([text_embeddings, audio_features])
-
-# Calculer similarité cosine
-similarity_matrix = cosine_similarity(combined_embeddings)
-
-# Pour chaque track, récupérer top 5 similaires
-top_k = 5
-similar_tracks = []
-
-for idx, track_id in enumerate(df['track_id']):
-    sim_scores = similarity_matrix[idx]
-    # Ignorer soi-même
-    sim_scores[idx] = -1
-    top_indices = sim_scores.argsort()[-top_k:][::-1]
-    for i in top_indices:
-        similar_tracks.append({
-            'track_id': track_id,
-            'similar_track_id': df['track_id'].iloc[i],
-            'score': sim_scores[i]
-        })
-
-similar_df = pd.DataFrame(similar_tracks)
-similar_df.to_csv("tracks_similar.csv", index=False)
-print("✅ CSV de similarité créé !")
+
+from embedding_cache import EmbeddingCache
+from tables import FORMATS, parse_formats, read_path, write_path
+from parallel import ENCODE_BATCH_SIZE, encode_parallel, topk_parallel
+from neighbors import (BACKENDS, BLOCK_SIZE, RECALL_TARGET, TOP_K, IVFBackend, merge_topk, normalize_rows,
+                       topk_neighbors)
+
+# ================= CONFIG =================
+INPUT_CSV = "Dataset/tracks_embeddings_input.csv"
+OUTPUT_CSV = "tracks_similar.csv"
+MODEL_NAME = 'all-MiniLM-L6-v2'
+CACHE_DIR = "Dataset/embedding_cache"
+STATE_DIR = "Dataset/similarity_state"
+PATCH_CSV = "tracks_similar_patch.csv"
+
+INDEX_PATH = "Dataset/similarity_state/ivf_index.npz"
+
+AUDIO_FEATURES = ['danceability', 'energy', 'speechiness', 'acousticness',
+                  'instrumentalness', 'liveness', 'valence', 'tempo']
+
+# ================= EMBEDDINGS =================
+_model = None
+
+def get_model():
+    # Chargement paresseux : inutile si tout est déjà dans le cache (et
+    # torch n'est pas importé par les outils qui n'encodent rien)
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+def encode_texts(texts, workers=1, batch_size=ENCODE_BATCH_SIZE):
+    if workers > 1 and len(texts) > batch_size:
+        return encode_parallel(texts, MODEL_NAME, workers, batch_size)
+    return get_model().encode(texts, batch_size=batch_size, show_progress_bar=True)
+
+def build_embeddings(df, cache=None, audio_stats=None, encode_fn=encode_texts):
+    """Renvoie (embeddings combinés texte + audio, (moyenne, écart-type) audio).
+
+    audio_stats permet de réutiliser la normalisation d'un run précédent, pour
+    que les lignes déjà calculées restent comparables aux nouvelles.
+    """
+    # Créer embeddings textuels (seuls les textes absents du cache sont encodés)
+    texts = df['embedding_text'].astype(str).tolist()
+    if cache is not None:
+        text_embeddings = cache.encode(texts, encode_fn)
+    else:
+        text_embeddings = encode_fn(texts)
+
+    # Normaliser les features audio
+    audio_features = df[AUDIO_FEATURES].fillna(0).to_numpy(dtype=np.float64)
+    if audio_stats is None:
+        audio_stats = (audio_features.mean(axis=0), audio_features.std(axis=0))
+    mean, std = audio_stats
+    audio_features = (audio_features - mean) / (std+1e-9)
+
+    # Combiner texte + audio
+    return np.hstack([text_embeddings, audio_features]), audio_stats
+
+def neighbors_frame(track_ids, neighbors, scores):
+    """Construit la table track_id / similar_track_id / score en une passe.
+
+    Les cases sans voisin (indice -1, score -inf : moins de k candidats)
+    sont ignorées ; -1 désignerait sinon le dernier track_id. Les couples
+    d'une chanson avec elle-même (même track_id sous deux genres, donc sur
+    deux lignes) le sont aussi.
+    """
+    track_ids = np.asarray(track_ids, dtype=object)
+    k = neighbors.shape[1]
+    neighbors = neighbors.ravel()
+    sources = np.repeat(track_ids, k)
+    found = neighbors >= 0
+    found[found] = track_ids[neighbors[found]] != sources[found]
+    return pd.DataFrame({
+        'track_id': sources[found],
+        'similar_track_id': track_ids[neighbors[found]],
+        'score': scores.ravel()[found],
+    })
+
+# ================= ÉTAT DU DERNIER RUN =================
+# Conservé dans STATE_DIR pour le mode --incremental :
+#   rows.csv        : track_id + empreinte de chaque ligne d'entrée
+#   neighbors.npy   : indices (dans rows.csv) des k voisins de chaque ligne
+#   scores.npy      : scores correspondants
+#   audio_stats.npz : moyenne / écart-type utilisés pour les features audio
+#   embeddings.npy  : embeddings combinés normalisés L2 (float32), alignés sur
+#                     rows.csv ; chargés par le service de recommandation
+
+def row_keys(df):
+    """Empreinte 64 bits de chaque ligne d'entrée (texte + features audio)."""
+    return pd.util.hash_pandas_object(
+        df[['track_id', 'embedding_text'] + AUDIO_FEATURES], index=False
+    ).to_numpy()
+
+def save_state(state_dir, df, neighbors, scores, audio_stats, embeddings=None):
+    os.makedirs(state_dir, exist_ok=True)
+    if embeddings is not None:
+        # Écrit à côté puis renommé : un lecteur ne voit jamais un fichier partiel
+        tmp_path = os.path.join(state_dir, "embeddings.tmp.npy")
+        np.save(tmp_path, normalize_rows(embeddings, np.float32))
+        os.replace(tmp_path, os.path.join(state_dir, "embeddings.npy"))
+    pd.DataFrame({'track_id': df['track_id'], 'row_key': row_keys(df)}).to_csv(
+        os.path.join(state_dir, "rows.csv"), index=False)
+    np.save(os.path.join(state_dir, "neighbors.npy"), neighbors)
+    np.save(os.path.join(state_dir, "scores.npy"), scores)
+    np.savez(os.path.join(state_dir, "audio_stats.npz"), mean=audio_stats[0], std=audio_stats[1])
+
+def load_state(state_dir):
+    try:
+        rows = pd.read_csv(os.path.join(state_dir, "rows.csv"), dtype={'row_key': np.uint64})
+        neighbors = np.load(os.path.join(state_dir, "neighbors.npy"))
+        scores = np.load(os.path.join(state_dir, "scores.npy"))
+        stats = np.load(os.path.join(state_dir, "audio_stats.npz"))
+    except FileNotFoundError:
+        return None
+    return rows, neighbors, scores, (stats['mean'], stats['std'])
+
+def similar_pairs(frame):
+    # Neo4j fusionne les relations (MERGE) : une paire n'existe qu'une fois
+    return frame.drop_duplicates(['track_id', 'similar_track_id'])
+
+def diff_similar(old_frame, new_frame):
+    """Patch SIMILAR_TO : lignes op=add / op=remove entre deux tables."""
+    merged = similar_pairs(old_frame).merge(
+        similar_pairs(new_frame), on=['track_id', 'similar_track_id'],
+        how='outer', suffixes=('_old', '_new'), indicator=True)
+    removed = merged[merged['_merge'] == 'left_only']
+    added = merged[merged['_merge'] == 'right_only']
+    return pd.concat([
+        pd.DataFrame({'op': 'remove', 'track_id': removed['track_id'],
+                      'similar_track_id': removed['similar_track_id'], 'score': removed['score_old']}),
+        pd.DataFrame({'op': 'add', 'track_id': added['track_id'],
+                      'similar_track_id': added['similar_track_id'], 'score': added['score_new']}),
+    ], ignore_index=True)
+
+def incremental_update(df, cache, state, k=TOP_K, block_size=BLOCK_SIZE, encode_fn=encode_texts):
+    """Calcule les voisins des seules lignes nouvelles et met à jour les lignes
+    existantes dont le top-k inclut désormais une nouvelle ligne.
+
+    Renvoie (neighbors, scores, audio_stats, ancienne table de similarité,
+    embeddings), ou None si des lignes ont été modifiées / supprimées (recalcul
+    complet requis).
+    """
+    old_rows, old_neighbors, old_scores, audio_stats = state
+    keys = row_keys(df)
+    old_keys = old_rows['row_key'].to_numpy()
+
+    position = pd.Series(np.arange(len(keys)), index=keys)
+    if old_neighbors.shape[1] != k or not position.index.is_unique or not np.isin(old_keys, keys).all():
+        return None
+
+    # Position de chaque ancienne ligne dans la nouvelle entrée
+    old_to_new = position.loc[old_keys].to_numpy()
+    is_new = np.ones(len(keys), dtype=bool)
+    is_new[old_to_new] = False
+    new_rows = np.flatnonzero(is_new)
+
+    old_frame = neighbors_frame(old_rows['track_id'], old_neighbors, old_scores)
+
+    neighbors = np.empty((len(keys), k), dtype=np.int64)
+    scores = np.empty((len(keys), k), dtype=np.float64)
+    neighbors[old_to_new] = old_to_new[old_neighbors]
+    scores[old_to_new] = old_scores
+
+    # Toujours recalculés (lus dans le cache) : embeddings.npy doit suivre
+    # l'ordre des lignes de la nouvelle entrée
+    embeddings, _ = build_embeddings(df, cache, audio_stats, encode_fn)
+
+    if len(new_rows):
+        # Nouvelles lignes : top-k sur l'ensemble du catalogue
+        neighbors[new_rows], scores[new_rows] = topk_neighbors(
+            embeddings, k, block_size, query_rows=new_rows)
+
+        # Lignes existantes : seuls les nouveaux candidats peuvent entrer
+        candidates, candidate_scores = topk_neighbors(
+            embeddings, k, block_size, query_rows=old_to_new, base_rows=new_rows)
+        neighbors[old_to_new], scores[old_to_new] = merge_topk(
+            neighbors[old_to_new], scores[old_to_new], candidates, candidate_scores, k)
+
+    print(f"Mode incrémental : {len(new_rows)} nouvelles lignes sur {len(keys)}")
+    return neighbors, scores, audio_stats, old_frame, embeddings
+
+# ================= MAIN =================
+def parse_args():
+    parser = argparse.ArgumentParser(description="Calcul des chansons similaires (top-k cosinus)")
+    parser.add_argument("--input", default=INPUT_CSV,
+                        help="table d'entrée (.csv, .parquet ou .arrow)")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--format", default="csv", type=parse_formats,
+                        help=f"format(s) de sortie séparés par des virgules parmi {', '.join(FORMATS)}")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE,
+                        help="lignes requêtes par bloc (borne la mémoire de pointe)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ré-encoder tous les textes sans lire ni écrire le cache")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="exact",
+                        help="recherche exacte par blocs ou index approximatif IVF")
+    parser.add_argument("--recall-target", type=float, default=RECALL_TARGET,
+                        help="recall@k visé par le backend ivf")
+    parser.add_argument("--index", default=INDEX_PATH,
+                        help="fichier où sauvegarder l'index ivf")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processus pour l'encodage et le top-k exact")
+    parser.add_argument("--encode-batch-size", type=int, default=ENCODE_BATCH_SIZE,
+                        help="taille des lots envoyés au modèle d'embedding")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--incremental", action="store_true",
+                        help="ne calculer que les voisins des lignes ajoutées depuis le dernier run")
+    parser.add_argument("--patch", default=PATCH_CSV,
+                        help="fichier des relations SIMILAR_TO ajoutées / supprimées (mode incrémental)")
+    args = parser.parse_args()
+    if args.incremental and args.backend != "exact":
+        parser.error("--incremental n'est disponible qu'avec --backend exact")
+    return args
+
+def make_backend(args):
+    if args.backend == IVFBackend.name:
+        return IVFBackend(recall_target=args.recall_target, block_size=args.block_size)
+    return BACKENDS[args.backend](block_size=args.block_size)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Charger la table d'entrée
+    df = read_path(args.input)
+
+    cache = None if args.no_cache else EmbeddingCache(args.cache_dir, MODEL_NAME)
+    encode_fn = partial(encode_texts, workers=args.workers, batch_size=args.encode_batch_size)
+
+    result = None
+    if args.incremental:
+        state = load_state(args.state_dir)
+        if state is None:
+            print("Aucun état précédent : recalcul complet")
+        else:
+            result = incremental_update(df, cache, state, args.top_k, args.block_size, encode_fn)
+            if result is None:
+                print("Lignes modifiées ou supprimées depuis le dernier run : recalcul complet")
+
+    if result is None:
+        combined_embeddings, audio_stats = build_embeddings(df, cache, encode_fn=encode_fn)
+
+        # Pour chaque track, récupérer top 5 similaires
+        old_frame = None
+        if args.backend == "exact" and args.workers > 1:
+            backend = None
+            neighbors, scores = topk_parallel(combined_embeddings, args.workers, args.top_k, args.block_size)
+        else:
+            backend = make_backend(args).build(combined_embeddings)
+            neighbors, scores = backend.search(k=args.top_k)
+
+        if isinstance(backend, IVFBackend):
+            os.makedirs(os.path.dirname(args.index) or ".", exist_ok=True)
+            backend.save(args.index, df['track_id'])
+            print(f"Index IVF : {backend.n_lists} listes, n_probe={backend.n_probe}, "
+                  f"recall@{TOP_K} mesuré = {backend.recall:.3f} -> {args.index}")
+    else:
+        neighbors, scores, audio_stats, old_frame, combined_embeddings = result
+
+    save_state(args.state_dir, df, neighbors, scores, audio_stats, combined_embeddings)
+
+    similar_df = neighbors_frame(df['track_id'], neighbors, scores)
+    for path in write_path(similar_df, args.output, args.format):
+        print(f"✅ Table de similarité créée : {path}")
+
+    if old_frame is not None:
+        patch = diff_similar(old_frame, similar_df)
+        patch.to_csv(args.patch, index=False)
+        print(f"Patch SIMILAR_TO : {(patch['op'] == 'add').sum()} ajouts, "
+              f"{(patch['op'] == 'remove').sum()} suppressions -> {args.patch}")
+
+    if cache is not None:
+        print(f"Cache d'embeddings : {cache.hits} hits / {cache.misses} miss "
+              f"({cache.hit_ratio:.1%} de hits)")
@@ -0,0 +1,153 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # seuls les formats colonnaires en dépendent
+    pa = None
+
+# ================= FORMATS =================
+# csv     : export texte, lu par l'import Neo4j
+# parquet : colonnaire compressé, types explicites
+# feather : Arrow IPC, lu par mmap (colonnes numériques sans copie)
+EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "feather": ".arrow",
+}
+FORMATS = tuple(EXTENSIONS)
+
+AUDIO_FEATURES = ["danceability", "energy", "speechiness", "acousticness",
+                  "instrumentalness", "liveness", "valence", "tempo"]
+
+# Types explicites des formats colonnaires, par table. Les colonnes
+# "category" sont stockées en texte (dictionnaire interne à Parquet) et
+# redeviennent catégorielles à la lecture.
+DTYPES = {
+    "tracks": {
+        "track_id": "string", "track_name": "string",
+        "popularity": "int16", "duration_ms": "int32", "explicit": "bool",
+        **{col: "float32" for col in AUDIO_FEATURES},
+    },
+    "artists": {"artist_name": "string", "artist_id": "string"},
+    "genres": {"genre_name": "string", "genre_id": "category"},
+    "track_artist_rel": {"track_id": "string", "artist_id": "string"},
+    "track_genre_rel": {"track_id": "string", "genre_id": "category"},
+    "tracks_embeddings_input": {
+        "track_id": "string", "embedding_text": "string",
+        **{col: "float32" for col in AUDIO_FEATURES},
+    },
+    "tracks_similar": {"track_id": "string", "similar_track_id": "string", "score": "float32"},
+}
+
+def parse_formats(value):
+    """"csv,parquet" -> ["csv", "parquet"] (pour les options --format)."""
+    formats = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"format inconnu : {', '.join(sorted(unknown))} (choix : {', '.join(FORMATS)})")
+    return formats
+
+def _require_arrow(fmt):
+    if pa is None:
+        raise RuntimeError(f"le format {fmt} nécessite pyarrow (pip install pyarrow)")
+
+def table_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def format_of(path):
+    ext = os.path.splitext(path)[1]
+    for fmt, fmt_ext in EXTENSIONS.items():
+        if ext == fmt_ext:
+            return fmt
+    raise ValueError(f"extension non reconnue : {path}")
+
+def with_format(path, fmt):
+    return os.path.splitext(path)[0] + EXTENSIONS[fmt]
+
+def _storage_dtypes(name, frame):
+    return {col: ("string" if dtype == "category" else dtype)
+            for col, dtype in DTYPES.get(name, {}).items() if col in frame.columns}
+
+def to_storage(frame, name):
+    """Applique les types explicites de la table avant écriture colonnaire."""
+    return frame.astype(_storage_dtypes(name, frame))
+
+def from_storage(frame, name):
+    categories = {col: "category" for col, dtype in DTYPES.get(name, {}).items()
+                  if dtype == "category" and col in frame.columns}
+    return frame.astype(categories) if categories else frame
+
+# ================= LECTURE =================
+def read_path(path):
+    """Lit une table d'après son extension (.csv, .parquet, .arrow)."""
+    fmt = format_of(path)
+    if fmt == "csv":
+        return pd.read_csv(path)
+    _require_arrow(fmt)
+    if fmt == "parquet":
+        frame = pq.read_table(path).to_pandas()
+    else:
+        frame = feather.read_feather(path, memory_map=True)
+    return from_storage(frame, table_name(path))
+
+def table_path(directory, name, fmt=None):
+    """Chemin de la table name dans directory ; sans fmt, le premier format
+    présent en privilégiant les formats colonnaires."""
+    candidates = [fmt] if fmt else ["feather", "parquet", "csv"]
+    for candidate in candidates:
+        path = os.path.join(directory, name + EXTENSIONS[candidate])
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"table {name} introuvable dans {directory} ({', '.join(candidates)})")
+
+def read_table(directory, name, fmt=None):
+    """Lit la table name de directory (cf. table_path pour le format)."""
+    return read_path(table_path(directory, name, fmt))
+
+# ================= ÉCRITURE =================
+def write_path(frame, path, formats=("csv",)):
+    """Écrit frame dans chacun des formats (extension de path remplacée)."""
+    writers = [TableWriter(with_format(path, fmt), fmt) for fmt in formats]
+    for writer in writers:
+        writer.write(frame)
+        writer.close()
+    return [writer.path for writer in writers]
+
+
+class TableWriter:
+    """Écrit une table chunk par chunk (en-tête / schéma au premier chunk)."""
+
+    def __init__(self, path, fmt="csv"):
+        if fmt != "csv":
+            _require_arrow(fmt)
+        self.path = path
+        self.fmt = fmt
+        self.name = table_name(path)
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, frame):
+        if self.fmt == "csv":
+            frame.to_csv(self.path, mode="w" if self.rows == 0 else "a",
+                         header=self.rows == 0, index=False)
+        else:
+            table = pa.Table.from_pandas(to_storage(frame, self.name),
+                                         schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                if self.fmt == "parquet":
+                    self._writer = pq.ParquetWriter(self.path, self._schema)
+                else:
+                    self._writer = pa.ipc.new_file(self.path, self._schema)
+            self._writer.write_table(table)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
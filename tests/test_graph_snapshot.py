@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+
+import music_db
+from graph_snapshot import GraphSnapshot, source_paths
+from load_test import FakeDriver
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    ids = [f"{i:021d}x" for i in range(30)]
+    tables = {
+        "tracks": pd.DataFrame({"track_id": ids, "track_name": [f"t{i}" for i in range(30)],
+                                "popularity": [(7 * i) % 100 for i in range(30)],
+                                "energy": 0.5, "valence": 0.5}),
+        "artists": pd.DataFrame({"artist_name": ["A", "B", "C"], "artist_id": ["a", "b", "c"]}),
+        "genres": pd.DataFrame({"genre_name": ["pop", "rock"], "genre_id": ["pop", "rock"]}),
+        "track_artist_rel": pd.DataFrame({"track_id": ids + ids[:5], "artist_id": ["a", "b", "c"] * 10 + ["b"] * 5}),
+        "track_genre_rel": pd.DataFrame({"track_id": ids, "genre_id": ["pop", "rock"] * 15}),
+        # + un couple de chaque chanson avec elle-même (doublon inter-genres)
+        "tracks_similar": pd.DataFrame({"track_id": ids * 3,
+                                        "similar_track_id": ids[1:] + ids[:1] + ids[3:] + ids[:3] + ids,
+                                        "score": [0.9] * 30 + [0.8] * 30 + [1.0] * 30}),
+    }
+    for name, frame in tables.items():
+        frame.to_csv(tmp_path / f"{name}.csv", index=False)
+    return GraphSnapshot(source_paths(str(tmp_path)))
+
+
+class DownDriver:
+    def session(self, **config):
+        from neo4j.exceptions import ServiceUnavailable
+        raise ServiceUnavailable("Neo4j arrêté")
+
+
+@pytest.fixture
+def use(monkeypatch):
+    """use(snapshot, driver) : sources de music_db pour un test."""
+    def install(snapshot, driver):
+        monkeypatch.setattr(music_db, "get_snapshot", lambda: snapshot)
+        music_db.set_driver(driver)
+        music_db.explore_neighbourhood.invalidate()
+    yield install
+    music_db.set_driver(None)
+    music_db.explore_neighbourhood.invalidate()
+
+
+@pytest.mark.parametrize("hops, fan_out, max_nodes", [(2, 3, 150), (3, 25, 150), (3, 2, 12)])
+def test_explore_from_snapshot_matches_neo4j(snapshot, use, hops, fan_out, max_nodes):
+    root = snapshot.track_ids[4]
+    use(None, FakeDriver(snapshot, latency=0))
+    from_neo4j = music_db.explore_neighbourhood(root, hops, fan_out, max_nodes)
+
+    use(snapshot, DownDriver())
+    from_snapshot = music_db.explore_neighbourhood(root, hops, fan_out, max_nodes)
+
+    assert from_snapshot == from_neo4j
+    assert len(from_snapshot["nodes"]) <= max_nodes
+    assert {n["kind"] for n in from_snapshot["nodes"]} == {"track", "artist", "genre"}
+
+
+def test_explore_unknown_track(snapshot, use):
+    use(snapshot, FakeDriver(snapshot, latency=0))
+    assert music_db.explore_neighbourhood("0" * 22, 2) is None
+
+
+def test_similar_to_skips_self_pairs(snapshot):
+    for track_id in snapshot.track_ids:
+        recommendations = [r["track_id"] for r in snapshot.recommendations(track_id)]
+        assert len(recommendations) == 2 and track_id not in recommendations
+        assert track_id not in [s["track_id"] for s in snapshot.neighbourhood(track_id)["similars"]]
+
+
+@pytest.mark.parametrize("filters", [{}, {"artist_filter": "B"}, {"genre_filter": "rock", "min_popularity": 20},
+                                     {"artist_filter": "A", "genre_filter": "pop", "max_popularity": 60},
+                                     {"artist_filter": "Z"}])
+def test_tracks_match_pandas_filtering(snapshot, tmp_path, filters):
+    tracks = pd.read_csv(tmp_path / "tracks.csv", dtype={"track_id": str})
+    artists = pd.read_csv(tmp_path / "track_artist_rel.csv", dtype={"track_id": str}).merge(
+        pd.read_csv(tmp_path / "artists.csv"), on="artist_id")
+    genres = pd.read_csv(tmp_path / "track_genre_rel.csv", dtype={"track_id": str})
+
+    keep = tracks["popularity"].between(filters.get("min_popularity", 0), filters.get("max_popularity", 100))
+    if "artist_filter" in filters:
+        keep &= tracks["track_id"].isin(artists.loc[artists["artist_name"] == filters["artist_filter"], "track_id"])
+    if "genre_filter" in filters:
+        keep &= tracks["track_id"].isin(genres.loc[genres["genre_id"] == filters["genre_filter"], "track_id"])
+    expected = tracks[keep].sort_values(["track_name", "track_id"])
+
+    assert snapshot.tracks(**filters) == list(zip(expected["track_id"], expected["track_name"]))
+    assert snapshot.count_tracks(**filters) == len(expected)
+
+
+def test_recommendations_match_pandas_ordering(snapshot, tmp_path):
+    tracks = pd.read_csv(tmp_path / "tracks.csv", dtype={"track_id": str})
+    similar = pd.read_csv(tmp_path / "tracks_similar.csv", dtype={"track_id": str, "similar_track_id": str})
+    similar = similar[similar["track_id"] != similar["similar_track_id"]].merge(
+        tracks, left_on="similar_track_id", right_on="track_id", suffixes=("", "_similar"))
+
+    for track_id, group in similar.groupby("track_id"):
+        expected = group.sort_values("popularity", ascending=False, kind="stable")["similar_track_id"]
+        assert [r["track_id"] for r in snapshot.recommendations(track_id)] == expected.tolist()
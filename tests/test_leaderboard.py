@@ -0,0 +1,27 @@
+import random
+from collections import Counter
+
+from leaderboard import Leaderboard
+
+
+def test_windows_match_brute_force_counts():
+    rng = random.Random(0)
+    board = Leaderboard(lambda: {"x": 100}, windows={"minute": 60, "hour": 3600}, bucket_seconds=10)
+    board.sync()
+    events = [(t, rng.choice("abcdefg"), rng.randint(1, 3)) for t in sorted(rng.uniform(0, 7200) for _ in range(2000))]
+
+    for i, (t, key, delta) in enumerate(events):
+        board.record(key, delta, now=t)
+        if i % 97 == 0:
+            for window, seconds in (("minute", 60), ("hour", 3600)):
+                # Référence : somme des événements des seaux encore dans la fenêtre
+                expected = Counter()
+                for s, k, d in events[:i + 1]:
+                    if s - s % 10 + 10 > t - seconds:
+                        expected[k] += d
+                assert dict(board.top(10, window, now=t)) == dict(expected)
+
+    totals = Counter({"x": 100})
+    for _, key, delta in events:
+        totals[key] += delta
+    assert board.top(3) == totals.most_common(3)
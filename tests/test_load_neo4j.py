@@ -0,0 +1,76 @@
+import math
+
+import pandas as pd
+import pytest
+
+from load_neo4j import LOADS, PATCH_REMOVE, SCHEMA, apply_patch, load_dataset
+from load_test import FakeDriver
+
+
+def write_tables(directory, n_tracks=25):
+    ids = [f"{i:022d}" for i in range(n_tracks)]
+    tables = {
+        "tracks": pd.DataFrame({"track_id": ids, "track_name": [f"t{i}" for i in range(n_tracks)],
+                                "popularity": range(n_tracks)}),
+        "artists": pd.DataFrame({"artist_name": ["A", "B"], "artist_id": ["a", "b"]}),
+        "genres": pd.DataFrame({"genre_name": ["pop"], "genre_id": ["pop"]}),
+        "track_artist_rel": pd.DataFrame({"track_id": ids, "artist_id": ["a", "b"] * (n_tracks // 2) + ["a"]}),
+        "track_genre_rel": pd.DataFrame({"track_id": ids, "genre_id": ["pop"] * n_tracks}),
+        "tracks_similar": pd.DataFrame({"track_id": ids, "similar_track_id": ids[1:] + ids[:1],
+                                        "score": [0.5] * n_tracks}),
+    }
+    for name, frame in tables.items():
+        frame.to_csv(directory / f"{name}.csv", index=False)
+    return tables
+
+
+def test_load_dataset_schema_first_then_batches(tmp_path, capsys):
+    tables = write_tables(tmp_path)
+    driver = FakeDriver(None, latency=0)
+
+    stats = load_dataset(driver, str(tmp_path), batch_size=10)
+
+    queries = [q for q, _ in driver.statements]
+    assert queries[:len(SCHEMA)] == SCHEMA
+    batches = driver.statements[len(SCHEMA):]
+    expected = [(query, min(10, len(tables[name]) - offset))
+                for name, query in LOADS
+                for offset in range(0, len(tables[name]), 10)]
+    assert batches == expected
+    assert len(batches) == sum(math.ceil(len(tables[name]) / 10) for name, _ in LOADS)
+    assert {name: rows for name, (rows, _) in stats.items()} == {name: len(t) for name, t in tables.items()}
+    assert "lignes/s" in capsys.readouterr().out
+
+
+def test_apply_patch_removes_before_adding():
+    driver = FakeDriver(None, latency=0)
+    patch = pd.DataFrame({"op": ["remove", "add", "add"], "track_id": ["x", "y", "z"],
+                          "similar_track_id": ["y", "z", "x"], "score": [None, 0.9, 0.8]})
+
+    apply_patch(driver, patch, batch_size=1)
+
+    assert driver.statements == [(PATCH_REMOVE, 1), (dict(LOADS)["tracks_similar"], 1),
+                                 (dict(LOADS)["tracks_similar"], 1)]
+
+
+def test_load_dataset_refuses_empty_node_ids(tmp_path):
+    write_tables(tmp_path)
+    pd.DataFrame({"artist_name": ["美波", "B"], "artist_id": ["", "b"]}).to_csv(tmp_path / "artists.csv", index=False)
+    driver = FakeDriver(None, latency=0)
+
+    with pytest.raises(ValueError, match="artist_id"):
+        load_dataset(driver, str(tmp_path), batch_size=10)
+
+    # Rien n'a été fusionné : seules les pistes, chargées avant, sont parties
+    assert [q for q, _ in driver.statements[len(SCHEMA):]] == [dict(LOADS)["tracks"]] * 3
+
+
+def test_load_dataset_drops_similar_self_pairs(tmp_path):
+    tables = write_tables(tmp_path, n_tracks=5)
+    similar = tables["tracks_similar"]
+    pd.concat([similar, similar.assign(similar_track_id=similar["track_id"])]).to_csv(
+        tmp_path / "tracks_similar.csv", index=False)
+
+    stats = load_dataset(FakeDriver(None, latency=0), str(tmp_path))
+
+    assert stats["tracks_similar"][0] == len(similar)
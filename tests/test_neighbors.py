@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from neighbors import IVFBackend, merge_topk, normalize_rows, topk_neighbors
+from parallel import topk_parallel
+from similarity import neighbors_frame
+
+
+def brute_force_topk(embeddings, k, query_rows=None, base_rows=None):
+    """Référence : matrice N x N complète en float64, tri complet."""
+    x = normalize_rows(embeddings, np.float64)
+    n = len(x)
+    query_rows = np.arange(n) if query_rows is None else np.asarray(query_rows)
+    base_rows = np.arange(n) if base_rows is None else np.asarray(base_rows)
+    scores = x[query_rows] @ x[base_rows].T
+    scores[query_rows[:, None] == base_rows[None, :]] = -np.inf
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return base_rows[order], np.take_along_axis(scores, order, axis=1)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1024])
+def test_blocked_topk_matches_full_matrix(block_size):
+    embeddings = np.random.default_rng(0).normal(size=(200, 12))
+
+    neighbors, scores = topk_neighbors(embeddings, 5, block_size)
+    expected, expected_scores = brute_force_topk(embeddings, 5)
+
+    np.testing.assert_array_equal(neighbors, expected)
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-12)
+
+
+def test_blocked_topk_on_row_subsets():
+    embeddings = np.random.default_rng(1).normal(size=(150, 8))
+    query_rows, base_rows = np.arange(0, 150, 3), np.arange(100, 150)
+
+    neighbors, scores = topk_neighbors(embeddings, 4, 16, query_rows, base_rows)
+    expected, expected_scores = brute_force_topk(embeddings, 4, query_rows, base_rows)
+
+    np.testing.assert_array_equal(neighbors, expected)
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-12)
+
+
+def test_merge_topk_equals_topk_of_union():
+    embeddings = np.random.default_rng(2).normal(size=(120, 8))
+    old, new = np.arange(80), np.arange(80, 120)
+    queries = np.arange(120)
+
+    merged = merge_topk(*topk_neighbors(embeddings, 5, 32, queries, old),
+                        *topk_neighbors(embeddings, 5, 32, queries, new), k=5)
+
+    np.testing.assert_array_equal(merged[0], topk_neighbors(embeddings, 5, 32)[0])
+
+
+def test_parallel_topk_matches_serial():
+    embeddings = np.random.default_rng(3).normal(size=(300, 8))
+
+    neighbors, scores = topk_parallel(embeddings, 2, k=5, block_size=32)
+    expected, expected_scores = topk_neighbors(embeddings, 5, 32)
+
+    np.testing.assert_array_equal(neighbors, expected)
+    np.testing.assert_allclose(scores, expected_scores)
+
+
+def clustered(n=3000, dim=16, n_clusters=40, seed=0):
+    """Nuages serrés de tailles inégales : beaucoup de listes IVF de moins
+    de k + 1 vecteurs."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    sizes = rng.dirichlet(np.full(n_clusters, 0.3))
+    labels = rng.choice(n_clusters, n, p=sizes)
+    return centers[labels] + 0.01 * rng.normal(size=(n, dim))
+
+
+def test_ivf_fills_every_slot_on_small_lists():
+    embeddings = clustered()
+    index = IVFBackend(seed=0).build(embeddings)
+    assert (index.list_sizes < 6).any()
+
+    neighbors, scores = index.search(k=5)
+
+    assert (neighbors >= 0).all()
+    assert np.isfinite(scores).all()
+    assert (neighbors != np.arange(len(embeddings))[:, None]).all()
+
+
+def test_ivf_reaching_full_recall_matches_exact():
+    embeddings = np.random.default_rng(1).normal(size=(500, 16))
+    index = IVFBackend(recall_target=1.0, seed=0).build(embeddings)
+
+    approx, approx_scores = index.search(k=5)
+    exact, exact_scores = topk_neighbors(embeddings, 5)
+
+    assert index.recall == 1.0
+    np.testing.assert_array_equal(approx, exact)
+    np.testing.assert_allclose(approx_scores, exact_scores, atol=1e-5)
+
+
+def test_neighbors_frame_skips_missing_slots():
+    neighbors = np.array([[1, -1], [0, 2], [-1, -1]])
+    scores = np.array([[0.9, -np.inf], [0.8, 0.7], [-np.inf, -np.inf]])
+
+    frame = neighbors_frame(["a", "b", "c"], neighbors, scores)
+
+    assert frame.values.tolist() == [["a", "b", 0.9], ["b", "a", 0.8], ["b", "c", 0.7]]
+
+
+def test_neighbors_frame_skips_self_pairs():
+    # Même chanson sous deux genres : lignes 0 et 1
+    neighbors = np.array([[1, 2], [0, 2], [0, 1]])
+    scores = np.array([[1.0, 0.5], [1.0, 0.5], [0.5, 0.5]])
+
+    frame = neighbors_frame(["a", "a", "b"], neighbors, scores)
+
+    assert frame.values.tolist() == [["a", "b", 0.5], ["a", "b", 0.5], ["b", "a", 0.5], ["b", "a", 0.5]]
@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+
+from prepare_dataset import normalize_id, prepare
+
+HEADER = ("id;track_id;artists;album_name;track_name;popularity;duration_ms;explicit;danceability;"
+          "energy;key;loudness;mode;speechiness;acousticness;instrumentalness;liveness;valence;"
+          "tempo;time_signature;track_genre")
+NUMBERS = ["73", "230666", "False", "0.676", "0.461", "1", "-6.746", "0", "0.143", "0.0322",
+           "1.01e-06", "0.358", "0.715", "87.917", "4"]
+
+# Une ligne par forme rencontrée dans l'export réel
+LINES = [
+    # ";" simple
+    ";".join(["0", "5SuOikwiRyPMVoIQDJUgSV", "Gen Hoshino", "Comedy", "Comedy"] + NUMBERS + ["acoustic"]) + ";",
+    # ";" à plusieurs artistes séparés par ";" : champs en trop
+    ";".join(["8", "0IktbUcnAGrvD03AWnz3Q8", "Jason Mraz", "Colbie Caillat", "We Sing.", "Lucky"]
+             + NUMBERS + ["acoustic"]) + ";",
+    # "," terminée par ";"
+    ",".join(["498", "61X73CJcpwGIxgQgKEXbw0", "Brandi Carlile;Lucius", "In These Silent Days", "You and Me"]
+             + NUMBERS + ["acoustic"]) + ";",
+    # "," citée en entier, virgule dans un titre cité
+    '"' + ",".join(["497", "79keCNa2NAa4xMInUQCATJ", "The Bridge City Sinners", "Unholy Hymns",
+                    '""The Legend of Olog-hai, Pt. 2""'] + NUMBERS + ["acoustic"]) + '";',
+    # "," citée puis coupée aux ";" des artistes
+    '"' + ",".join(["725", "6QYEoTGa0Boucy6htF83tb", '""Melvin Taylor";Lucky Peterson;"Ray """"Killer"""" Allison""',
+                    "Blues Power", "Cadillac Assembly Line"] + NUMBERS + ["acoustic"]) + '";;;;',
+    # Séparateurs mêlés dans la même ligne : irrécupérable
+    ";".join(["496", "5u2HaXFymnYNePtwI5bU3t", "Frank Turner", "FTHC", "Haven't", "30"])
+    + ";" + ",".join(NUMBERS[1:] + ["acoustic"]) + ";",
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "dataset.csv"
+    path.write_text("\n".join([HEADER] + LINES) + "\n", encoding="utf-8")
+    return path
+
+
+def test_prepare_repairs_or_counts_every_line(source, tmp_path, capsys):
+    out = tmp_path / "out"
+
+    prepare(str(source), str(out), chunksize=4)
+
+    tracks = pd.read_csv(out / "tracks.csv")
+    assert set(tracks["track_id"]) == {"5SuOikwiRyPMVoIQDJUgSV", "0IktbUcnAGrvD03AWnz3Q8",
+                                       "61X73CJcpwGIxgQgKEXbw0", "79keCNa2NAa4xMInUQCATJ",
+                                       "6QYEoTGa0Boucy6htF83tb"}
+    assert (tracks["popularity"] == 73).all()
+    titles = dict(zip(tracks["track_id"], tracks["track_name"]))
+    assert titles["79keCNa2NAa4xMInUQCATJ"] == "The Legend of Olog-hai, Pt. 2"
+    assert titles["0IktbUcnAGrvD03AWnz3Q8"] == "Lucky"
+
+    artists = set(pd.read_csv(out / "artists.csv")["artist_name"])
+    assert {"Jason Mraz", "Colbie Caillat", "Brandi Carlile", "Lucius",
+            "Melvin Taylor", "Lucky Peterson", 'Ray "Killer" Allison'} <= artists
+
+    # Lues = gardées + rejetées
+    assert "5 lignes, 1 lignes rejetées" in capsys.readouterr().out
+
+
+def test_prepare_stops_on_wrong_separator(source, tmp_path):
+    with pytest.raises(ValueError, match="--sep"):
+        prepare(str(source), str(tmp_path / "out"), sep=",")
+
+
+def test_normalize_id_keeps_non_ascii_names_apart():
+    names = pd.Series(["美波", "小畑貴裕", "渕上 舞", "梶浦 由記", "白銀御行(CV:古川慎)", "藤原千花(CV:小原好美)",
+                       "スカートとPUNPEE", "PUNPEE", "Beyoncé", "Alaska", "ALASKA", "alt-rock"])
+
+    ids = normalize_id(names)
+
+    assert (ids != "").all()
+    assert ids.str.fullmatch("[a-z0-9_]+").all()
+    # Seules les variantes de casse d'un même nom partagent un identifiant
+    assert ids.nunique() == len(names) - 1
+    assert ids[8] == "beyonce" and ids[9] == ids[10] == "alaska" and ids[11] == "altrock"
+    # Stable d'un chunk à l'autre
+    assert normalize_id(names[::-1]).tolist() == ids[::-1].tolist()
+
+
+def test_prepare_non_ascii_artists_get_distinct_ids(tmp_path):
+    artists = ["美波", "小畑貴裕", "渕上 舞;梶浦 由記"]
+    lines = [";".join([str(i), f"{i:022d}", a, "album", f"t{i}"] + NUMBERS + ["anime"]) + ";"
+             for i, a in enumerate(artists)]
+    source = tmp_path / "dataset.csv"
+    source.write_text("\n".join([HEADER] + lines) + "\n", encoding="utf-8")
+
+    prepare(str(source), str(tmp_path / "out"))
+
+    table = pd.read_csv(tmp_path / "out" / "artists.csv")
+    assert len(table) == 4 and table["artist_id"].nunique() == 4
+    rel = pd.read_csv(tmp_path / "out" / "track_artist_rel.csv")
+    assert set(rel["artist_id"]) == set(table["artist_id"])
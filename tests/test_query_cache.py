@@ -0,0 +1,30 @@
+from query_cache import QueryCache, cached
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryCache("lru", ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert [cache.get(k) for k in "abc"] == [(True, 1), (False, None), (True, 3)]
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_expired_entries_are_recomputed(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("query_cache.time.monotonic", lambda: clock[0])
+    calls = []
+
+    @cached(ttl=10)
+    def square(x, offset=0):
+        calls.append(x)
+        return x * x + offset
+
+    assert [square(3), square(3), square(3, offset=1)] == [9, 9, 10]
+    clock[0] = 11
+    assert square(3) == 9
+    square.invalidate()
+    assert square(3) == 9
+    assert calls == [3, 3, 3, 3]
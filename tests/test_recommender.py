@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import recommender
+from neighbors import normalize_rows
+
+
+@pytest.fixture
+def failing(monkeypatch, tmp_path):
+    """Recommender qui échoue toujours ; renvoie la liste de ses appels."""
+    calls = []
+
+    def broken(state_dir, data_dir):
+        calls.append(state_dir)
+        raise ValueError("embeddings.npy et rows.csv ne sont pas alignés")
+
+    for name in recommender.STATE_FILES:
+        (tmp_path / name).write_text("x")
+    monkeypatch.setattr(recommender, "Recommender", broken)
+    recommender.reload_recommender()
+    yield calls
+    recommender.reload_recommender()
+
+
+def test_failed_load_is_not_retried_on_every_rerun(failing, tmp_path):
+    for _ in range(5):
+        assert recommender.get_recommender(str(tmp_path)) is None
+    assert len(failing) == 1
+    assert recommender.load_error.startswith("ValueError")
+
+    recommender.reload_recommender()
+    assert recommender.get_recommender(str(tmp_path)) is None
+    assert len(failing) == 2
+
+
+def test_failed_load_is_retried_when_state_changes(failing, tmp_path):
+    recommender.get_recommender(str(tmp_path))
+    path = tmp_path / "embeddings.npy"
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    recommender.get_recommender(str(tmp_path))
+    recommender.get_recommender(str(tmp_path))
+
+    assert len(failing) == 2
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    """80 chansons, la dernière sous deux genres (deux lignes dans rows.csv)."""
+    rng = np.random.default_rng(0)
+    ids = [f"t{i}" for i in range(80)]
+    rows = ids + ids[-1:]
+    embeddings = normalize_rows(rng.normal(size=(80, 6)), np.float32)
+    pd.DataFrame({"track_id": rows}).to_csv(tmp_path / "rows.csv", index=False)
+    np.save(tmp_path / "embeddings.npy", embeddings[[*range(80), 79]])
+
+    tables = {
+        "tracks": pd.DataFrame({"track_id": ids, "track_name": ids, "popularity": rng.integers(0, 101, 80),
+                                "energy": 0.5, "valence": 0.5}),
+        "track_genre_rel": pd.DataFrame({"track_id": rows, "genre_id": ["pop", "rock"] * 40 + ["pop"]}),
+        "artists": pd.DataFrame({"artist_id": ["a", "b", "c", "d"], "artist_name": ["A", "B", "C", "D"]}),
+        "track_artist_rel": pd.DataFrame({"track_id": ids + ids[:10], "artist_id": ["a", "b", "c", "d"] * 20 + ["d"] * 10}),
+    }
+    for name, frame in tables.items():
+        frame.to_csv(tmp_path / f"{name}.csv", index=False)
+    return recommender.Recommender(str(tmp_path), str(tmp_path)), embeddings, tables
+
+
+@pytest.mark.parametrize("filters", [{}, {"genre": "rock"}, {"min_popularity": 30, "max_popularity": 70},
+                                     {"exclude_artists": ["B", "C"]}, {"exclude_same_artists": True},
+                                     {"genre": "pop", "min_popularity": 90}])
+def test_similar_matches_brute_force_cosine(catalogue, filters):
+    rec, embeddings, tables = catalogue
+    tracks, artists = tables["tracks"], tables["track_artist_rel"].merge(tables["artists"])
+
+    for query in [0, 5, 79]:
+        track_id = f"t{query}"
+        excluded = set(filters.get("exclude_artists", ()))
+        if filters.get("exclude_same_artists"):
+            excluded |= set(artists.loc[artists["track_id"] == track_id, "artist_name"])
+        keep = tracks["popularity"].between(filters.get("min_popularity", 0), filters.get("max_popularity", 100))
+        keep &= ~tracks["track_id"].isin(artists.loc[artists["artist_name"].isin(excluded), "track_id"])
+        if "genre" in filters:
+            rel = tables["track_genre_rel"]
+            keep &= tracks["track_id"].isin(rel.loc[rel["genre_id"] == filters["genre"], "track_id"])
+        keep[query] = False
+
+        scores = embeddings @ embeddings[query]
+        expected = sorted(np.flatnonzero(keep), key=lambda r: (-scores[r], r))[:5]
+
+        result = rec.similar(track_id, 5, **filters)
+        assert [r for r, _ in result] == expected
+        np.testing.assert_allclose([s for _, s in result], scores[expected], rtol=1e-6)
+
+
+def test_similar_unknown_track(catalogue):
+    assert catalogue[0].similar("absent") == []
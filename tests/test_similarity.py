@@ -0,0 +1,74 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from embedding_cache import EmbeddingCache
+from neighbors import topk_neighbors
+from similarity import AUDIO_FEATURES, build_embeddings, incremental_update, load_state, save_state
+
+# Appels reçus par fake_encode
+calls = []
+
+
+def fake_encode(texts):
+    """Encodeur déterministe : un vecteur aléatoire tiré du texte."""
+    calls.append(list(texts))
+    return np.stack([np.random.default_rng(int.from_bytes(hashlib.sha1(t.encode()).digest()[:8], "little"))
+                     .normal(size=8) for t in texts]).astype(np.float32)
+
+
+def catalogue(n, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({"track_id": [f"t{i}" for i in range(n)],
+                          "embedding_text": [f"chanson {i}" for i in range(n)]})
+    for col in AUDIO_FEATURES:
+        frame[col] = rng.random(n)
+    return frame
+
+
+def test_incremental_update_matches_full_recompute(tmp_path):
+    full = catalogue(120)
+    old = full.iloc[:90]
+    embeddings, audio_stats = build_embeddings(old, encode_fn=fake_encode)
+    save_state(tmp_path, old, *topk_neighbors(embeddings, 5, 16), audio_stats)
+
+    neighbors, scores, _, old_frame, _ = incremental_update(
+        full, None, load_state(tmp_path), k=5, block_size=16, encode_fn=fake_encode)
+
+    # Référence : tout le catalogue recalculé avec la normalisation audio conservée
+    embeddings, _ = build_embeddings(full, audio_stats=audio_stats, encode_fn=fake_encode)
+    expected, expected_scores = topk_neighbors(embeddings, 5, 16)
+    np.testing.assert_array_equal(neighbors, expected)
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-9)
+    assert len(old_frame) == 90 * 5
+
+
+def test_incremental_update_refuses_modified_rows(tmp_path):
+    full = catalogue(50)
+    embeddings, audio_stats = build_embeddings(full, encode_fn=fake_encode)
+    save_state(tmp_path, full, *topk_neighbors(embeddings, 5), audio_stats)
+
+    full.loc[3, "embedding_text"] = "autre titre"
+
+    assert incremental_update(full, None, load_state(tmp_path), k=5, encode_fn=fake_encode) is None
+
+
+def test_embedding_cache_matches_direct_encoding(tmp_path):
+    texts = ["a", "b", "a", "c"]
+    cache = EmbeddingCache(str(tmp_path), "org/model")
+    calls.clear()
+
+    first = cache.encode(texts, fake_encode)
+    second = cache.encode(texts + ["d"], fake_encode)
+
+    np.testing.assert_array_equal(first, fake_encode(texts))
+    np.testing.assert_array_equal(second[:4], first)
+    # Textes dédoublonnés, puis seul le nouveau est encodé
+    assert calls[:2] == [["a", "b", "c"], ["d"]]
+    assert (cache.hits, cache.misses) == (4, 5)
+
+    reopened = EmbeddingCache(str(tmp_path), "org/model")
+    assert len(reopened) == 4
+    np.testing.assert_array_equal(reopened.encode(["d", "a"], fake_encode), second[[4, 0]])
+    assert reopened.misses == 0
@@ -0,0 +1,27 @@
+import random
+
+from typeahead import TypeaheadIndex, normalize
+
+NAMES = ["Beyoncé", "Beyond the Sea", "The Beatles", "Bee Gees", "Björk", "Bob Dylan", "Bon Iver",
+         "Billie Eilish", "Bad Bunny", "Daft Punk", "Dua Lipa", "David Bowie", "Drake", "Dr. Dre"]
+
+
+def test_prefix_search_matches_brute_force():
+    rng = random.Random(0)
+    entries = [(f"{rng.choice(NAMES)} {i}", f"id{i}") for i in range(300)]
+    index = TypeaheadIndex(entries)
+
+    for query in ["b", "be", "Bey", "beyo", "BJÖRK", "dr", "dr.", "daft p"]:
+        key = normalize(query)
+        expected = sorted((normalize(name), value) for name, value in entries if normalize(name).startswith(key))
+        assert index.search(query, limit=len(entries))[:len(expected)] == [v for _, v in expected]
+        assert index.search(query, limit=5) == [v for _, v in expected[:5]]
+
+
+def test_word_and_fuzzy_matches_follow_prefix_matches():
+    index = TypeaheadIndex([(name, name) for name in NAMES])
+
+    assert index.search("sea") == ["Beyond the Sea"]
+    assert index.search("bowie") == ["David Bowie"]
+    assert index.search("daft pnk")[0] == "Daft Punk"
+    assert index.search("") == sorted(NAMES, key=normalize)
@@ -0,0 +1,101 @@
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+
+# ================= CONFIG =================
+MAX_RESULTS = 20
+# Part minimale des trigrammes de la saisie présents dans le nom pour une
+# correspondance approchée
+MIN_SIMILARITY = 0.5
+
+def normalize(text):
+    """Minuscules, sans accents, espaces réduits : "Beyoncé  " -> "beyonce"."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TypeaheadIndex:
+    """Recherche par préfixe et approchée sur des couples (nom, valeur), en
+    mémoire ; les noms peuvent se répéter, les valeurs (identifiants) non.
+
+    Construit une fois (par liste filtrée) :
+    - clés normalisées triées : préfixe du nom par bisect ;
+    - (mot, position) triés : préfixe d'un mot quelconque du nom ;
+    - index inversé trigramme -> positions : fautes de frappe et sous-chaînes.
+    """
+
+    def __init__(self, entries):
+        rows = sorted((normalize(name), name, value) for name, value in entries if name)
+        self.keys = [k for k, _, _ in rows]
+        self.names = [n for _, n, _ in rows]
+        self.values = [v for _, _, v in rows]
+        self._labels = dict(zip(self.values, self.names))
+        self.words = sorted((word, i) for i, key in enumerate(self.keys) for word in key.split()[1:])
+
+        postings = defaultdict(list)
+        gram_counts = np.zeros(len(self.keys), dtype=np.int32)
+        for i, key in enumerate(self.keys):
+            grams = trigrams(key)
+            gram_counts[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gram_counts = gram_counts
+
+    def __len__(self):
+        return len(self.values)
+
+    def label(self, value):
+        return self._labels.get(value)
+
+    def _fuzzy(self, query, limit):
+        query_grams = trigrams(query)
+        grams = [g for g in query_grams if g in self.postings]
+        if not grams:
+            return []
+        shared = np.bincount(np.concatenate([self.postings[g] for g in grams]),
+                             minlength=len(self.keys))
+        candidates = np.flatnonzero(shared >= MIN_SIMILARITY * len(query_grams))
+        # Plus de trigrammes communs d'abord, puis les noms les plus courts
+        order = np.lexsort((candidates, self.gram_counts[candidates], -shared[candidates]))
+        return candidates[order[:limit]].tolist()
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Valeurs des meilleures correspondances : préfixe du nom, puis
+        préfixe d'un mot, puis approchées."""
+        query = normalize(query)
+        if not query:
+            return self.values[:limit]
+
+        hits = []
+        for i in range(bisect_left(self.keys, query), len(self.keys)):
+            if not self.keys[i].startswith(query) or len(hits) >= limit:
+                break
+            hits.append(i)
+        seen = set(hits)
+
+        if len(hits) < limit:
+            for j in range(bisect_left(self.words, (query,)), len(self.words)):
+                word, i = self.words[j]
+                if not word.startswith(query) or len(hits) >= limit:
+                    break
+                if i not in seen:
+                    seen.add(i)
+                    hits.append(i)
+
+        if len(hits) < limit:
+            for i in self._fuzzy(query, limit + len(seen)):
+                if len(hits) >= limit:
+                    break
+                if i not in seen:
+                    seen.add(i)
+                    hits.append(i)
+
+        return [self.values[i] for i in hits]
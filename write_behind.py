@@ -0,0 +1,119 @@
+import atexit
+import threading
+import time
+from collections import Counter
+
+# Comme query_cache : le module reste en mémoire entre les reruns Streamlit,
+# un seul compteur (et un seul thread d'écriture) par processus.
+
+
+class WriteBehindCounter:
+    """Incréments agrégés en mémoire et écrits par lots en arrière-plan.
+
+    add() ne fait jamais d'entrée / sortie : le rendu d'une page n'attend pas
+    l'écriture. Un thread appelle flush_fn({clé: delta}) toutes les interval
+    secondes, ou plus tôt si max_pending clés distinctes sont en attente.
+    """
+
+    def __init__(self, name, flush_fn, interval=5.0, max_pending=1000):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = Counter()
+        # Lot en cours d'écriture : encore compté par pending() jusqu'à la fin
+        self._in_flight = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # Métriques
+        self.flushes = 0
+        self.errors = 0
+        self.flushed_total = 0
+        self.last_flush_size = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_size = 0
+        self._last_flush_at = None
+
+    def add(self, key, delta=1):
+        """Ajoute delta à key ; renvoie l'incrément pas encore écrit pour key."""
+        with self._lock:
+            self._pending[key] += delta
+            pending = self._pending[key] + self._in_flight[key]
+            full = len(self._pending) >= self.max_pending
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+        return pending
+
+    def pending(self, key):
+        with self._lock:
+            return self._pending[key] + self._in_flight[key]
+
+    def snapshot(self):
+        """Tous les incréments pas encore écrits, {clé: delta}."""
+        with self._lock:
+            return self._pending + self._in_flight
+
+    def flush(self):
+        """Écrit le lot en attente ; renvoie le nombre de clés écrites."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, Counter()
+                self._in_flight = batch
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self.flush_fn(dict(batch))
+            except Exception:
+                # Rien n'est perdu : le lot est remis en attente pour le prochain tour
+                with self._lock:
+                    self._pending.update(batch)
+                    self._in_flight = Counter()
+                    self.errors += 1
+                raise
+            with self._lock:
+                self._in_flight = Counter()
+                self.flushes += 1
+                self.flushed_total += len(batch)
+                self.last_flush_size = len(batch)
+                self.max_flush_size = max(self.max_flush_size, len(batch))
+                self.last_flush_seconds = time.perf_counter() - start
+                self._last_flush_at = time.monotonic()
+            return len(batch)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}",
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self._flush_quietly)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush_quietly()
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            pass  # compté dans errors, réessayé au tour suivant
+
+    def stats(self):
+        with self._lock:
+            age = None if self._last_flush_at is None else time.monotonic() - self._last_flush_at
+            return {"name": self.name, "interval": self.interval,
+                    "pending": len(self._pending) + len(self._in_flight),
+                    "flushes": self.flushes, "errors": self.errors,
+                    "flushed_total": self.flushed_total,
+                    "last_flush_size": self.last_flush_size,
+                    "max_flush_size": self.max_flush_size,
+                    "last_flush_seconds": self.last_flush_seconds,
+                    "seconds_since_flush": age}